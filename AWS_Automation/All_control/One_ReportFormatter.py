@@ -1,8 +1,25 @@
 import pandas as pd
 from datetime import datetime
+import argparse
 import os
 import numpy as np
 
+from benchmark_merge import add_merge_arguments, load_annotation_index, load_merged
+from export_schema import add_schema_arguments, read_export, schema_for
+from io_stages import DEFAULT_IO_WORKERS, StageGraph, add_io_arguments
+from parallel_xlsx_writer import write_workbook
+from recommendation_lookup import LOOKUP_SHEET, LOOKUP_WIDTHS, normalize_report_frame, replace_with_control_id
+from run_metrics import NULL_METRICS, NULL_PROGRESS, add_metrics_arguments, metrics_from_args
+from sharded_pipeline import add_shard_arguments, run_sharded
+from sheet_overflow import (DEFAULT_OVERFLOW, add_overflow_arguments, frame_sheet_specs, overflow_from_args,
+                            planned_sheets, write_frame_sheets)
+from stage_profiler import NULL_PROFILER, add_profile_arguments, profiler_from_args
+from steampipe_client import (add_steampipe_arguments, load_control_queries, steampipe_client_from_args,
+                              stream_control_results)
+from summary_cube import (COMPLIANT_STATUSES, build_cube, category_rows, control_summary, describe_cube, row_count,
+                          status_slice)
+from xlsx_reader import add_xlsx_reader_arguments
+
 # Define service categories
 categories = {
     'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
@@ -13,21 +30,85 @@ categories = {
     'Other': ['CloudFormation', 'CodeDeploy', 'Config', 'SNS', 'SQS', 'WorkSpaces', 'EventBridge', 'Config']
 }
 
-def load_data(input_file, priority_file):
-    if input_file.endswith(".xlsx"):
-        df_input = pd.read_excel(input_file)
-    elif input_file.endswith(".csv"):
-        df_input = pd.read_csv(input_file, low_memory=False)
+# Cell formats shared by the xlsxwriter and parallel writers
+FORMAT_PROPERTIES = {
+    'header': {'bold': True, 'bg_color': '#FFA07A', 'font_color': 'black'},
+    'red': {'bg_color': '#FF0000', 'font_color': 'white'},
+    'orange': {'bg_color': '#FFA500', 'font_color': 'black'},
+    'yellow': {'bg_color': '#FFFF00', 'font_color': 'black'},
+    'green': {'bg_color': '#008000', 'font_color': 'white'},
+    'section_header_red': {'bold': True, 'bg_color': '#FF0000', 'font_color': 'white', 'font_size': 12},
+    'section_header_green': {'bold': True, 'bg_color': '#008000', 'font_color': 'white', 'font_size': 12},
+    'zebra_light': {'bg_color': '#F0F0F0'},
+    'zebra_dark': {'bg_color': '#E0E0E0'}
+}
+
+CATEGORY_COLUMNS = [
+    'title', 'control_title', 'control_description',
+    'Recommendation Steps/Approach', 'region', 'account_id',
+    'resource', 'reason', 'priority', 'Feedback',
+    'Checkbox', 'Review Date', 'Action Items'
+]
+
+CONSOLIDATED_COLUMNS = [
+    'title', 'status', 'control_title', 'control_description',
+    'Recommendation Steps/Approach', 'region', 'account_id',
+    'resource', 'reason', 'priority'
+]
+
+# Priority values and the format used to highlight them
+PRIORITY_STYLES = {'High': 'red', 'Medium': 'orange', 'Low': 'yellow'}
+
+CONSOLIDATED_WIDTHS = {
+    'title': 25, 'status': 15, 'control_title': 40,
+    'control_description': 60, 'Recommendation Steps/Approach': 60,
+    'region': 15, 'account_id': 20, 'resource': 40,
+    'reason': 50, 'priority': 20, 'Control ID': 12
+}
+
+def load_data(input_file, priority_file, xlsx_engine='auto', benchmark='auto', io_workers=DEFAULT_IO_WORKERS,
+              profiler=NULL_PROFILER, merge_files=None):
+    loads = StageGraph(io_workers, profiler)
+    if merge_files:
+        # Several benchmark exports, deduplicated into one set of findings
+        loads.add('load_input', load_merged, merge_files, xlsx_engine, io_workers, profiler)
     else:
-        raise ValueError("Unsupported file type")
+        # Fails on a missing column before any rows are parsed
+        loads.add('load_input', read_export, input_file, schema_for(input_file, benchmark), xlsx_engine)
 
-    # Load priority database
-    df_priority = pd.read_excel(priority_file)
-    
-    return df_input, df_priority
+    # Load priority database while the export is read; repeated control titles are reported here
+    loads.add('load_priority', load_annotation_index, priority_file)
+
+    results = loads.run()
+    return results['load_input'], results['load_priority']
 
-def update_priority_and_recommendation(df_input, df_priority):
+def load_from_steampipe(args, df_priority, metrics=NULL_METRICS):
+    """
+    Stream control results from Steampipe and enrich them batch by batch
+
+    Args:
+        args (argparse.Namespace): Parsed options with the Steampipe settings
+        df_priority (pd.DataFrame): Priority database
+        metrics (RunMetrics, optional): Reports rows fetched and enriched
+
+    Returns:
+        pd.DataFrame: Enriched findings
+    """
+    controls = load_control_queries(args.control_queries)
+    accounts = [account.strip() for account in args.accounts.split(',')] if args.accounts else None
+
+    enriched = []
+    with steampipe_client_from_args(args) as client, metrics.stage('enrich') as progress:
+        for batch in stream_control_results(client, controls, accounts):
+            enriched.append(update_priority_and_recommendation(batch, df_priority, progress))
+
+    if not enriched:
+        raise ValueError("The control queries returned no rows")
+    return pd.concat(enriched, ignore_index=True)
+
+def update_priority_and_recommendation(df_input, df_priority, progress=NULL_PROGRESS):
     for idx, row in df_input.iterrows():
+        progress.advance()
         control_title = row["control_title"]
         status = row["status"]
 
@@ -58,26 +139,28 @@ def update_priority_and_recommendation(df_input, df_priority):
 
     return df_input
 
-def create_enhanced_report(df_input, final_report_file):
+def enrich_report_shard(df_input, df_priority):
+    """Enrich one shard and blank missing values the way the report sheets see them"""
+    return update_priority_and_recommendation(df_input, df_priority).fillna('')
+
+def create_enhanced_report(df_input, final_report_file, writer_mode='xlsxwriter', workers=None,
+                           recommendation_mode='inline', profiler=NULL_PROFILER, metrics=NULL_METRICS,
+                           cube=None, overflow=DEFAULT_OVERFLOW):
+    if writer_mode == 'parallel':
+        return create_enhanced_report_parallel(df_input, final_report_file, workers=workers,
+                                               recommendation_mode=recommendation_mode, profiler=profiler,
+                                               metrics=metrics, cube=cube, overflow=overflow)
+
     # Create Excel writer with nan_inf_to_errors option
     with pd.ExcelWriter(final_report_file, engine='xlsxwriter', engine_kwargs={'options': {'nan_inf_to_errors': True}}) as writer:
         workbook = writer.book
 
         # Define formats
-        formats = {
-            'header': workbook.add_format({'bold': True, 'bg_color': '#FFA07A', 'font_color': 'black'}),
-            'red': workbook.add_format({'bg_color': '#FF0000', 'font_color': 'white'}),
-            'orange': workbook.add_format({'bg_color': '#FFA500', 'font_color': 'black'}),
-            'yellow': workbook.add_format({'bg_color': '#FFFF00', 'font_color': 'black'}),
-            'green': workbook.add_format({'bg_color': '#008000', 'font_color': 'white'}),
-            'section_header_red': workbook.add_format({'bold': True, 'bg_color': '#FF0000', 'font_color': 'white', 'font_size': 12}),
-            'section_header_green': workbook.add_format({'bold': True, 'bg_color': '#008000', 'font_color': 'white', 'font_size': 12}),
-            'zebra_light': workbook.add_format({'bg_color': '#F0F0F0'}),
-            'zebra_dark': workbook.add_format({'bg_color': '#E0E0E0'})
-        }
+        formats = {name: workbook.add_format(props) for name, props in FORMAT_PROPERTIES.items()}
 
-        # Create all necessary sheets first
-        workbook.add_worksheet('Report_Raw.pp')
+        # Create all necessary sheets first; raw findings past Excel's row limit get continuation sheets
+        for sheet_name in planned_sheets('Report_Raw.pp', len(df_input), overflow):
+            workbook.add_worksheet(sheet_name)
         workbook.add_worksheet('Summary Tables')
         workbook.add_worksheet('Category Analysis')
         workbook.add_worksheet('Consolidated')
@@ -90,23 +173,55 @@ def create_enhanced_report(df_input, final_report_file):
         # Clean the dataframe before writing
         df_input_clean = df_input.fillna('')  # Replace NaN with empty string
 
+        # Every summary table is a roll-up of one findings cube; sharded runs pass theirs in
+        if cube is None:
+            with profiler.stage('summary_cube'):
+                cube = build_cube(df_input_clean, categories)
+
+        # In lookup mode the large sheets carry a Control ID instead of the long texts
+        report_df = df_input_clean
+        category_columns, consolidated_columns = CATEGORY_COLUMNS, CONSOLIDATED_COLUMNS
+        if recommendation_mode == 'lookup':
+            report_df, lookup_df = normalize_report_frame(df_input_clean)
+            category_columns = replace_with_control_id(CATEGORY_COLUMNS)
+            consolidated_columns = replace_with_control_id(CONSOLIDATED_COLUMNS)
+
         # Write raw data sheet
-        df_input_clean.to_excel(writer, sheet_name='Report_Raw.pp', index=False)
-        raw_sheet = writer.sheets['Report_Raw.pp']
-        for col_num, value in enumerate(df_input_clean.columns.values):
-            raw_sheet.write(0, col_num, value, formats['header'])
+        with profiler.stage('sheet:Report_Raw.pp'), \
+                metrics.stage('sheet:Report_Raw.pp', total_rows=len(report_df)) as progress:
+            def format_raw_sheet(raw_sheet, chunk):
+                for col_num, value in enumerate(chunk.columns.values):
+                    raw_sheet.write(0, col_num, value, formats['header'])
+
+            _, sidecar = write_frame_sheets(writer, report_df, 'Report_Raw.pp', final_report_file, policy=overflow,
+                                            format_sheet=format_raw_sheet, progress=progress)
+            if sidecar:
+                print(f"Report_Raw.pp holds the first rows only; all {len(report_df)} rows are in {sidecar}")
 
         # Create category sheets
-        create_category_sheets(writer, df_input_clean, formats)
+        with profiler.stage('sheet:category_sheets'), \
+                metrics.stage('sheet:category_sheets', total_rows=len(report_df)) as progress:
+            create_category_sheets(writer, report_df, formats, category_columns, progress)
 
         # Create summary tables
-        create_summary_tables(writer, df_input_clean, formats)
+        with profiler.stage('sheet:Summary Tables'):
+            create_summary_tables(writer, cube, formats)
 
         # Create consolidated sheet
-        create_consolidated_sheet(writer, df_input_clean, formats)
+        with profiler.stage('sheet:Consolidated'), \
+                metrics.stage('sheet:Consolidated', total_rows=len(report_df)) as progress:
+            create_consolidated_sheet(writer, report_df, formats, consolidated_columns, progress)
 
         # Create category summary
-        create_category_summary_table(writer, df_input_clean, formats)
+        with profiler.stage('sheet:Category Analysis'):
+            create_category_summary_table(writer, cube, formats)
+
+        # Write each control's description and recommendation once
+        if recommendation_mode == 'lookup':
+            with profiler.stage('sheet:Control Lookup'):
+                create_lookup_sheet(writer, lookup_df, formats)
+
+        # The workbook itself is serialized when the writer closes
 
 def safe_write(sheet, row, col, value, format):
     """Helper function to safely write values to Excel"""
@@ -176,7 +291,7 @@ def write_summary_section(sheet, df, start_row, title, formats, is_compliant):
                            formats['yellow'] if priority == 'Low' else row_format
             safe_write(sheet, actual_row, 4, priority, format_to_use)
 
-def create_summary_tables(writer, df, formats):
+def create_summary_tables(writer, cube, formats):
     summary_sheet = writer.sheets['Summary Tables']
     
     # Set column widths
@@ -185,17 +300,17 @@ def create_summary_tables(writer, df, formats):
         summary_sheet.set_column(col, col, width)
 
     # Non-compliant findings section
-    non_compliant_df = df[df['status'] == 'alarm']
-    write_summary_section(summary_sheet, non_compliant_df, 0, "Non-Compliant Findings", formats, is_compliant=False)
+    write_summary_section(summary_sheet, control_summary(cube, ['alarm']), 0, "Non-Compliant Findings", formats,
+                          is_compliant=False)
 
     # Calculate the last row of non-compliant section
-    last_row = len(non_compliant_df) + 3  # Header + title + data rows
+    last_row = row_count(status_slice(cube, ['alarm'])) + 3  # Header + title + data rows
 
     # Compliant findings section
-    compliant_df = df[df['status'].isin(['ok', 'info', 'skip'])]
-    write_summary_section(summary_sheet, compliant_df, last_row + 2, "Compliant Findings", formats, is_compliant=True)
+    write_summary_section(summary_sheet, control_summary(cube, COMPLIANT_STATUSES), last_row + 2,
+                          "Compliant Findings", formats, is_compliant=True)
 
-def write_summary_section(sheet, df, start_row, title, formats, is_compliant):
+def write_summary_section(sheet, summary, start_row, title, formats, is_compliant):
     # Write section header
     header_format = formats['section_header_green'] if is_compliant else formats['section_header_red']
     sheet.write(start_row, 0, title, header_format)
@@ -205,9 +320,6 @@ def write_summary_section(sheet, df, start_row, title, formats, is_compliant):
     for col, header in enumerate(headers):
         sheet.write(start_row + 1, col, header, formats['header'])
     
-    # Prepare and write data
-    summary = df.groupby(['title', 'control_title', 'control_description']).size().reset_index(name='Open Issues')
-    
     for row_idx, row in summary.iterrows():
         actual_row = start_row + row_idx + 2
         row_format = formats['zebra_dark'] if row_idx % 2 == 0 else formats['zebra_light']
@@ -221,30 +333,18 @@ def write_summary_section(sheet, df, start_row, title, formats, is_compliant):
         if is_compliant:
             sheet.write(actual_row, 4, "Safe/Well Architected", formats['green'])
         else:
-            priority = df[df['control_title'] == row['control_title']]['priority'].iloc[0]
+            priority = row['priority']
             format_to_use = formats['red'] if priority == 'High' else \
                            formats['orange'] if priority == 'Medium' else \
                            formats['yellow'] if priority == 'Low' else row_format
             sheet.write(actual_row, 4, priority, format_to_use)
 
-def create_consolidated_sheet(writer, df, formats):
+def create_consolidated_sheet(writer, df, formats, columns=CONSOLIDATED_COLUMNS, progress=NULL_PROGRESS):
     consolidated_sheet = writer.sheets['Consolidated']
     
-    # Define columns to show
-    columns = ['title', 'status', 'control_title', 'control_description', 
-              'Recommendation Steps/Approach', 'region', 'account_id', 
-              'resource', 'reason', 'priority']
-    
     # Set column widths
-    column_widths = {
-        'title': 25, 'status': 15, 'control_title': 40, 
-        'control_description': 60, 'Recommendation Steps/Approach': 60,
-        'region': 15, 'account_id': 20, 'resource': 40, 
-        'reason': 50, 'priority': 20
-    }
-    
     for col, column in enumerate(columns):
-        consolidated_sheet.set_column(col, col, column_widths.get(column, 15))
+        consolidated_sheet.set_column(col, col, CONSOLIDATED_WIDTHS.get(column, 15))
     
     # Write headers
     for col, column in enumerate(columns):
@@ -253,18 +353,21 @@ def create_consolidated_sheet(writer, df, formats):
     # Process non-compliant findings (alarm status)
     alarm_df = df[df['status'] == 'alarm']
     row = 1
-    row = write_consolidated_section(consolidated_sheet, alarm_df, row, columns, formats, is_compliant=False)
+    row = write_consolidated_section(consolidated_sheet, alarm_df, row, columns, formats, is_compliant=False,
+                                     progress=progress)
     
     # Add a blank row
     row += 1
     
     # Process compliant findings (ok, info, skip status)
     compliant_df = df[df['status'].isin(['ok', 'info', 'skip'])]
-    write_consolidated_section(consolidated_sheet, compliant_df, row, columns, formats, is_compliant=True)
+    write_consolidated_section(consolidated_sheet, compliant_df, row, columns, formats, is_compliant=True,
+                               progress=progress)
 
-def write_consolidated_section(sheet, df, start_row, columns, formats, is_compliant):
+def write_consolidated_section(sheet, df, start_row, columns, formats, is_compliant, progress=NULL_PROGRESS):
     row = start_row
     for _, data_row in df.iterrows():
+        progress.advance()
         for col, column in enumerate(columns):
             value = data_row[column]
             
@@ -288,13 +391,7 @@ def write_consolidated_section(sheet, df, start_row, columns, formats, is_compli
     
     return row
 
-def create_category_sheets(writer, df, formats):
-    category_columns = [
-        'title', 'control_title', 'control_description', 
-        'Recommendation Steps/Approach', 'region', 'account_id', 
-        'resource', 'reason', 'priority', 'Feedback', 
-        'Checkbox', 'Review Date', 'Action Items'
-    ]
+def create_category_sheets(writer, df, formats, category_columns=CATEGORY_COLUMNS, progress=NULL_PROGRESS):
 
     df['Feedback'] = ''
     df['Checkbox'] = ''
@@ -326,8 +423,9 @@ def create_category_sheets(writer, df, formats):
                     worksheet.write(row_num, priority_col, priority, formats['yellow'])
                 elif priority == 'Safe/Well Architected':
                     worksheet.write(row_num, priority_col, priority, formats['green'])
+            progress.advance(len(category_data))
 
-def create_category_summary_table(writer, df, formats):
+def create_category_summary_table(writer, cube, formats):
     category_sheet = writer.sheets['Category Analysis']
     
     # Set column widths
@@ -340,39 +438,216 @@ def create_category_summary_table(writer, df, formats):
     for col, header in enumerate(headers):
         category_sheet.write(0, col, header, formats['header'])
     
-    row = 1
+    for row, (category, open_issues, safe_count, total) in enumerate(category_rows(cube, categories), start=1):
+        category_sheet.write(row, 0, category, formats['zebra_light'])
+        category_sheet.write(row, 1, open_issues, formats['red'])
+        category_sheet.write(row, 2, safe_count, formats['green'])
+        category_sheet.write(row, 3, total, formats['zebra_light'])
+
+def create_lookup_sheet(writer, lookup_df, formats):
+    lookup_df.to_excel(writer, sheet_name=LOOKUP_SHEET, index=False)
+    lookup_sheet = writer.sheets[LOOKUP_SHEET]
+    for col_num, value in enumerate(lookup_df.columns.values):
+        lookup_sheet.write(0, col_num, value, formats['header'])
+        lookup_sheet.set_column(col_num, col_num, LOOKUP_WIDTHS.get(value, 20))
+
+def create_enhanced_report_parallel(df_input, final_report_file, workers=None, recommendation_mode='inline',
+                                    profiler=NULL_PROFILER, metrics=NULL_METRICS, cube=None, overflow=DEFAULT_OVERFLOW):
+    """
+    Write the enhanced report with the parallel xlsx writer
+
+    Produces the same sheets as create_enhanced_report, but each worksheet is
+    rendered in a worker process and the xlsx package is assembled at the end.
+    """
+    df_input_clean = df_input.fillna('')  # Replace NaN with empty string
+    if cube is None:
+        with profiler.stage('summary_cube'):
+            cube = build_cube(df_input_clean, categories)
+
+    report_df = df_input_clean
+    category_columns, consolidated_columns = CATEGORY_COLUMNS, CONSOLIDATED_COLUMNS
+    if recommendation_mode == 'lookup':
+        report_df, lookup_df = normalize_report_frame(df_input_clean)
+        category_columns = replace_with_control_id(CATEGORY_COLUMNS)
+        consolidated_columns = replace_with_control_id(CONSOLIDATED_COLUMNS)
+
+    with profiler.stage('build_sheet_specs'):
+        sheets = frame_sheet_specs(report_df, 'Report_Raw.pp', final_report_file, policy=overflow)
+        sheets += [
+            build_summary_sheet_spec(cube),
+            build_category_summary_sheet_spec(cube),
+            build_consolidated_sheet_spec(report_df, consolidated_columns)
+        ]
+        sheets.extend(build_category_sheet_specs(report_df, category_columns))
+
+        if recommendation_mode == 'lookup':
+            sheets.append({
+                'name': LOOKUP_SHEET,
+                'widths': {col: LOOKUP_WIDTHS.get(column, 20) for col, column in enumerate(lookup_df.columns)},
+                'blocks': [{'start_row': 0, 'header': (list(lookup_df.columns), 'header'), 'frame': lookup_df}]
+            })
+
+    write_workbook(sheets, FORMAT_PROPERTIES, final_report_file, workers=workers, profiler=profiler,
+                   metrics=metrics)
+
+def build_category_sheet_specs(df, category_columns=CATEGORY_COLUMNS):
+    specs = []
+    priority_rule = {'map': dict(PRIORITY_STYLES, **{'Safe/Well Architected': 'green'})}
+
     for category, services in categories.items():
+        sheet = {'name': category.replace(' ', '_')[:31], 'blocks': []}
         category_data = df[df['title'].isin(services)]
         if not category_data.empty:
-            open_issues = len(category_data[category_data['status'] == 'alarm'])
-            safe_count = len(category_data[category_data['status'].isin(['ok', 'info', 'skip'])])
-            total = open_issues + safe_count
-            
-            category_sheet.write(row, 0, category, formats['zebra_light'])
-            category_sheet.write(row, 1, open_issues, formats['red'])
-            category_sheet.write(row, 2, safe_count, formats['green'])
-            category_sheet.write(row, 3, total, formats['zebra_light'])
-            row += 1
+            category_data = category_data.reindex(columns=category_columns, fill_value='')
+            sheet['widths'] = {col: 20 for col in range(len(category_columns))}
+            sheet['blocks'].append({
+                'start_row': 0,
+                'header': (category_columns, 'header'),
+                'frame': category_data,
+                'rules': {'priority': priority_rule}
+            })
+        specs.append(sheet)
+
+    return specs
+
+def build_summary_block(summary, start_row, title, is_compliant):
+    zebra = {'zebra': ('zebra_dark', 'zebra_light')}
+    if is_compliant:
+        summary['priority'] = "Safe/Well Architected"
+        priority_rule = 'green'
+    else:
+        priority_rule = {'map': PRIORITY_STYLES, 'default': zebra}
+
+    return {
+        'start_row': start_row,
+        'title': (title, 'section_header_green' if is_compliant else 'section_header_red'),
+        'header': (['Title', 'Control Title', 'Control Description', 'Open Issues', 'Priority'], 'header'),
+        'frame': summary,
+        'rules': {
+            'title': zebra, 'control_title': zebra, 'control_description': zebra,
+            'Open Issues': zebra, 'priority': priority_rule
+        }
+    }
+
+def build_summary_sheet_spec(cube):
+    last_row = row_count(status_slice(cube, ['alarm'])) + 3  # Header + title + data rows
+
+    return {
+        'name': 'Summary Tables',
+        'widths': dict(enumerate([25, 40, 60, 15, 20])),
+        'blocks': [
+            build_summary_block(control_summary(cube, ['alarm']), 0, "Non-Compliant Findings",
+                                is_compliant=False),
+            build_summary_block(control_summary(cube, COMPLIANT_STATUSES), last_row + 2, "Compliant Findings",
+                                is_compliant=True)
+        ]
+    }
+
+def build_consolidated_sheet_spec(df, columns=CONSOLIDATED_COLUMNS):
+    alarm_df = df[df['status'] == 'alarm'][columns]
+    compliant_df = df[df['status'].isin(['ok', 'info', 'skip'])][columns]
+
+    def section_rules(is_compliant):
+        rules = {column: 'zebra_light' for column in columns}
+        rules['title'] = rules['status'] = 'green' if is_compliant else 'red'
+        rules['priority'] = 'green' if is_compliant else {'map': PRIORITY_STYLES, 'default': 'zebra_light'}
+        return rules
+
+    return {
+        'name': 'Consolidated',
+        'widths': {col: CONSOLIDATED_WIDTHS.get(column, 15) for col, column in enumerate(columns)},
+        'blocks': [
+            {'start_row': 0, 'header': (columns, 'header'), 'frame': alarm_df,
+             'rules': section_rules(False)},
+            # One blank row between the sections
+            {'start_row': len(alarm_df) + 2, 'frame': compliant_df, 'rules': section_rules(True),
+             'overrides': {'priority': "Safe/Well Architected"}}
+        ]
+    }
+
+def build_category_summary_sheet_spec(cube):
+    rows = category_rows(cube, categories)
+
+    headers = ['Category', 'Open Issues', 'Safe Count', 'Total']
+    return {
+        'name': 'Category Analysis',
+        'widths': dict(enumerate([25, 15, 15, 15])),
+        'blocks': [{
+            'start_row': 0,
+            'header': (headers, 'header'),
+            'frame': pd.DataFrame(rows, columns=headers),
+            'rules': {'Category': 'zebra_light', 'Open Issues': 'red', 'Safe Count': 'green', 'Total': 'zebra_light'}
+        }]
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Enhanced PowerPipe Report Generator")
+    parser.add_argument('--writer', choices=['xlsxwriter', 'parallel'], default='xlsxwriter',
+                        help="Workbook writer; 'parallel' renders sheets in worker processes")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for the parallel writer (default: CPU count)")
+    parser.add_argument('--recommendations', choices=['inline', 'lookup'], default='inline',
+                        help="'lookup' writes descriptions and recommendations once to a "
+                             "Control Lookup sheet and keeps only a Control ID in the finding sheets")
+    add_steampipe_arguments(parser)
+    add_shard_arguments(parser)
+    add_overflow_arguments(parser)
+    add_xlsx_reader_arguments(parser)
+    add_schema_arguments(parser)
+    add_merge_arguments(parser)
+    add_io_arguments(parser)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    profiler = profiler_from_args(args, 'One_ReportFormatter.main')
     try:
-        input_file = input("Enter the input file name (CSV or Excel): ")
+        if args.steampipe_dsn:
+            input_file = "steampipe"
+        elif args.merge:
+            input_file = "merged"
+        else:
+            input_file = input("Enter the input file name (CSV or Excel): ")
+        metrics = metrics_from_args(args, os.path.basename(input_file))
         priority_file = "PowerPipeControls_Annotations.xlsx"
         
+        cube = None
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         filename = os.path.splitext(input_file)[0]
         output_file = f"{filename}_PowerPipe_Report_{timestamp}.xlsx"
 
-        print("\nLoading data files...")
-        df_input, df_priority = load_data(input_file, priority_file)
-        
-        print("Updating priority and recommendations...")
-        updated_df = update_priority_and_recommendation(df_input, df_priority)
+        if args.steampipe_dsn:
+            print("\nReading control results from Steampipe...")
+            df_priority = load_annotation_index(priority_file)
+            with profiler.stage('enrich'):
+                updated_df = load_from_steampipe(args, df_priority, metrics)
+        else:
+            print("\nLoading data files...")
+            with profiler.stage('load_data'):
+                df_input, df_priority = load_data(input_file, priority_file, args.xlsx_engine,
+                                                  args.benchmark, args.io_workers, profiler, args.merge)
+
+            print("Updating priority and recommendations...")
+            with profiler.stage('enrich'), metrics.stage('enrich', total_rows=len(df_input)) as progress:
+                if args.shard_by:
+                    updated_df, cube = run_sharded(df_input, df_priority, enrich_report_shard,
+                                                   categories, shard_by=args.shard_by,
+                                                   workers=args.shard_workers, progress=progress)
+                    print(f"Sharded by {args.shard_by}: {describe_cube(cube)}")
+                else:
+                    updated_df = update_priority_and_recommendation(df_input, df_priority, progress)
         
         print("Generating enhanced report...")
-        create_enhanced_report(updated_df, output_file)
+        with profiler.stage('write_report'):
+            create_enhanced_report(updated_df, output_file, writer_mode=args.writer, workers=args.workers,
+                                   recommendation_mode=args.recommendations, profiler=profiler,
+                                   metrics=metrics, cube=cube, overflow=overflow_from_args(args))
         
         print(f"\nEnhanced report generated successfully: {output_file}")
+        if args.profile:
+            profiler.write_json(args.profile)
         
     except FileNotFoundError as e:
         print(f"\nError: File not found - {str(e)}")
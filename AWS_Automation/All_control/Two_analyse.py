@@ -1,9 +1,24 @@
 import pandas as pd
+import argparse
 import os
 import sys
 from datetime import datetime
 import xlsxwriter
 
+from benchmark_merge import add_merge_arguments, load_annotation_index, load_merged
+from export_schema import add_schema_arguments, read_export, schema_for
+from html_dashboard import render_dashboard
+from io_stages import DEFAULT_IO_WORKERS, StageGraph, add_io_arguments
+from risk_scoring import (DEFAULT_RISK_WEIGHTS, add_risk_arguments, finding_scores, risk_rankings,
+                          risk_weights_from_args)
+from run_metrics import NULL_METRICS, NULL_PROGRESS, add_metrics_arguments, metrics_from_args
+from sharded_pipeline import add_shard_arguments, run_sharded
+from sheet_overflow import (DEFAULT_OVERFLOW, add_overflow_arguments, count_rows, overflow_from_args,
+                            sidecar_path, write_frame_sheets, write_sidecar)
+from stage_profiler import NULL_PROFILER, add_profile_arguments, profiler_from_args
+from summary_cube import build_cube, describe_cube, priority_counts, service_controls, service_pivot
+from xlsx_reader import add_xlsx_reader_arguments
+
 # Define service categories
 CATEGORIES = {
     'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
@@ -24,25 +39,92 @@ COLOR_MAP = {
     'No Priority': '#C0C0C0'  # Gray
 }
 
+SERVICE_ANALYSIS_COLUMNS = ['Category', 'Service', 'Control', 'Description', 'Open Issues', 'Priority']
+
 visualization_techniques = [
     'priority_distribution_heatmap',
     'service_risk_radar_chart',
     'compliance_maturity_treemap'
 ]
 
+def enrich_findings(df, priority_df, progress=NULL_PROGRESS):
+    """
+    Add priority and recommendation columns to findings
+    
+    Module-level so sharded runs can call it in worker processes.
+    
+    Args:
+        df (pd.DataFrame): Findings, updated in place
+        priority_df (pd.DataFrame): Priority database
+        progress (StageProgress, optional): Counts processed rows
+    
+    Returns:
+        pd.DataFrame: Enriched dataframe
+    """
+    for idx, row in df.iterrows():
+        progress.advance()
+        control_title = row.get("control_title", "")
+        status = row.get("status", "")
+
+        # Find matching priority row
+        matching_row = priority_df[priority_df["control_title"] == control_title]
+
+        if not matching_row.empty:
+            priority = matching_row.iloc[0]["priority"]
+            recommendation = matching_row.iloc[0]["Recommendation Steps/Approach"]
+
+            # Assign priority and recommendation
+            if status in ["ok", "info", "skip"]:
+                df.at[idx, "priority"] = "Safe"
+                df.at[idx, "Recommendation Steps/Approach"] = recommendation
+            else:
+                df.at[idx, "priority"] = priority
+                df.at[idx, "Recommendation Steps/Approach"] = recommendation
+        else:
+            # Default values if no match
+            df.at[idx, "priority"] = "No Priority"
+            df.at[idx, "Recommendation Steps/Approach"] = "No recommendation available"
+
+    return df
+
 class AWSComplianceReporter:
-    def __init__(self, input_file, priority_file="PowerPipeControls_Annotations.xlsx"):
+    def __init__(self, input_file, priority_file="PowerPipeControls_Annotations.xlsx", profiler=NULL_PROFILER,
+                 metrics=NULL_METRICS, xlsx_engine='auto', benchmark='auto', io_workers=DEFAULT_IO_WORKERS,
+                 merge_files=None, priority_df=None, risk_weights=DEFAULT_RISK_WEIGHTS):
         """
         Initialize the AWS Compliance Reporter
         
         Args:
             input_file (str): Path to the input CSV/Excel file
             priority_file (str, optional): Path to the priority annotations file
+            profiler (StageProfiler, optional): Records per-stage time and memory
+            metrics (RunMetrics, optional): Reports per-stage rows, throughput and ETA
+            xlsx_engine (str, optional): 'auto', 'calamine' or 'openpyxl' for Excel input
+            benchmark (str, optional): Export schema to load with; 'auto' detects it from the file name
+            io_workers (int, optional): Threads that load the inputs and write the outputs concurrently
+            merge_files (list, optional): Benchmark exports to merge and deduplicate instead of input_file
+            priority_df (pd.DataFrame, optional): Annotation index already in memory, e.g. kept
+                by a long-running service; priority_file is not read then
+            risk_weights (RiskWeights, optional): Weights of the risk score and rankings
         """
         self.input_file = input_file
         self.priority_file = priority_file
-        self.df = self._load_input_file()
-        self.priority_df = self._load_priority_database()
+        self.profiler = profiler
+        self.metrics = metrics
+        self.xlsx_engine = xlsx_engine
+        self.benchmark = benchmark
+        self.io_workers = io_workers
+        self.merge_files = merge_files
+        self.risk_weights = risk_weights
+
+        # The export and the annotations are independent reads
+        loads = StageGraph(io_workers, profiler)
+        loads.add('load_input', self._load_input_file)
+        if priority_df is None:
+            loads.add('load_priority', self._load_priority_database)
+        results = loads.run()
+        self.df = results['load_input']
+        self.priority_df = results['load_priority'] if priority_df is None else priority_df
         
     def _load_input_file(self):
         """
@@ -52,12 +134,10 @@ class AWSComplianceReporter:
             pd.DataFrame: Loaded dataframe
         """
         try:
-            if self.input_file.endswith(".csv"):
-                return pd.read_csv(self.input_file, low_memory=False)
-            elif self.input_file.endswith((".xlsx", ".xls")):
-                return pd.read_excel(self.input_file, engine='openpyxl')
-            else:
-                raise ValueError("Unsupported file type. Use CSV or Excel.")
+            if self.merge_files:
+                return load_merged(self.merge_files, self.xlsx_engine, self.io_workers, self.profiler)
+            schema = schema_for(self.input_file, self.benchmark)
+            return read_export(self.input_file, schema, self.xlsx_engine)
         except Exception as e:
             print(f"Error loading input file: {e}")
             sys.exit(1)
@@ -67,84 +147,181 @@ class AWSComplianceReporter:
         Load priority database
         
         Returns:
-            pd.DataFrame: Priority database
+            pd.DataFrame: Priority database with one row per control_title
         """
         try:
-            return pd.read_excel(self.priority_file)
+            return load_annotation_index(self.priority_file)
         except Exception as e:
             print(f"Error loading priority database: {e}")
             sys.exit(1)
 
-    def enrich_data(self):
+    def enrich_data(self, progress=NULL_PROGRESS):
         """
         Enrich input data with priority and recommendations
         
+        Args:
+            progress (StageProgress, optional): Counts processed rows
+        
         Returns:
             pd.DataFrame: Enriched dataframe
         """
-        for idx, row in self.df.iterrows():
-            control_title = row.get("control_title", "")
-            status = row.get("status", "")
+        return enrich_findings(self.df, self.priority_df, progress)
 
-            # Find matching priority row
-            matching_row = self.priority_df[self.priority_df["control_title"] == control_title]
-
-            if not matching_row.empty:
-                priority = matching_row.iloc[0]["priority"]
-                recommendation = matching_row.iloc[0]["Recommendation Steps/Approach"]
-
-                # Assign priority and recommendation
-                if status in ["ok", "info", "skip"]:
-                    self.df.at[idx, "priority"] = "Safe"
-                    self.df.at[idx, "Recommendation Steps/Approach"] = recommendation
-                else:
-                    self.df.at[idx, "priority"] = priority
-                    self.df.at[idx, "Recommendation Steps/Approach"] = recommendation
-            else:
-                # Default values if no match
-                self.df.at[idx, "priority"] = "No Priority"
-                self.df.at[idx, "Recommendation Steps/Approach"] = "No recommendation available"
-
-        return self.df
+    def build_aggregates(self, enriched_df, cube=None):
+        """
+        Summary frames shared by the workbook sheets and the HTML dashboard
+        
+        All frames are roll-ups of one findings cube, so the findings are
+        scanned once however many summaries are built.
+        
+        Args:
+            enriched_df (pd.DataFrame): Enriched findings
+            cube (pd.DataFrame, optional): Findings cube, e.g. merged from shards;
+                built from enriched_df when not given
+        
+        Returns:
+            dict: 'priority_summary', 'service_pivot' and 'service_analysis' frames,
+                and 'risk_rankings', a dict of ranking sheet name -> frame
+        """
+        if cube is None:
+            cube = build_cube(enriched_df, CATEGORIES)
+
+        return {
+            'priority_summary': self._build_priority_summary(cube),
+            'service_pivot': self._build_service_pivot(cube),
+            'service_analysis': self._build_service_analysis(cube),
+            'risk_rankings': risk_rankings(cube, CATEGORIES, self.risk_weights)
+        }
 
-    def generate_comprehensive_report(self):
+    def generate_comprehensive_report(self, output_format='xlsx', shard_by=None, shard_workers=None,
+                                      overflow=DEFAULT_OVERFLOW, output_dir='', run_id=None):
         """
         Generate comprehensive report with multiple analysis sheets
+        
+        Args:
+            output_format (str, optional): 'xlsx', 'html' (self-contained dashboard) or 'both'
+            shard_by (str, optional): 'account_id' or 'region' to enrich and count in worker processes
+            shard_workers (int, optional): Worker processes for shard_by (default: CPU count)
+            overflow (OverflowPolicy, optional): Handling of finding sheets beyond Excel's row limit
+            output_dir (str, optional): Directory the reports are written to (default: the working directory)
+            run_id (str, optional): Added to the file names, so runs of the same export
+                finishing in the same second never write to the same files
+        
+        Returns:
+            dict: Paths of the written reports, keyed 'xlsx' and/or 'html'
         """
         # Enrich data first
-        enriched_df = self.enrich_data()
+        cube = None
+        with self.profiler.stage('enrich'), self.metrics.stage('enrich', total_rows=len(self.df)) as progress:
+            if shard_by:
+                enriched_df, cube = run_sharded(self.df, self.priority_df, enrich_findings, CATEGORIES,
+                                                shard_by=shard_by, workers=shard_workers, progress=progress)
+                self.df = enriched_df
+                print(f"Sharded by {shard_by}: {describe_cube(cube)}")
+            else:
+                enriched_df = self.enrich_data(progress)
+
+        with self.profiler.stage('risk_scores'):
+            enriched_df['risk_score'] = finding_scores(enriched_df, CATEGORIES, self.risk_weights)
+
+        with self.profiler.stage('aggregates'):
+            aggregates = self.build_aggregates(enriched_df, cube)
 
         # Generate unique filename
         base_name = os.path.splitext(os.path.basename(self.input_file))[0]
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = f"{base_name}_comprehensive_report_{timestamp}.xlsx"
+        if run_id:
+            timestamp = f"{timestamp}_{run_id}"
+
+        # Every output only needs the enriched findings and aggregates, so the
+        # workbook, its sidecars and the dashboard are written concurrently
+        outputs = StageGraph(self.io_workers, self.profiler)
+        reports = {}
+        if output_format in ('xlsx', 'both'):
+            output_file = reports['xlsx'] = os.path.join(output_dir, f"{base_name}_comprehensive_report_{timestamp}.xlsx")
+            for sheet_name, rows in self._finding_sheets(enriched_df):
+                if overflow.layout(count_rows(enriched_df, rows)) == 'sidecar':
+                    outputs.add(f'sidecar:{sheet_name}', self._write_sidecar, enriched_df, sheet_name,
+                                sidecar_path(output_file, sheet_name), rows)
+            outputs.add('write_workbook', self._write_workbook, enriched_df, aggregates, output_file, overflow,
+                        sidecars_written=True)
+
+        if output_format in ('html', 'both'):
+            html_file = reports['html'] = os.path.join(output_dir, f"{base_name}_dashboard_{timestamp}.html")
+            outputs.add('html_dashboard', render_dashboard, enriched_df, aggregates, html_file,
+                        title=f"{base_name} Compliance Dashboard")
+
+        outputs.run()
+        if output_format in ('xlsx', 'both'):
+            print(f"Comprehensive report generated: {output_file}")
+        if output_format in ('html', 'both'):
+            print(f"HTML dashboard generated: {html_file}")
+        return reports
+
+    def _finding_sheets(self, enriched_df):
+        """
+        Finding sheets of the workbook and the rows each one holds
 
+        No Open Issues and Open Issues select rows by mask instead of copying them.
+
+        Returns:
+            list: (sheet name, boolean row mask or None for all rows) pairs
+        """
+        return [
+            ('Raw Data', None),
+            ('No Open Issues', enriched_df['status'].isin(['ok', 'info', 'skip']).to_numpy()),
+            ('Open Issues', (enriched_df['status'] == 'alarm').to_numpy())
+        ]
+
+    def _write_sidecar(self, enriched_df, sheet_name, path, rows):
+        """Stream the rows of one finding sheet to its gzip CSV sidecar"""
+        with self.metrics.stage(f'sidecar:{sheet_name}', total_rows=count_rows(enriched_df, rows)) as progress:
+            return write_sidecar(enriched_df, path, rows, progress)
+
+    def _write_workbook(self, enriched_df, aggregates, output_file, overflow=DEFAULT_OVERFLOW,
+                        sidecars_written=False):
+        """
+        Write the comprehensive Excel workbook
+        
+        Args:
+            enriched_df (pd.DataFrame): Enriched findings
+            aggregates (dict): Frames from build_aggregates
+            output_file (str): Path of the xlsx file
+            overflow (OverflowPolicy, optional): Handling of finding sheets beyond Excel's row limit
+            sidecars_written (bool, optional): The sidecars of oversized finding sheets are
+                written by separate stages; the sheets only link to them
+        """
+        # The workbook is serialized when the writer closes
         with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
             workbook = writer.book
 
-            # Raw Data Sheet
-            enriched_df.to_excel(writer, sheet_name='Raw Data', index=False)
-            self._format_sheet(writer.sheets['Raw Data'], workbook, enriched_df)
+            def format_sheet(worksheet, chunk):
+                self._format_sheet(worksheet, workbook, chunk)
 
-            # Filter DataFrames
-            no_issues_df = enriched_df[enriched_df['status'].isin(['ok', 'info', 'skip'])]
-            open_issues_df = enriched_df[enriched_df['status'] == 'alarm']
-
-            # No Issues and Open Issues Sheets
-            no_issues_df.to_excel(writer, sheet_name='No Open Issues', index=False)
-            self._format_sheet(writer.sheets['No Open Issues'], workbook, no_issues_df)
-            
-            open_issues_df.to_excel(writer, sheet_name='Open Issues', index=False)
-            self._format_sheet(writer.sheets['Open Issues'], workbook, open_issues_df)
+            for sheet_name, rows in self._finding_sheets(enriched_df):
+                with self.profiler.stage(f'sheet:{sheet_name}'), \
+                        self.metrics.stage(f'sheet:{sheet_name}', total_rows=count_rows(enriched_df, rows)) as progress:
+                    _, sidecar = write_frame_sheets(writer, enriched_df, sheet_name, output_file, rows=rows,
+                                                    policy=overflow, format_sheet=format_sheet, progress=progress,
+                                                    sidecar_written=sidecars_written)
+                if sidecar:
+                    print(f"{sheet_name} holds the first rows only; all rows are in {sidecar}")
 
             # Service Category Analysis
-            self._create_service_category_analysis(open_issues_df, writer, workbook)
+            with self.profiler.stage('sheet:Service Analysis'):
+                self._create_service_category_analysis(aggregates['service_analysis'], writer, workbook)
 
             # Priority Summary
-            self._create_priority_summary(enriched_df, writer, workbook)
+            with self.profiler.stage('sheet:Priority Summary'):
+                self._create_priority_summary(aggregates['priority_summary'], writer, workbook)
 
             # Pivot Analysis
-            service_pivot = self._create_pivot_analysis(enriched_df, writer, workbook)
+            with self.profiler.stage('sheet:Service Pivot'):
+                self._create_pivot_analysis(aggregates['service_pivot'], writer, workbook)
+
+            # Risk rankings per service, category, account and region
+            with self.profiler.stage('sheet:Risk Rankings'):
+                self._create_risk_ranking_sheets(aggregates['risk_rankings'], writer, workbook)
 
             # Visualization Techniques Sheet
             self._create_visualization_techniques_sheet(writer, workbook)
@@ -152,8 +329,6 @@ class AWSComplianceReporter:
             # Advanced Configuration Sheet
             self._create_advanced_configuration_sheet(writer, workbook)
 
-        print(f"Comprehensive report generated: {output_file}")
-
     def _format_sheet(self, worksheet, workbook, df):
         """
         Advanced formatting for sheets with priority color coding
@@ -184,18 +359,38 @@ class AWSComplianceReporter:
                 priority_format = priority_formats.get(priority, workbook.add_format())
                 worksheet.write(row_num, df.columns.get_loc('priority'), priority, priority_format)
 
-    def _create_service_category_analysis(self, open_issues_df, writer, workbook):
+    def _build_service_analysis(self, cube):
         """
-        Create service category analysis sheet with color formatting
+        Open issues per service and control, grouped under category header rows
+        
+        Args:
+            cube (pd.DataFrame): Findings cube
+        
+        Returns:
+            pd.DataFrame: Service Analysis rows
+        """
+        # Open issues by service and control
+        return self._service_analysis_frame(service_controls(cube))
+
+    def _service_analysis_frame(self, grouped):
+        """
+        Lay out per-control open issue counts under category header rows
+        
+        Args:
+            grouped (pd.DataFrame): title, control_title, control_description, priority
+                and open_issues columns, sorted by the first four
+        
+        Returns:
+            pd.DataFrame: Service Analysis rows
         """
         service_summary = []
         sr_no = 1
 
         for service_category, services in CATEGORIES.items():
-            category_df = open_issues_df[open_issues_df['title'].isin(services)]
+            category_grouped = grouped[grouped['title'].isin(services)]
             
             # Skip empty categories
-            if category_df.empty:
+            if category_grouped.empty:
                 continue
 
             # Add category header
@@ -206,10 +401,7 @@ class AWSComplianceReporter:
                 'Priority': ''
             })
 
-            # Aggregate by service and control
-            grouped = category_df.groupby(['title', 'control_title', 'control_description', 'priority']).size().reset_index(name='open_issues')
-
-            for _, row in grouped.iterrows():
+            for _, row in category_grouped.iterrows():
                 service_summary.append({
                     'Category': sr_no,
                     'Service': row['title'],
@@ -226,7 +418,12 @@ class AWSComplianceReporter:
                 'Description': '', 'Open Issues': '', 'Priority': ''
             })
 
-        service_summary_df = pd.DataFrame(service_summary)
+        return pd.DataFrame(service_summary, columns=SERVICE_ANALYSIS_COLUMNS)
+
+    def _create_service_category_analysis(self, service_summary_df, writer, workbook):
+        """
+        Create service category analysis sheet with color formatting
+        """
         service_summary_df.to_excel(writer, sheet_name='Service Analysis', index=False)
         
         # Format Service Analysis sheet
@@ -247,18 +444,39 @@ class AWSComplianceReporter:
             priority_format = priority_formats.get(priority, workbook.add_format())
             worksheet.write(row_num, service_summary_df.columns.get_loc('Priority'), priority, priority_format)
 
-    def _create_priority_summary(self, df, writer, workbook):
+    def _build_priority_summary(self, cube):
         """
-        Create priority summary sheet with chart
+        Finding count per priority plus a Total row
+        
+        Args:
+            cube (pd.DataFrame): Findings cube
+        
+        Returns:
+            pd.DataFrame: Priority and Count columns
+        """
+        return self._priority_summary_frame(priority_counts(cube))
+
+    def _priority_summary_frame(self, priority_counts):
+        """
+        Priority and Count columns plus a Total row
+        
+        Args:
+            priority_counts (pd.Series): Count per priority, most frequent first
+        
+        Returns:
+            pd.DataFrame: Priority and Count columns
         """
-        priority_counts = df['priority'].value_counts()
         summary_df = priority_counts.reset_index()
         summary_df.columns = ['Priority', 'Count']
 
         # Add total row
         total_row = pd.DataFrame([['Total', summary_df['Count'].sum()]], columns=['Priority', 'Count'])
-        summary_df = pd.concat([summary_df, total_row], ignore_index=True)
+        return pd.concat([summary_df, total_row], ignore_index=True)
 
+    def _create_priority_summary(self, summary_df, writer, workbook):
+        """
+        Create priority summary sheet with chart
+        """
         summary_df.to_excel(writer, sheet_name='Priority Summary', index=False)
         worksheet = writer.sheets['Priority Summary']
 
@@ -280,18 +498,22 @@ class AWSComplianceReporter:
         chart.set_legend({'position': 'bottom'})
         worksheet.insert_chart('D2', chart)
 
-    def _create_pivot_analysis(self, df, writer, workbook):
+    def _build_service_pivot(self, cube):
+        """
+        Finding count per service (rows) and priority (columns)
+        
+        Args:
+            cube (pd.DataFrame): Findings cube
+        
+        Returns:
+            pd.DataFrame: Pivot indexed by service title
+        """
+        return service_pivot(cube)
+
+    def _create_pivot_analysis(self, service_pivot, writer, workbook):
         """
         Create pivot tables and analysis with chart
         """
-        # Pivot by Service
-        service_pivot = pd.pivot_table(
-            df, 
-            index=['title'], 
-            columns=['priority'], 
-            aggfunc='size', 
-            fill_value=0
-        )
         service_pivot.to_excel(writer, sheet_name='Service Pivot')
         
         # Add chart to Service Pivot sheet
@@ -317,7 +539,31 @@ class AWSComplianceReporter:
         chart.set_legend({'position': 'bottom'})
         worksheet.insert_chart('E2', chart)
 
-        return service_pivot
+    def _create_risk_ranking_sheets(self, rankings, writer, workbook):
+        """
+        Create one ranking sheet per dimension with a chart of the ten riskiest entries
+        """
+        for sheet_name, ranking in rankings.items():
+            ranking.to_excel(writer, sheet_name=sheet_name, index=False)
+            worksheet = writer.sheets[sheet_name]
+            worksheet.set_column(1, 1, 28)
+            worksheet.set_column(2, len(ranking.columns) - 1, 16)
+
+            top = min(len(ranking), 10)
+            if not top:
+                continue
+            chart = workbook.add_chart({'type': 'bar'})
+            chart.add_series({
+                'name': 'Risk Score',
+                'categories': f"='{sheet_name}'!$B$2:$B${top + 1}",
+                'values': f"='{sheet_name}'!$C$2:$C${top + 1}",
+                'fill': {'color': COLOR_MAP['High']}
+            })
+            chart.set_title({'name': f"Top {top} by Weighted Risk"})
+            chart.set_x_axis({'name': 'Risk Score'})
+            chart.set_y_axis({'reverse': True})
+            chart.set_legend({'none': True})
+            worksheet.insert_chart('H2', chart)
 
     def _create_visualization_techniques_sheet(self, writer, workbook):
         """
@@ -337,21 +583,10 @@ class AWSComplianceReporter:
         """
         Create a sheet with advanced configuration details
         """
+        # The weights the risk rankings were scored with
         config_data = {
-            'Service Criticality': {
-                'Security and Identity': 1.5,
-                'Compute': 1.3,
-                'Database': 1.4,
-                'Network': 1.2,
-                'Storage': 1.1,
-                'Other': 1.0
-            },
-            'Priority Impact Scores': {
-                'High': 10,
-                'Medium': 5,
-                'Low': 2,
-                'Safe': 0
-            },
+            'Service Criticality': self.risk_weights.service_criticality,
+            'Priority Impact Scores': self.risk_weights.priority_impact,
             'Color Mapping': COLOR_MAP
         }
 
@@ -367,17 +602,45 @@ class AWSComplianceReporter:
         config_df.to_excel(writer, sheet_name='Advanced Configuration', index=False)
 
 def main():
+    parser = argparse.ArgumentParser(description="AWS Compliance Reporting Tool")
+    parser.add_argument('--format', choices=['xlsx', 'html', 'both'], default='xlsx',
+                        help="'html' writes a self-contained dashboard with filterable findings "
+                             "instead of (or, with 'both', next to) the Excel workbook")
+    add_shard_arguments(parser)
+    add_overflow_arguments(parser)
+    add_xlsx_reader_arguments(parser)
+    add_schema_arguments(parser)
+    add_merge_arguments(parser)
+    add_risk_arguments(parser)
+    add_io_arguments(parser)
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, 'AWSComplianceReporter')
+
     print("AWS Compliance Reporting Tool")
     
-    # Input file selection
-    input_file = input("Enter input compliance report file (CSV/Excel): ").strip()
+    # Input file selection; merged runs name their exports on the command line
+    if args.merge:
+        input_file = "merged"
+    else:
+        input_file = input("Enter input compliance report file (CSV/Excel): ").strip()
     
     try:
         priority_file = input("Enter priority annotations file (default: PowerPipeControls_Annotations.xlsx): ").strip() or "PowerPipeControls_Annotations.xlsx"
         
         # Create reporter and generate report
-        reporter = AWSComplianceReporter(input_file, priority_file)
-        reporter.generate_comprehensive_report()
+        metrics = metrics_from_args(args, os.path.basename(input_file))
+        reporter = AWSComplianceReporter(input_file, priority_file, profiler=profiler, metrics=metrics,
+                                         xlsx_engine=args.xlsx_engine, benchmark=args.benchmark,
+                                         io_workers=args.io_workers, merge_files=args.merge,
+                                         risk_weights=risk_weights_from_args(args))
+        reporter.generate_comprehensive_report(output_format=args.format, shard_by=args.shard_by,
+                                               shard_workers=args.shard_workers,
+                                               overflow=overflow_from_args(args))
+
+        if args.profile:
+            profiler.write_json(args.profile)
 
     except Exception as e:
         print(f"An error occurred: {e}")
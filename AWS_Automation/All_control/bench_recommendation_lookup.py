@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from One_ReportFormatter import categories, create_enhanced_report
+
+
+def make_synthetic_findings(rows, controls=300, seed=0):
+    """
+    Build an enriched findings frame shaped like a Powerpipe all_controls export
+
+    Args:
+        rows (int): Number of finding rows
+        controls (int, optional): Number of distinct controls
+        seed (int, optional): Random seed
+
+    Returns:
+        pd.DataFrame: Findings with priority and recommendation columns filled
+    """
+    rng = np.random.default_rng(seed)
+    services = [service for service_list in categories.values() for service in service_list]
+
+    control_service = [services[i % len(services)] for i in range(controls)]
+    control_titles = [f"{service} control {i} should be configured securely" for i, service in enumerate(control_service)]
+    descriptions = [f"Ensure {title.lower()} to follow AWS best practices. " * 3 for title in control_titles]
+    recommendations = [f"Steps: 1. Review the {service} configuration. 2. Apply the recommended setting. "
+                       f"3. Re-run the benchmark to confirm the change. " * 4 for service in control_service]
+    priorities = rng.choice(['High', 'Medium', 'Low'], controls)
+
+    control_idx = rng.integers(0, controls, rows)
+    status = rng.choice(['alarm', 'ok', 'info', 'skip'], rows, p=[0.55, 0.35, 0.05, 0.05])
+    is_safe = status != 'alarm'
+
+    return pd.DataFrame({
+        'group_id': 'aws_compliance.benchmark.all_controls',
+        'title': np.take(control_service, control_idx),
+        'control_id': [f"aws_compliance.control.c{i}" for i in control_idx],
+        'control_title': np.take(control_titles, control_idx),
+        'control_description': np.take(descriptions, control_idx),
+        'reason': np.where(is_safe, 'Resource is compliant.', 'Resource is not compliant.'),
+        'resource': [f"arn:aws:service:us-east-1:123456789012:resource/r-{i:08d}" for i in range(rows)],
+        'status': status,
+        'severity': 'high',
+        'account_id': rng.choice(['123456789012', '210987654321'], rows),
+        'region': rng.choice(['us-east-1', 'ap-south-1', 'eu-west-1'], rows),
+        'priority': np.where(is_safe, 'Safe/Well Architected', np.take(priorities, control_idx)),
+        'Recommendation Steps/Approach': np.take(recommendations, control_idx),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inline recommendations with the Control Lookup sheet")
+    parser.add_argument('--rows', type=int, default=1000000, help="Synthetic finding rows (default: 1,000,000)")
+    parser.add_argument('--writer', choices=['xlsxwriter', 'parallel'], default='xlsxwriter')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic findings...")
+    df = make_synthetic_findings(args.rows)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for mode in ['inline', 'lookup']:
+            output_file = os.path.join(temp_dir, f"bench_{mode}.xlsx")
+            start = time.perf_counter()
+            create_enhanced_report(df.copy(), output_file, writer_mode=args.writer, workers=args.workers,
+                                   recommendation_mode=mode)
+            elapsed = time.perf_counter() - start
+            size_mb = os.path.getsize(output_file) / (1024 * 1024)
+            print(f"{mode:<7} writer={args.writer:<10} rows={args.rows:,}  time={elapsed:8.2f}s  size={size_mb:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from bench_recommendation_lookup import make_synthetic_findings
+from xlsx_reader import CalamineWorkbook, read_xlsx
+
+# Columns the reports use; the rest of an export is only carried along
+REPORT_COLUMNS = ['title', 'control_title', 'control_description', 'reason', 'resource', 'status',
+                  'account_id', 'region']
+
+
+def make_export(rows):
+    """
+    Synthetic Powerpipe export with the wide columns the reports never read
+
+    Args:
+        rows (int): Number of finding rows
+
+    Returns:
+        pd.DataFrame: Raw export without priority or recommendation columns
+    """
+    df = make_synthetic_findings(rows).drop(columns=['priority', 'Recommendation Steps/Approach'])
+    df['description'] = 'Benchmark group description. ' * 6
+    df['dimensions'] = '{"account_id": "123456789012", "region": "us-east-1"}'
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the xlsx input engines on a synthetic export")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic finding rows (default: 100,000)")
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic findings...")
+    df = make_export(args.rows)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        xlsx_file = os.path.join(temp_dir, 'bench.xlsx')
+        csv_file = os.path.join(temp_dir, 'bench.csv')
+        df.to_excel(xlsx_file, index=False)
+        df.to_csv(csv_file, index=False)
+
+        readers = [
+            ('pandas read_excel openpyxl', lambda usecols: pd.read_excel(xlsx_file, engine='openpyxl', usecols=usecols)),
+            ('read_xlsx openpyxl', lambda usecols: read_xlsx(xlsx_file, usecols=usecols, engine='openpyxl')),
+        ]
+        if CalamineWorkbook is not None:
+            readers += [
+                ('pandas read_excel calamine', lambda usecols: pd.read_excel(xlsx_file, engine='calamine', usecols=usecols)),
+                ('read_xlsx calamine', lambda usecols: read_xlsx(xlsx_file, usecols=usecols, engine='calamine')),
+            ]
+        else:
+            print("python-calamine is not installed; skipping the calamine engine")
+        readers.append(('pandas read_csv (reference)', lambda usecols: pd.read_csv(csv_file, usecols=usecols,
+                                                                                  low_memory=False)))
+
+        for name, read in readers:
+            for usecols in [None, REPORT_COLUMNS]:
+                start = time.perf_counter()
+                frame = read(usecols)
+                elapsed = time.perf_counter() - start
+                columns = 'all' if usecols is None else len(usecols)
+                print(f"{name:<28} columns={columns!s:<4} rows={len(frame):,}  time={elapsed:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from export_schema import detect_benchmark, read_export, read_header, schema_for
+from io_stages import DEFAULT_IO_WORKERS, StageGraph
+from stage_profiler import NULL_PROFILER
+
+# Columns that identify one finding across benchmarks
+DEDUP_KEYS = ['control_title', 'resource', 'account_id', 'region']
+
+# Annotation columns whose values must agree between repeated control_title rows
+ANNOTATION_VALUES = ['priority', 'Recommendation Steps/Approach']
+
+
+def benchmark_label(path):
+    """Benchmark a finding is tagged with: the detected benchmark, or the file name"""
+    return detect_benchmark(path, default=None) or os.path.splitext(os.path.basename(path))[0]
+
+
+def load_exports(paths, xlsx_engine='auto', io_workers=DEFAULT_IO_WORKERS, profiler=NULL_PROFILER):
+    """
+    Read several benchmark exports concurrently, each with its own schema
+
+    Args:
+        paths (list): Export files
+        xlsx_engine (str, optional): 'auto', 'calamine' or 'openpyxl' for Excel input
+        io_workers (int, optional): Threads reading the exports
+        profiler (StageProfiler, optional): Records one 'load:<file>' stage per export
+
+    Returns:
+        list: (benchmark label, DataFrame) pairs in the order of paths
+    """
+    schemas = [schema_for(path) for path in paths]
+    # Every header is checked before any export is read, so one bad file fails the run up front
+    for path, schema in zip(paths, schemas):
+        schema.columns(read_header(path, xlsx_engine), path)
+
+    loads = StageGraph(io_workers, profiler)
+    outputs = [loads.add(f'load:{os.path.basename(path)}', read_export, path, schema, xlsx_engine)
+               for path, schema in zip(paths, schemas)]
+    results = loads.run()
+    return [(benchmark_label(path), results[output.name]) for path, output in zip(paths, outputs)]
+
+
+def merge_findings(exports):
+    """
+    Deduplicate findings reported by several benchmarks
+
+    A finding is identified by a 64-bit hash of DEDUP_KEYS. The first
+    occurrence is kept, in export order, and tagged with every benchmark
+    that reported it. Benchmarks are combined as bit masks, so tagging
+    costs one groupby however many exports are merged.
+
+    Args:
+        exports (list): (benchmark label, DataFrame) pairs
+
+    Returns:
+        tuple: (merged DataFrame with a 'benchmarks' column, stats dict)
+    """
+    labels = list(dict.fromkeys(label for label, _ in exports))
+    bits = {label: 1 << number for number, label in enumerate(labels)}
+
+    combined = pd.concat([df for _, df in exports], ignore_index=True)
+    keys = pd.util.hash_pandas_object(combined[DEDUP_KEYS], index=False).to_numpy()
+    finding_bits = np.repeat([bits[label] for label, _ in exports], [len(df) for _, df in exports])
+
+    # Each distinct (finding, benchmark) pair adds its bit once, so the sum is the bitwise OR
+    pairs = pd.DataFrame({'key': keys, 'bit': finding_bits}).drop_duplicates()
+    masks = pairs.groupby('key', sort=False)['bit'].sum()
+
+    first = ~pd.Series(keys).duplicated().to_numpy()
+    merged = combined[first].reset_index(drop=True)
+    merged_masks = masks.reindex(keys[first]).to_numpy()
+    names = {mask: ', '.join(label for label in labels if mask & bits[label]) for mask in np.unique(merged_masks)}
+    merged['benchmarks'] = pd.Series(merged_masks).map(names)
+
+    # Findings whose status differs between benchmarks keep the first export's status
+    statuses = pd.DataFrame({'key': keys, 'status': combined['status'].to_numpy()}).drop_duplicates()
+    stats = {
+        'rows_in': len(combined),
+        'rows_out': len(merged),
+        'per_benchmark': {label: int(np.count_nonzero(merged_masks & bits[label])) for label in labels},
+        'status_conflicts': int(statuses['key'].duplicated().sum())
+    }
+    return merged, stats
+
+
+def describe_merge(stats):
+    """One-line description of a merge for the console"""
+    per_benchmark = ', '.join(f"{label} {rows}" for label, rows in stats['per_benchmark'].items())
+    line = (f"{stats['rows_in']} findings from {len(stats['per_benchmark'])} benchmarks merged into "
+            f"{stats['rows_out']} ({per_benchmark})")
+    if stats['status_conflicts']:
+        line += f"; {stats['status_conflicts']} findings differ in status between benchmarks"
+    return line
+
+
+def load_merged(paths, xlsx_engine='auto', io_workers=DEFAULT_IO_WORKERS, profiler=NULL_PROFILER):
+    """
+    Read and deduplicate several benchmark exports
+
+    Returns:
+        pd.DataFrame: Merged findings with a 'benchmarks' column
+    """
+    exports = load_exports(paths, xlsx_engine, io_workers, profiler)
+    with profiler.stage('merge_benchmarks'):
+        merged, stats = merge_findings(exports)
+    print(describe_merge(stats))
+    return merged
+
+
+def build_annotation_index(df_priority):
+    """
+    Annotation table with one row per control_title
+
+    Enrichment uses the first row of a control_title, so the index keeps
+    that row and the same priorities and recommendations come out.
+    Repeated titles are returned for reporting, flagged as conflicting
+    when their priority or recommendation differ.
+
+    Args:
+        df_priority (pd.DataFrame): Annotation database
+
+    Returns:
+        tuple: (indexed annotations, DataFrame of repeated control titles with
+            'rows' and 'conflicting' columns)
+    """
+    repeated = df_priority[df_priority['control_title'].duplicated(keep=False)]
+    value_columns = [column for column in ANNOTATION_VALUES if column in df_priority.columns]
+    grouped = repeated.groupby('control_title', sort=False)
+    duplicates = pd.DataFrame({
+        'rows': grouped.size(),
+        'conflicting': grouped[value_columns].nunique(dropna=False).gt(1).any(axis=1)
+    }).reset_index()
+    return df_priority.drop_duplicates('control_title').reset_index(drop=True), duplicates
+
+
+def describe_duplicates(duplicates, limit=10):
+    """
+    Console report of repeated control titles in the annotation database
+
+    Returns:
+        list: Lines to print; empty when every control_title is unique
+    """
+    if duplicates.empty:
+        return []
+    conflicting = int(duplicates['conflicting'].sum())
+    lines = [f"Annotation database repeats {len(duplicates)} control titles ({conflicting} with conflicting "
+             f"priority or recommendation); the first row of each is used:"]
+    for row in duplicates.head(limit).itertuples(index=False):
+        lines.append(f"  {row.control_title} ({row.rows} rows{', conflicting' if row.conflicting else ''})")
+    if len(duplicates) > limit:
+        lines.append(f"  ... and {len(duplicates) - limit} more")
+    return lines
+
+
+def load_annotation_index(priority_file):
+    """
+    Read the annotation database and report its repeated control titles
+
+    Returns:
+        pd.DataFrame: Annotations with one row per control_title
+    """
+    index, duplicates = build_annotation_index(pd.read_excel(priority_file))
+    for line in describe_duplicates(duplicates):
+        print(line)
+    return index
+
+
+def add_merge_arguments(parser):
+    """
+    Add the option that merges several benchmark exports
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--merge', nargs='+', metavar='EXPORT', default=None,
+                        help="Merge several benchmark exports (e.g. all_controls, foundational_security, "
+                             "top_10) into one report; findings with the same control, resource, account "
+                             "and region are kept once and tagged with every benchmark that reported them")
@@ -0,0 +1,389 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from docx import Document
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Inches, RGBColor
+
+# Bump when the layout of the static sections changes, to invalidate cached templates
+TEMPLATE_VERSION = 1
+
+DEFAULT_TEMPLATE_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'compliance_report_templates')
+
+# Paragraphs in the cached template that are replaced by the per-client content
+TITLE_PLACEHOLDER = '{{TITLE_PAGE}}'
+SECTIONS_PLACEHOLDER = '{{ANALYSIS_SECTIONS}}'
+LINK_PLACEHOLDER = '{{DETAILED_REPORT_LINK}}'
+APPENDIX_PLACEHOLDER = '{{APPENDIX}}'
+
+OVERVIEW_TEXT = (
+    "The Cloud Security Posture Report is a comprehensive evaluation of your cloud environment, "
+    "focusing on its alignment with critical industry standards like CIS, SOC 2, PCI DSS, and best practices. "
+    "It provides actionable insights into potential risks and areas requiring attention, helping organizations maintain "
+    "a robust security posture.\n\n"
+    "Resource Inventory:\n"
+    "• Offers a detailed count of all resources in your cloud environment, categorized by type (e.g., compute instances, "
+    "storage buckets, managed databases).\n"
+    "• Helps identify the breadth of resources being managed and ensures no critical resource is overlooked.\n\n"
+    "Account/Region Breakdown:\n"
+    "• Displays the distribution of resources across different accounts and regions.\n"
+    "• Enables easy identification of resource concentration and highlights potential regional compliance concerns.\n\n"
+    "Configuration Compliance:\n"
+    "• Tracks key security and operational configurations, such as whether encryption, logging, or versioning is enabled.\n"
+    "• Provides percentages to help assess how well your resources adhere to compliance and security best practices.\n\n"
+    "Resource Age:\n"
+    "• Identifies the age of resources, such as instances or snapshots, to assist in lifecycle management.\n"
+    "• Helps in understanding resource utilization patterns and supports decisions on archiving, upgrading, or retiring resources."
+)
+
+SERVICE_ANALYSIS_DESCRIPTION = (
+    "This table provides an overview of critical compliance controls for Auto Scaling, EC2, S3, and more. "
+    "It includes descriptions, open issues, and priority levels to ensure security and operational efficiency. "
+    "Refer to the attached Excel sheet for details."
+)
+
+RISK_RANKING_DESCRIPTION = (
+    "Each finding is scored by the impact of its priority, weighted by how critical its service category is "
+    "(see the Advanced Configuration sheet of the Excel report). The tables rank the service categories and the "
+    "services by their total score, so remediation effort can go where it removes the most risk."
+)
+
+CHART_DESCRIPTION = (
+    "This chart illustrates the allocation of control titles across different AWS services, offering a comprehensive view "
+    "of the implemented controls for compliance management. It emphasizes the service areas with the highest concentration "
+    "of controls, helping prioritize resource allocation effectively."
+)
+
+LINK_DESCRIPTION = (
+    "In this link, you will find detailed information for each service, including its ID, ARN, and other essential details "
+    "such as title, control_title, control_description, region, account_id, resource, reason, description, priority, "
+    "Recommendation Steps/Approach, and status. For example, the following data will be available for each service:\n\n"
+
+    "**Example 1:**\n"
+    "**Service**: ACM\n"
+    "**Control Title**: ACM certificates should not expire within 30 days\n"
+    "**Control Description**: Ensure network integrity is protected by ensuring X509 certificates are issued by AWS ACM.\n"
+    "**Region**: ap-south-1\n"
+    "**Account ID**: [Account ID]\n"
+    "**ARN**: [ARN Information]\n"
+    "**Resource**: [Resource Expiry Information]\n"
+    "**Reason**: This section contains recommendations for configuring ACM resources.\n"
+    "**Priority**: High\n"
+    "**Recommendation Steps/Approach**: Ensure the AWS account is a member of AWS Organizations. Steps: 1. Review account settings. 2. Enroll in AWS Organizations if not already a member.\n"
+    "**Status**: ok\n\n"
+
+    "**Detailed Explanation:**\n"
+    "**Service**: Indicates that the compliance check pertains to AWS ACM (Certificate Manager).\n\n"
+    "**Control Title**: The control ensures that no ACM certificates in use are set to expire within the next 30 days. "
+    "This is critical for maintaining secure communication and avoiding service disruptions.\n\n"
+    "**Control Description**: Emphasizes the importance of using X509 certificates issued by AWS ACM to ensure network integrity "
+    "and secure connections.\n\n"
+    "**Region**: Specifies the geographical region where this compliance check applies, which is ap-south-1 in this case.\n\n"
+    "**Account ID**: Placeholder for the unique identifier of the AWS account being evaluated.\n\n"
+    "**ARN**: Placeholder for the Amazon Resource Name, which uniquely identifies the specific resource being referred to.\n\n"
+    "**Resource**: Placeholder for information regarding the expiration details of the certificates under review.\n\n"
+    "**Reason**: Indicates the purpose of this compliance check, which is to provide recommendations for configuring ACM resources effectively.\n\n"
+    "**Priority Levels:**\n"
+    "- **High**: Requires immediate attention and is critical.\n"
+    "- **Medium**: After resolving high-priority items, medium-priority issues can be addressed.\n"
+    "- **Low**: Issues that are less urgent and can be addressed as time permits.\n"
+    "- **Safe/Well-Architected**: These resources already follow best practices and meet all requirements; no action is needed.\n\n"
+    "**Status:**\n"
+    "- **ok**: The resource is compliant with best practices.\n"
+    "- **info**: Additional information is provided, but no action is required.\n"
+    "- **skip**: The check was skipped as it does not apply in this context.\n"
+    "- **alarm**: Action is required to bring the resource into compliance with best practices.\n"
+)
+
+KEY_COMPONENTS = [
+    ("1", "Security Services"),
+    ("2", "Compute Services"),
+    ("3", "Storage Services"),
+    ("4", "Network Services"),
+    ("5", "Database Services"),
+    ("6", "Safe and Unsafe Issues"),
+    ("7", "Analysis Graph")
+]
+
+SYNOPSIS_TEXT = (
+    "This report outlines the security and compliance status of AWS resources, focusing on best practices and recommendations "
+    "provided by AWS Security Hub and other AWS services. The goal is to ensure that AWS environments are configured to minimize "
+    "security risks, maintain compliance, and safeguard sensitive data and resources. The sections below cover different aspects of "
+    "the AWS security landscape, including Identity and Access Management (IAM), Key Management Service (KMS), AWS GuardDuty, "
+    "CloudWatch, CloudTrail, and more. Each section will detail specific findings, associated risks, and compliance levels, as well "
+    "as actionable recommendations for enhancing the overall security posture.\n\n"
+
+    "1. IAM (Identity and Access Management):\n"
+    "- Description: IAM is crucial for managing access to AWS services and resources securely. It allows fine-grained access control "
+    "and ensures that users and roles have only the necessary permissions.\n"
+    "- Key Findings: Ensure IAM password policies expire passwords within 90 days or less. Prevent password reuse and require a minimum "
+    "length of 14 characters. Ensure that policies are applied to groups or roles, not users directly. Enable MFA for all admin users.\n"
+    "- Recommendations: Regularly review IAM policies to ensure password strength, role configurations, and MFA settings are enforced.\n\n"
+
+    "2. KMS (Key Management Service):\n"
+    "- Description: KMS helps with data encryption and key management, ensuring that data is kept secure both at rest and in transit.\n"
+    "- Key Findings: Enable automatic key rotation for Customer Managed Keys (CMKs).\n"
+    "- Recommendations: Implement key rotation to enhance data confidentiality and integrity.\n\n"
+
+    "3. GuardDuty:\n"
+    "- Description: GuardDuty is a threat detection service that continuously monitors AWS accounts and workloads for suspicious activity.\n"
+    "- Key Findings: Monitor and analyze alerts generated by GuardDuty to identify potential security risks.\n"
+    "- Recommendations: Ensure that GuardDuty is enabled across all regions and integrate with other security tools for better visibility.\n\n"
+
+    "4. CloudWatch:\n"
+    "- Description: CloudWatch enables monitoring of AWS resources and applications, providing real-time insights into system performance "
+    "and security events.\n"
+    "- Key Findings: Ensure CloudWatch alarms are set up for critical security events.\n"
+    "- Recommendations: Leverage CloudWatch for automated monitoring and incident detection.\n\n"
+
+    "5. CloudTrail:\n"
+    "- Description: CloudTrail logs all API calls and resource changes, providing a valuable audit trail for compliance and security audits.\n"
+    "- Key Findings: Ensure that CloudTrail trails are enabled in all regions. Configure trails to integrate with CloudWatch for centralized logging.\n"
+    "- Recommendations: Review CloudTrail logs regularly for unusual activities or policy violations.\n\n"
+
+    "6. VPC (Virtual Private Cloud):\n"
+    "- Description: VPC enables you to create isolated networks within the AWS environment, providing secure communication between resources.\n"
+    "- Key Findings: Restrict ingress to remote server administration ports (SSH, RDP) to avoid unauthorized access.\n"
+    "- Recommendations: Regularly review security group configurations and ensure that traffic is limited to necessary sources.\n\n"
+
+    "7. Secrets Manager:\n"
+    "- Description: AWS Secrets Manager securely stores and manages sensitive information like database credentials and API keys.\n"
+    "- Key Findings: Ensure that all sensitive information is encrypted and managed through Secrets Manager.\n"
+    "- Recommendations: Use Secrets Manager to reduce the risks of hardcoded secrets and ensure secure access management.\n\n"
+
+    "8. Backup:\n"
+    "- Description: Backup services provide automated backup solutions to safeguard critical data against loss or corruption.\n"
+    "- Key Findings: Ensure backup plans and vaults are configured across all regions.\n"
+    "- Recommendations: Implement backup plans with redundancy across regions to ensure data durability and disaster recovery.\n\n"
+
+    "9. EC2 (Elastic Compute Cloud):\n"
+    "- Description: EC2 provides scalable computing capacity in the cloud, and securing EC2 instances is vital for maintaining overall system integrity.\n"
+    "- Key Findings: Ensure EC2 instances have termination protection and are using IAM profiles for secure access.\n"
+    "- Recommendations: Regularly monitor EC2 instances for security vulnerabilities and ensure secure configurations are applied.\n\n"
+
+    "10. Config (AWS Config):\n"
+    "- Description: AWS Config provides configuration tracking and compliance auditing for AWS resources, helping organizations monitor "
+    "changes and ensure adherence to security standards.\n"
+    "- Key Findings: Ensure AWS Config is enabled to track changes across resources.\n"
+    "- Recommendations: Use AWS Config to continuously monitor compliance and ensure configurations meet organizational security policies.\n\n"
+)
+
+CONCLUSION_TEXT = (
+    "The findings from this report highlight areas of improvement across various AWS services and resources. By implementing the recommended "
+    "best practices and security measures, organizations can strengthen their security posture, ensure compliance, and reduce the risk of potential "
+    "security breaches. Regular monitoring, audits, and updates to security policies and configurations are essential to maintaining a secure and "
+    "compliant AWS environment.\n\n"
+
+    "Additionally, it is important to consider other critical AWS services for security and compliance purposes, such as:\n"
+    "- AWS WAF (Web Application Firewall): Protects applications from common web exploits.\n"
+    "- AWS Shield: Provides protection against DDoS attacks.\n"
+    "- AWS Macie: Helps with data privacy by automatically discovering and classifying sensitive data.\n"
+    "- AWS Security Hub: Centralizes security findings from multiple AWS services for easier management.\n"
+    "- AWS Inspector: Automates security assessments and identifies vulnerabilities in EC2 instances.\n"
+    "- AWS Trusted Advisor: Provides real-time guidance to help provision resources following best practices.\n\n"
+    "By integrating these services into the overall security strategy, organizations can ensure a more holistic, robust approach to "
+    "securing their AWS environments."
+)
+
+
+def setup_page(document, logo_path=None):
+    """
+    Apply the 13x10 inch page layout and the header with logo and page number
+
+    Args:
+        document (docx.Document): Document to set up
+        logo_path (str, optional): Logo image for the left header cell
+    """
+    for section in document.sections:
+        section.page_height = Inches(10)
+        section.page_width = Inches(13)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+
+        # Add header with logo
+        header = section.header
+        header_table = header.add_table(1, 2, width=Inches(11))
+
+        # Add page number to header
+        header_cell_right = header_table.cell(0, 1)
+        paragraph = header_cell_right.paragraphs[0]
+        run = paragraph.add_run()
+        fldChar1 = OxmlElement('w:fldChar')
+        fldChar1.set(qn('w:fldCharType'), 'begin')
+        instrText = OxmlElement('w:instrText')
+        instrText.text = 'PAGE'
+        fldChar2 = OxmlElement('w:fldChar')
+        fldChar2.set(qn('w:fldCharType'), 'end')
+        run._r.append(fldChar1)
+        run._r.append(instrText)
+        run._r.append(fldChar2)
+        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
+
+        # Add logo if provided
+        if logo_path and os.path.exists(logo_path):
+            header_cell_left = header_table.cell(0, 0)
+            paragraph = header_cell_left.paragraphs[0]
+            run = paragraph.add_run()
+            run.add_picture(logo_path, width=Inches(1))
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+
+
+def add_overview(document):
+    """Add the Overview paragraphs that follow the title page"""
+    overview_paragraph = document.add_paragraph()
+    run = overview_paragraph.add_run("Overview:")
+    run.bold = True
+    document.add_paragraph(OVERVIEW_TEXT)
+
+
+def add_link_section(document):
+    """Add the Link of Detailed Report explanation and the Key Components table"""
+    document.add_page_break()
+    link_section = document.add_heading("Link of Detailed Report", level=2)
+    link_section.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    document.add_paragraph(LINK_DESCRIPTION)
+
+    # Create a table for Key Components
+    table = document.add_table(rows=1, cols=2)
+    table.style = 'Table Grid'
+    table.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = "S.No"
+    hdr_cells[1].text = "Category"
+
+    for component in KEY_COMPONENTS:
+        row_cells = table.add_row().cells
+        row_cells[0].text = component[0]
+        row_cells[1].text = component[1]
+
+
+def add_link_paragraph(document, services_link):
+    """Add the client's detailed report link with hyperlink formatting"""
+    link_para = document.add_paragraph()
+    link_run = link_para.add_run("Link: ")
+    link_run.bold = True
+
+    hyperlink_run = link_para.add_run(services_link)
+    hyperlink_run.font.color.rgb = RGBColor(0, 0, 255)  # Blue color
+    hyperlink_run.underline = True
+
+
+def add_synopsis(document):
+    """Add the ten-item Synopsis section"""
+    document.add_page_break()
+    synopsis_section = document.add_heading("Synopsis", level=2)
+    synopsis_section.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    document.add_paragraph(SYNOPSIS_TEXT)
+
+
+def add_conclusion(document):
+    """Add the Conclusion section"""
+    document.add_page_break()
+    conclusion_section = document.add_heading("Conclusion", level=2)
+    conclusion_section.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    document.add_paragraph(CONCLUSION_TEXT)
+
+
+def template_key(logo_path=None):
+    """
+    Hash of everything that goes into the static template
+
+    Args:
+        logo_path (str, optional): Header logo image
+
+    Returns:
+        str: Hex digest identifying the template
+    """
+    digest = hashlib.sha256(f"v{TEMPLATE_VERSION}".encode('utf-8'))
+    for text in [OVERVIEW_TEXT, LINK_DESCRIPTION, SYNOPSIS_TEXT, CONCLUSION_TEXT, repr(KEY_COMPONENTS)]:
+        digest.update(text.encode('utf-8'))
+    if logo_path and os.path.exists(logo_path):
+        with open(logo_path, 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def build_template(output_file, logo_path=None):
+    """
+    Build the base document: page layout, header, styles and static sections
+
+    The per-client parts are marked by placeholder paragraphs.
+
+    Args:
+        output_file (str): Path of the .docx to write
+        logo_path (str, optional): Header logo image
+    """
+    document = Document()
+    setup_page(document, logo_path)
+
+    document.add_paragraph(TITLE_PLACEHOLDER)
+    add_overview(document)
+    document.add_paragraph(SECTIONS_PLACEHOLDER)
+    add_link_section(document)
+    document.add_paragraph(LINK_PLACEHOLDER)
+    add_synopsis(document)
+    add_conclusion(document)
+    document.add_paragraph(APPENDIX_PLACEHOLDER)
+
+    document.save(output_file)
+
+
+def cached_template(cache_dir=DEFAULT_TEMPLATE_CACHE, logo_path=None):
+    """
+    Path of the cached base template, building it on first use
+
+    Args:
+        cache_dir (str, optional): Directory holding cached templates
+        logo_path (str, optional): Header logo image
+
+    Returns:
+        str: Path to the template .docx
+    """
+    template_file = os.path.join(cache_dir, f"report_template_{template_key(logo_path)[:16]}.docx")
+    if not os.path.exists(template_file):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Build next to the target and rename, so parallel runs never read a partial file
+        fd, temp_file = tempfile.mkstemp(suffix='.docx', dir=cache_dir)
+        os.close(fd)
+        try:
+            build_template(temp_file, logo_path)
+            os.replace(temp_file, template_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+    return template_file
+
+
+@contextmanager
+def insert_at_placeholder(document, marker):
+    """
+    Move everything added to the document inside the block to the placeholder
+
+    python-docx only appends to the end of the body, so the block's content
+    is built there and then moved in front of the placeholder paragraph,
+    which is removed afterwards.
+
+    Args:
+        document (docx.Document): Document cloned from the template
+        marker (str): Placeholder text, e.g. TITLE_PLACEHOLDER
+    """
+    body = document.element.body
+    placeholder = next(
+        p for p in body.iterchildren(qn('w:p')) if ''.join(p.xpath('.//w:t/text()')) == marker
+    )
+    trailing = 1 if body[-1].tag == qn('w:sectPr') else 0
+    start = len(body) - trailing
+
+    yield
+
+    for element in list(body)[start:len(body) - trailing]:
+        placeholder.addprevious(element)
+    body.remove(placeholder)
@@ -0,0 +1,170 @@
+import os
+
+import pandas as pd
+
+from xlsx_reader import read_xlsx, read_xlsx_header
+
+# Text columns are read as plain strings; account IDs included, so leading zeros survive
+TEXT = 'str'
+
+# Columns every AWS report reads: the category and consolidated sheets, the
+# priority lookup and the per-account and per-region summaries
+AWS_REQUIRED = {
+    'title': TEXT, 'control_title': TEXT, 'control_description': TEXT, 'reason': TEXT,
+    'resource': TEXT, 'status': TEXT, 'account_id': TEXT, 'region': TEXT
+}
+
+# Identifiers carried into the raw findings sheets when the export has them
+AWS_USED = {'group_id': TEXT, 'control_id': TEXT, 'severity': TEXT}
+
+GCP_REQUIRED = {
+    'service': TEXT, 'title': TEXT, 'status': TEXT, 'control_title': TEXT, 'control_description': TEXT,
+    'reason': TEXT, 'resource': TEXT, 'project': TEXT, 'location': TEXT
+}
+
+GCP_USED = {'group_id': TEXT, 'control_id': TEXT, 'severity': TEXT}
+
+
+class SchemaError(ValueError):
+    """An export is missing columns its benchmark schema requires"""
+
+
+class ExportSchema:
+    def __init__(self, name, required, used=None, match=None):
+        """
+        Columns a benchmark export must and may carry, with their dtypes
+
+        Args:
+            name (str): Benchmark key
+            required (dict): Column name -> dtype; loading fails without them
+            used (dict, optional): Column name -> dtype; read when present
+            match (str, optional): File name fragment that identifies the benchmark
+        """
+        self.name = name
+        self.required = required
+        self.used = used or {}
+        self.match = match or name
+
+    def columns(self, header, path=''):
+        """
+        Columns to read from an export with the given header
+
+        Args:
+            header (list): Column names of the export
+            path (str, optional): File name used in the error message
+
+        Returns:
+            dict: Column name -> dtype for the required and present used columns
+
+        Raises:
+            SchemaError: When a required column is missing
+        """
+        present = set(header)
+        missing = [column for column in self.required if column not in present]
+        if missing:
+            raise SchemaError(f"{path or 'Input'} is missing columns the {self.name} schema requires: "
+                              f"{', '.join(missing)}")
+        wanted = {**self.required, **{k: v for k, v in self.used.items() if k in present}}
+        # File order, so the raw sheets keep the export's column order
+        return {column: wanted[column] for column in header if column in wanted}
+
+
+SCHEMAS = {
+    'all_controls': ExportSchema('all_controls', AWS_REQUIRED, AWS_USED),
+    'foundational_security': ExportSchema('foundational_security', AWS_REQUIRED, AWS_USED),
+    'top_10': ExportSchema('top_10', AWS_REQUIRED, AWS_USED),
+    'thrifty': ExportSchema('thrifty', AWS_REQUIRED, AWS_USED),
+    'well_architected': ExportSchema('well_architected', AWS_REQUIRED, AWS_USED),
+    'gcp': ExportSchema('gcp', GCP_REQUIRED, GCP_USED, match='gcp_'),
+}
+
+BENCHMARKS = ['auto'] + list(SCHEMAS)
+
+
+def detect_benchmark(path, default='all_controls'):
+    """
+    Benchmark of an export, from its file name
+
+    Args:
+        path (str): Export file
+        default (str, optional): Benchmark when the name matches none
+
+    Returns:
+        str: Key into SCHEMAS
+    """
+    name = os.path.basename(path).lower()
+    for key, schema in SCHEMAS.items():
+        if schema.match in name:
+            return key
+    return default
+
+
+def schema_for(path, benchmark='auto', default='all_controls'):
+    """
+    Schema to load an export with
+
+    Args:
+        path (str): Export file
+        benchmark (str, optional): Key into SCHEMAS, or 'auto' to detect it from the file name
+        default (str, optional): Benchmark used when 'auto' matches none
+
+    Returns:
+        ExportSchema: Schema for the export
+    """
+    if benchmark == 'auto':
+        benchmark = detect_benchmark(path, default)
+    if benchmark not in SCHEMAS:
+        raise ValueError(f"Unknown benchmark '{benchmark}'; expected one of {', '.join(BENCHMARKS)}")
+    return SCHEMAS[benchmark]
+
+
+def read_header(path, xlsx_engine='auto'):
+    """
+    Column names of a CSV or Excel export, without reading its rows
+
+    Raises:
+        ValueError: For file types other than CSV and Excel
+    """
+    if path.endswith('.csv'):
+        return list(pd.read_csv(path, nrows=0).columns)
+    if path.endswith(('.xlsx', '.xls')):
+        return read_xlsx_header(path, engine=xlsx_engine)
+    raise ValueError("Unsupported file type. Use CSV or Excel.")
+
+
+def read_export(path, schema, xlsx_engine='auto'):
+    """
+    Load a benchmark export with only the columns its schema lists
+
+    The header is checked first, so a wrong or truncated export fails before
+    any rows are parsed. Unlisted columns are never materialized and every
+    column is read with its schema dtype instead of being inferred.
+
+    Args:
+        path (str): CSV or Excel export
+        schema (ExportSchema): Schema of the export's benchmark
+        xlsx_engine (str, optional): 'auto', 'calamine' or 'openpyxl' for Excel input
+
+    Returns:
+        pd.DataFrame: Export restricted to the schema columns
+
+    Raises:
+        SchemaError: When a required column is missing
+        ValueError: For file types other than CSV and Excel
+    """
+    dtypes = schema.columns(read_header(path, xlsx_engine), path)
+    if path.endswith('.csv'):
+        return pd.read_csv(path, usecols=list(dtypes), dtype=dtypes)
+    return read_xlsx(path, usecols=list(dtypes), engine=xlsx_engine, dtype=dtypes)
+
+
+def add_schema_arguments(parser):
+    """
+    Add the option that picks the export's benchmark schema
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--benchmark', choices=BENCHMARKS, default='auto',
+                        help="Benchmark of the input export, which sets the columns read and required; "
+                             "'auto' detects it from the file name")
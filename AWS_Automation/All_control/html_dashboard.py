@@ -0,0 +1,423 @@
+import base64
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Finding columns embedded in the dashboard, in display order
+DASHBOARD_COLUMNS = ['title', 'control_title', 'status', 'priority', 'region', 'account_id', 'resource', 'reason']
+
+# Columns with at most this many distinct values get a drop-down filter
+MAX_FILTER_VALUES = 500
+
+PRIORITY_COLORS = {
+    'High': '#FF0000',
+    'Medium': '#FFA500',
+    'Low': '#FFFF00',
+    'Safe': '#00FF00',
+    'No Priority': '#C0C0C0'
+}
+
+
+def encode_column(series):
+    """
+    Dictionary-encode one column for the dashboard
+
+    Values are stored once and each row keeps a little-endian integer code,
+    base64 encoded. Columns where every row is distinct (e.g. resource ARNs)
+    skip the codes and are read by row position.
+
+    Args:
+        series (pd.Series): Column values
+
+    Returns:
+        dict: 'values', 'bytes' (code width) and 'codes' (base64 or None)
+    """
+    codes, values = pd.factorize(series.fillna('').astype(str))
+    encoded = {'values': values.tolist(), 'bytes': None, 'codes': None}
+    if len(values) == len(series):
+        return encoded
+
+    if len(values) <= 0xFF:
+        dtype, width = '<u1', 1
+    elif len(values) <= 0xFFFF:
+        dtype, width = '<u2', 2
+    else:
+        dtype, width = '<u4', 4
+    encoded['bytes'] = width
+    encoded['codes'] = base64.b64encode(np.ascontiguousarray(codes, dtype=dtype).tobytes()).decode('ascii')
+    return encoded
+
+
+def _records(df):
+    """Frame rows as JSON-safe lists, NaN replaced by ''"""
+    return df.astype(object).where(df.notna(), '').values.tolist()
+
+
+def build_payload(findings_df, aggregates, title):
+    """
+    Everything the dashboard page needs, as one JSON-serializable dict
+
+    Args:
+        findings_df (pd.DataFrame): Enriched findings
+        aggregates (dict): 'priority_summary', 'service_pivot' and
+            'service_analysis' frames, as built by Two_analyse
+        title (str): Dashboard title
+
+    Returns:
+        dict: Dashboard payload
+    """
+    columns = [column for column in DASHBOARD_COLUMNS if column in findings_df.columns]
+    pivot = aggregates['service_pivot']
+    priority_summary = aggregates['priority_summary']
+    service_analysis = aggregates['service_analysis']
+
+    return {
+        'title': title,
+        'generated': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        'colors': PRIORITY_COLORS,
+        'maxFilterValues': MAX_FILTER_VALUES,
+        'prioritySummary': {'columns': list(priority_summary.columns), 'rows': _records(priority_summary)},
+        'servicePivot': {
+            'index': [str(value) for value in pivot.index],
+            'columns': [str(value) for value in pivot.columns],
+            'values': pivot.values.tolist()
+        },
+        'serviceAnalysis': {'columns': list(service_analysis.columns), 'rows': _records(service_analysis)},
+        'findings': {
+            'rows': len(findings_df),
+            'columns': [dict(name=column, **encode_column(findings_df[column])) for column in columns]
+        }
+    }
+
+
+def render_dashboard(findings_df, aggregates, output_file, title="Compliance Dashboard"):
+    """
+    Write a single self-contained HTML dashboard
+
+    Summary tables and bar charts come from the same aggregates as the
+    workbook sheets. Findings are embedded as columnar JSON and shown in a
+    virtualized, filterable table, so the page stays responsive with
+    a million rows. No network access is needed to open it.
+
+    Args:
+        findings_df (pd.DataFrame): Enriched findings
+        aggregates (dict): Frames from AWSComplianceReporter.build_aggregates
+        output_file (str): Path of the HTML file
+        title (str, optional): Page title
+
+    Returns:
+        str: Path to the written file
+    """
+    payload = json.dumps(build_payload(findings_df, aggregates, title), separators=(',', ':'))
+    # '<', '>' and '&' only occur inside JSON strings, where the escapes decode to the same text;
+    # without them '</script>' or '<!--' in a finding could end or derail the script element
+    payload = payload.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+
+    html = DASHBOARD_TEMPLATE.replace('__TITLE__', _html_escape(title)).replace('__DATA__', payload)
+    with open(output_file, 'w', encoding='utf-8') as fh:
+        fh.write(html)
+    return output_file
+
+
+def _html_escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+DASHBOARD_TEMPLATE = r"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  body { font-family: Calibri, Arial, sans-serif; margin: 0; background: #f4f6f9; color: #222; }
+  header { background: #1F497D; color: #fff; padding: 16px 24px; }
+  header h1 { margin: 0; font-size: 24px; }
+  header div { opacity: .8; font-size: 13px; }
+  main { padding: 16px 24px; }
+  .cards { display: flex; flex-wrap: wrap; gap: 12px; margin-bottom: 16px; }
+  .card { background: #fff; border-radius: 6px; padding: 12px 18px; min-width: 120px; box-shadow: 0 1px 3px rgba(0,0,0,.15); border-top: 6px solid #1F497D; }
+  .card .value { font-size: 26px; font-weight: bold; }
+  .panel { background: #fff; border-radius: 6px; padding: 12px 18px; margin-bottom: 16px; box-shadow: 0 1px 3px rgba(0,0,0,.15); }
+  .panel h2 { margin: 0 0 10px; font-size: 18px; color: #1F497D; }
+  .row { display: flex; gap: 16px; flex-wrap: wrap; }
+  .row .panel { flex: 1 1 420px; }
+  .scroll { max-height: 420px; overflow: auto; }
+  table { border-collapse: collapse; font-size: 13px; width: 100%; }
+  th, td { border: 1px solid #ccc; padding: 3px 6px; text-align: left; }
+  th { background: #4F81BD; color: #fff; position: sticky; top: 0; }
+  tr.category td { background: #dce6f1; font-weight: bold; }
+  .bar-row { display: flex; align-items: center; font-size: 12px; margin: 2px 0; }
+  .bar-label { width: 140px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
+  .bar-track { flex: 1; display: flex; height: 16px; background: #eee; }
+  .bar-track span { display: block; height: 100%; }
+  .bar-value { width: 70px; text-align: right; }
+  .legend span { display: inline-block; margin-right: 12px; font-size: 12px; }
+  .legend i { display: inline-block; width: 10px; height: 10px; margin-right: 4px; }
+  .filters { display: flex; flex-wrap: wrap; gap: 8px; margin-bottom: 8px; }
+  .filters label { font-size: 12px; display: flex; flex-direction: column; }
+  .filters select, .filters input { font-size: 13px; padding: 2px; max-width: 220px; }
+  #count { font-size: 13px; margin-bottom: 6px; }
+  .grid-row { display: grid; font-size: 12px; height: 24px; line-height: 24px; }
+  .grid-row div { overflow: hidden; text-overflow: ellipsis; white-space: nowrap; padding: 0 4px; border-right: 1px solid #e2e2e2; }
+  .grid-row.head div { background: #4F81BD; color: #fff; cursor: pointer; user-select: none; }
+  #viewport { height: 600px; overflow-y: auto; position: relative; border: 1px solid #ccc; }
+  #rows { position: absolute; top: 0; left: 0; right: 0; }
+  #rows .grid-row:nth-child(even) { background: #f5f5f5; }
+</style>
+</head>
+<body>
+<header><h1>__TITLE__</h1><div id="generated"></div></header>
+<main>
+  <section class="cards" id="cards"></section>
+  <section class="row">
+    <div class="panel"><h2>Priority Distribution</h2><div id="priority-chart"></div><table id="priority-table"></table></div>
+    <div class="panel"><h2>Service Priority Distribution</h2><div class="legend" id="pivot-legend"></div><div class="scroll" id="pivot-chart"></div></div>
+  </section>
+  <section class="panel"><h2>Service Pivot</h2><div class="scroll"><table id="pivot-table"></table></div></section>
+  <section class="panel"><h2>Service Category Analysis</h2><div class="scroll"><table id="analysis-table"></table></div></section>
+  <section class="panel">
+    <h2>Findings</h2>
+    <div class="filters" id="filters"></div>
+    <div id="count"></div>
+    <div class="grid-row head" id="grid-head"></div>
+    <div id="viewport"><div id="spacer"></div><div id="rows"></div></div>
+  </section>
+</main>
+<script id="report-data" type="application/json">__DATA__</script>
+<script>
+(function () {
+  'use strict';
+  var data = JSON.parse(document.getElementById('report-data').textContent);
+  var COLORS = data.colors;
+  var ROW_HEIGHT = 24;
+
+  function esc(value) {
+    return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+  }
+  function colorStyle(value) {
+    var color = COLORS[value];
+    return color ? ' style="background:' + color + '"' : '';
+  }
+  function tableHtml(columns, rows, colorColumn) {
+    var html = '<thead><tr>' + columns.map(function (c) { return '<th>' + esc(c) + '</th>'; }).join('') + '</tr></thead><tbody>';
+    rows.forEach(function (row) {
+      html += '<tr>' + row.map(function (v, j) {
+        return '<td' + (j === colorColumn ? colorStyle(v) : '') + '>' + esc(v) + '</td>';
+      }).join('') + '</tr>';
+    });
+    return html + '</tbody>';
+  }
+
+  document.getElementById('generated').textContent = 'Generated ' + data.generated;
+
+  // Summary cards and Priority Summary
+  var summary = data.prioritySummary;
+  var cards = '';
+  summary.rows.forEach(function (row) {
+    var border = COLORS[row[0]] ? ' style="border-top-color:' + COLORS[row[0]] + '"' : '';
+    cards += '<div class="card"' + border + '><div>' + esc(row[0]) + '</div><div class="value">' +
+             Number(row[1]).toLocaleString() + '</div></div>';
+  });
+  document.getElementById('cards').innerHTML = cards;
+  document.getElementById('priority-table').innerHTML = tableHtml(summary.columns, summary.rows, 0);
+
+  var counts = summary.rows.filter(function (row) { return row[0] !== 'Total'; });
+  var maxCount = Math.max.apply(null, counts.map(function (row) { return row[1]; }).concat([1]));
+  document.getElementById('priority-chart').innerHTML = counts.map(function (row) {
+    return '<div class="bar-row"><div class="bar-label">' + esc(row[0]) + '</div><div class="bar-track"><span style="width:' +
+           (100 * row[1] / maxCount) + '%;background:' + (COLORS[row[0]] || '#4F81BD') + '"></span></div><div class="bar-value">' +
+           Number(row[1]).toLocaleString() + '</div></div>';
+  }).join('');
+
+  // Service Pivot table and stacked bars
+  var pivot = data.servicePivot;
+  var pivotRows = pivot.index.map(function (service, i) { return [service].concat(pivot.values[i]); });
+  document.getElementById('pivot-table').innerHTML = tableHtml(['Service'].concat(pivot.columns), pivotRows, -1);
+  var stacked = ['High', 'Medium', 'Low', 'Safe'].filter(function (p) { return pivot.columns.indexOf(p) >= 0; });
+  document.getElementById('pivot-legend').innerHTML = stacked.map(function (p) {
+    return '<span><i style="background:' + COLORS[p] + '"></i>' + p + '</span>';
+  }).join('');
+  var totals = pivot.values.map(function (values) {
+    return stacked.reduce(function (sum, p) { return sum + values[pivot.columns.indexOf(p)]; }, 0);
+  });
+  var maxTotal = Math.max.apply(null, totals.concat([1]));
+  document.getElementById('pivot-chart').innerHTML = pivot.index.map(function (service, i) {
+    var bars = stacked.map(function (p) {
+      var value = pivot.values[i][pivot.columns.indexOf(p)];
+      return '<span title="' + p + ': ' + value + '" style="width:' + (100 * value / maxTotal) + '%;background:' + COLORS[p] + '"></span>';
+    }).join('');
+    return '<div class="bar-row"><div class="bar-label">' + esc(service) + '</div><div class="bar-track">' + bars +
+           '</div><div class="bar-value">' + totals[i].toLocaleString() + '</div></div>';
+  }).join('');
+
+  // Service Category Analysis
+  var analysis = data.serviceAnalysis;
+  var analysisHtml = '<thead><tr>' + analysis.columns.map(function (c) { return '<th>' + esc(c) + '</th>'; }).join('') + '</tr></thead><tbody>';
+  analysis.rows.forEach(function (row) {
+    if (row.every(function (v) { return v === ''; })) { return; }
+    var isCategory = typeof row[0] === 'string' && row.slice(1).every(function (v) { return v === ''; });
+    analysisHtml += '<tr' + (isCategory ? ' class="category"' : '') + '>' + row.map(function (v, j) {
+      return '<td' + (j === row.length - 1 ? colorStyle(v) : '') + (isCategory && j === 0 ? ' colspan="' + row.length + '"' : '') + '>' + esc(v) + '</td>';
+    }).slice(0, isCategory ? 1 : row.length).join('') + '</tr>';
+  });
+  document.getElementById('analysis-table').innerHTML = analysisHtml + '</tbody>';
+
+  // Findings: decode the columnar payload
+  var findings = data.findings;
+  var total = findings.rows;
+  function decodeCodes(b64, width) {
+    var binary = atob(b64);
+    var bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) { bytes[i] = binary.charCodeAt(i); }
+    if (width === 1) { return bytes; }
+    return width === 2 ? new Uint16Array(bytes.buffer) : new Uint32Array(bytes.buffer);
+  }
+  var columns = findings.columns.map(function (c) {
+    return { name: c.name, values: c.values, codes: c.codes === null ? null : decodeCodes(c.codes, c.bytes), rank: null };
+  });
+  function code(column, row) { return column.codes ? column.codes[row] : row; }
+
+  // Filters: drop-downs for low-cardinality columns plus a text search
+  var filtersEl = document.getElementById('filters');
+  var selects = [];
+  columns.forEach(function (column, idx) {
+    if (!column.codes || column.values.length > data.maxFilterValues) { return; }
+    var order = column.values.map(function (v, i) { return i; }).sort(function (a, b) {
+      return column.values[a].localeCompare(column.values[b]);
+    });
+    var select = document.createElement('select');
+    select.innerHTML = '<option value="-1">All</option>' + order.map(function (i) {
+      return '<option value="' + i + '">' + esc(column.values[i] || '(blank)') + '</option>';
+    }).join('');
+    select.addEventListener('change', applyFilters);
+    var label = document.createElement('label');
+    label.textContent = column.name;
+    label.appendChild(select);
+    filtersEl.appendChild(label);
+    selects.push({ column: column, select: select });
+  });
+  var search = document.createElement('input');
+  search.type = 'search';
+  search.placeholder = 'Search all columns';
+  var searchLabel = document.createElement('label');
+  searchLabel.textContent = 'search';
+  searchLabel.appendChild(search);
+  filtersEl.appendChild(searchLabel);
+  var searchTimer = null;
+  search.addEventListener('input', function () {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(applyFilters, 250);
+  });
+
+  // Header with click-to-sort
+  var template = columns.map(function (c) { return c.name === 'resource' || c.name === 'reason' || c.name === 'control_title' ? '3fr' : '1fr'; }).join(' ');
+  var head = document.getElementById('grid-head');
+  head.style.gridTemplateColumns = template;
+  var sortColumn = -1, sortDescending = false;
+  columns.forEach(function (column, idx) {
+    var cell = document.createElement('div');
+    cell.textContent = column.name;
+    cell.addEventListener('click', function () {
+      sortDescending = sortColumn === idx ? !sortDescending : false;
+      sortColumn = idx;
+      Array.prototype.forEach.call(head.children, function (c, j) {
+        c.textContent = columns[j].name + (j === idx ? (sortDescending ? ' ▼' : ' ▲') : '');
+      });
+      applySort();
+      render(true);
+    });
+    head.appendChild(cell);
+  });
+
+  var view = new Int32Array(total);
+  for (var r = 0; r < total; r++) { view[r] = r; }
+
+  function applyFilters() {
+    var active = selects.filter(function (s) { return s.select.value !== '-1'; }).map(function (s) {
+      return { codes: s.column.codes, value: Number(s.select.value) };
+    });
+    var query = search.value.trim().toLowerCase();
+    var hits = null;
+    if (query) {
+      // Match each distinct value once, then test rows by code
+      hits = columns.map(function (column) {
+        var flags = new Uint8Array(column.values.length);
+        for (var i = 0; i < column.values.length; i++) {
+          if (column.values[i].toLowerCase().indexOf(query) >= 0) { flags[i] = 1; }
+        }
+        return flags;
+      });
+    }
+    var out = new Int32Array(total), matched = 0;
+    for (var row = 0; row < total; row++) {
+      var keep = true;
+      for (var f = 0; f < active.length; f++) {
+        if (active[f].codes[row] !== active[f].value) { keep = false; break; }
+      }
+      if (keep && hits) {
+        keep = false;
+        for (var c = 0; c < columns.length; c++) {
+          if (hits[c][code(columns[c], row)]) { keep = true; break; }
+        }
+      }
+      if (keep) { out[matched++] = row; }
+    }
+    view = out.subarray(0, matched);
+    applySort();
+    render(true);
+  }
+
+  function applySort() {
+    if (sortColumn < 0) { return; }
+    var column = columns[sortColumn];
+    if (!column.rank) {
+      var order = column.values.map(function (v, i) { return i; }).sort(function (a, b) {
+        return column.values[a].localeCompare(column.values[b], undefined, { numeric: true });
+      });
+      column.rank = new Int32Array(column.values.length);
+      order.forEach(function (valueIdx, position) { column.rank[valueIdx] = position; });
+    }
+    var rank = column.rank, sign = sortDescending ? -1 : 1;
+    view.sort(function (a, b) { return sign * (rank[code(column, a)] - rank[code(column, b)]) || a - b; });
+  }
+
+  // Virtualized rendering: only the rows in view (plus a margin) exist in the DOM
+  var viewport = document.getElementById('viewport');
+  var spacer = document.getElementById('spacer');
+  var rowsEl = document.getElementById('rows');
+  var countEl = document.getElementById('count');
+  var priorityIdx = columns.map(function (c) { return c.name; }).indexOf('priority');
+
+  function render(reset) {
+    if (reset) { viewport.scrollTop = 0; }
+    spacer.style.height = (view.length * ROW_HEIGHT) + 'px';
+    countEl.textContent = view.length.toLocaleString() + ' of ' + total.toLocaleString() + ' findings';
+    var first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - 10);
+    var last = Math.min(view.length, first + Math.ceil(viewport.clientHeight / ROW_HEIGHT) + 20);
+    var html = '';
+    for (var i = first; i < last; i++) {
+      var row = view[i];
+      html += '<div class="grid-row" style="grid-template-columns:' + template + '">';
+      for (var c = 0; c < columns.length; c++) {
+        var value = columns[c].values[code(columns[c], row)];
+        html += '<div title="' + esc(value) + '"' + (c === priorityIdx ? colorStyle(value) : '') + '>' + esc(value) + '</div>';
+      }
+      html += '</div>';
+    }
+    rowsEl.style.transform = 'translateY(' + (first * ROW_HEIGHT) + 'px)';
+    rowsEl.innerHTML = html;
+  }
+  var pending = false;
+  viewport.addEventListener('scroll', function () {
+    if (pending) { return; }
+    pending = true;
+    requestAnimationFrame(function () { pending = false; render(false); });
+  });
+  render(true);
+})();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,105 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from stage_profiler import NULL_PROFILER
+
+# Threads for overlapping I/O stages; file reads and writes, zip and gzip
+# compression and PNG encoding release the GIL while they run
+DEFAULT_IO_WORKERS = 4
+
+
+class StageOutput:
+    def __init__(self, name):
+        """Placeholder for the result of an earlier stage, passed as a stage argument"""
+        self.name = name
+
+
+class StageGraph:
+    def __init__(self, workers=DEFAULT_IO_WORKERS, profiler=NULL_PROFILER):
+        """
+        Named stages run in threads as soon as the stages they depend on finish
+
+        Stages are added in dependency order: a stage may only depend on
+        stages added before it, so the graph cannot contain a cycle.
+
+        Args:
+            workers (int, optional): Threads; 1 runs the stages one after
+                another in the order they were added
+            profiler (StageProfiler, optional): Records every stage under its name
+        """
+        self.workers = workers
+        self.profiler = profiler
+        self.stages = {}
+
+    def add(self, name, func, *args, after=(), **kwargs):
+        """
+        Add a stage calling func(*args, **kwargs)
+
+        Args:
+            name (str): Stage name, also used for the profiler stage
+            func (callable): Work of the stage
+            *args: Positional arguments; StageOutput placeholders are replaced
+                by the result of that stage and make this stage depend on it
+            after (iterable, optional): Further stages that must finish first
+            **kwargs: Keyword arguments, with the same placeholder handling
+
+        Returns:
+            StageOutput: Placeholder for this stage's result
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' was already added")
+        depends = set(after)
+        depends.update(value.name for value in list(args) + list(kwargs.values()) if isinstance(value, StageOutput))
+        unknown = depends - self.stages.keys()
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on stages not added yet: {', '.join(sorted(unknown))}")
+        self.stages[name] = {'func': func, 'args': args, 'kwargs': kwargs, 'after': depends}
+        return StageOutput(name)
+
+    def _call(self, name, results):
+        stage = self.stages[name]
+        args = [results[value.name] if isinstance(value, StageOutput) else value for value in stage['args']]
+        kwargs = {key: results[value.name] if isinstance(value, StageOutput) else value
+                  for key, value in stage['kwargs'].items()}
+        with self.profiler.stage(name):
+            return stage['func'](*args, **kwargs)
+
+    def run(self):
+        """
+        Run every stage
+
+        The first stage to fail stops new stages from starting; stages already
+        running are allowed to finish, then its exception is raised.
+
+        Returns:
+            dict: Stage name -> result
+        """
+        results = {}
+        if self.workers <= 1:
+            for name in self.stages:
+                results[name] = self._call(name, results)
+            return results
+
+        pending = list(self.stages)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='io') as pool:
+            while pending or running:
+                ready = [name for name in pending if self.stages[name]['after'] <= results.keys()]
+                for name in ready:
+                    pending.remove(name)
+                    running[pool.submit(self._call, name, results)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return results
+
+
+def add_io_arguments(parser):
+    """
+    Add the option for the threads that overlap loading and writing
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--io-workers', type=int, default=DEFAULT_IO_WORKERS, metavar='N',
+                        help="Threads that load the inputs and write independent outputs concurrently; "
+                             f"1 runs them one after another (default: {DEFAULT_IO_WORKERS})")
@@ -0,0 +1,364 @@
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from run_metrics import NULL_METRICS
+from stage_profiler import NULL_PROFILER
+
+# Rows rendered per worker task; big sheets are split into several tasks
+DEFAULT_CHUNK_ROWS = 50000
+
+# Excel limits a cell to 32,767 characters
+MAX_CELL_CHARS = 32767
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_NAMED_COLORS = {'black': '000000', 'white': 'FFFFFF'}
+
+
+def column_letter(col_idx):
+    """
+    Convert a zero-based column index to an Excel column letter
+
+    Args:
+        col_idx (int): Zero-based column index
+
+    Returns:
+        str: Column letter (A, B, ..., AA, ...)
+    """
+    letters = ''
+    col_idx += 1
+    while col_idx:
+        col_idx, remainder = divmod(col_idx - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _argb(color):
+    color = _NAMED_COLORS.get(color, color).lstrip('#').upper()
+    return 'FF' + color
+
+
+def _excel_width(width):
+    # Same character-width to stored-width conversion xlsxwriter uses for Calibri 11
+    if width < 1:
+        pixels = int(width * 12 + 0.5)
+    else:
+        pixels = int(width * 7 + 0.5) + 5
+    return int(pixels / 7 * 256) / 256
+
+
+def build_styles(formats):
+    """
+    Build styles.xml and the style-name to cellXfs index mapping
+
+    Args:
+        formats (dict): Format name -> xlsxwriter style properties
+            (bold, bg_color, font_color, font_size)
+
+    Returns:
+        tuple: (styles.xml text, dict of format name -> style index)
+    """
+    fonts = ['<font><sz val="11"/><color theme="1"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>']
+    fills = ['<fill><patternFill patternType="none"/></fill>', '<fill><patternFill patternType="gray125"/></fill>']
+    xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>']
+    style_ids = {}
+
+    for name, props in formats.items():
+        font = '<font>'
+        if props.get('bold'):
+            font += '<b/>'
+        font += f'<sz val="{props.get("font_size", 11)}"/>'
+        if 'font_color' in props:
+            font += f'<color rgb="{_argb(props["font_color"])}"/>'
+        else:
+            font += '<color theme="1"/>'
+        font += '<name val="Calibri"/><family val="2"/><scheme val="minor"/></font>'
+        if font not in fonts:
+            fonts.append(font)
+        font_id = fonts.index(font)
+
+        fill_id = 0
+        if 'bg_color' in props:
+            fill = (f'<fill><patternFill patternType="solid"><fgColor rgb="{_argb(props["bg_color"])}"/>'
+                    '<bgColor indexed="64"/></patternFill></fill>')
+            if fill not in fills:
+                fills.append(fill)
+            fill_id = fills.index(fill)
+
+        apply_attrs = (' applyFont="1"' if font_id else '') + (' applyFill="1"' if fill_id else '')
+        style_ids[name] = len(xfs)
+        xfs.append(f'<xf numFmtId="0" fontId="{font_id}" fillId="{fill_id}" borderId="0" xfId="0"{apply_attrs}/>')
+
+    styles_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<styleSheet xmlns="{MAIN_NS}">'
+        f'<fonts count="{len(fonts)}">{"".join(fonts)}</fonts>'
+        f'<fills count="{len(fills)}">{"".join(fills)}</fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+    return styles_xml, style_ids
+
+
+def _resolve_rule(rule, values, row_offset, style_ids):
+    """
+    Resolve a column style rule to one style index per row
+
+    A rule is None (unstyled), a format name, {'zebra': (even, odd)} for
+    alternating rows, or {'map': {value: rule}, 'default': rule} to pick the
+    style from the cell value.
+    """
+    count = len(values)
+    if rule is None:
+        return [0] * count
+    if isinstance(rule, str):
+        return [style_ids[rule]] * count
+    if 'zebra' in rule:
+        even, odd = style_ids[rule['zebra'][0]], style_ids[rule['zebra'][1]]
+        return [even if (row_offset + i) % 2 == 0 else odd for i in range(count)]
+    default = _resolve_rule(rule.get('default'), values, row_offset, style_ids)
+    mapping = {key: style_ids[name] for key, name in rule['map'].items()}
+    return [mapping.get(value, default[i]) for i, value in enumerate(values)]
+
+
+def _cell_xml(ref, value, style):
+    style_attr = f' s="{style}"' if style else ''
+
+    if isinstance(value, str):
+        text = value
+    elif value is None or (isinstance(value, float) and value != value):
+        text = ''
+    elif isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    elif isinstance(value, (int, float)):
+        if value in (float('inf'), float('-inf')):
+            return f'<c r="{ref}"{style_attr} t="e"><v>#NUM!</v></c>'
+        return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+    else:
+        text = str(value)
+
+    if not text:
+        return f'<c r="{ref}"{style_attr}/>' if style else ''
+    text = _ILLEGAL_XML_CHARS.sub('', text)[:MAX_CELL_CHARS]
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _row_xml(row_num, cells):
+    return f'<row r="{row_num + 1}">{"".join(cells)}</row>'
+
+
+def _render_part(task):
+    """
+    Worker entry point: render the <row> elements of one sheet part to a file
+
+    Args:
+        task (dict): Part description built by write_workbook
+
+    Returns:
+        str: Path of the rendered fragment
+    """
+    style_ids = task['style_ids']
+    start_row = task['start_row']
+
+    with open(task['path'], 'w', encoding='utf-8') as fh:
+        for row_num, cells, style in task.get('static_rows', []):
+            fh.write(_row_xml(row_num, [
+                _cell_xml(f'{column_letter(col)}{row_num + 1}', value, style_ids.get(style, 0))
+                for col, value in enumerate(cells)
+            ]))
+
+        frame = task.get('frame')
+        if frame is None or frame.empty:
+            return task['path']
+
+        letters = [column_letter(col) for col in range(len(frame.columns))]
+        columns = [frame[column].tolist() for column in frame.columns]
+        styles = [
+            _resolve_rule(task['rules'].get(column), columns[col], task['row_offset'], style_ids)
+            for col, column in enumerate(frame.columns)
+        ]
+        overrides = task.get('overrides', {})
+        for col, column in enumerate(frame.columns):
+            if column in overrides:
+                columns[col] = [overrides[column]] * len(frame)
+
+        for i in range(len(frame)):
+            row_num = start_row + i
+            ref_row = row_num + 1
+            fh.write(_row_xml(row_num, [
+                _cell_xml(f'{letters[col]}{ref_row}', columns[col][i], styles[col][i])
+                for col in range(len(letters))
+            ]))
+
+    return task['path']
+
+
+def _sheet_head(widths):
+    head = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">')
+    if widths:
+        head += '<cols>' + ''.join(
+            f'<col min="{col + 1}" max="{col + 1}" width="{_excel_width(width)}" customWidth="1"/>'
+            for col, width in sorted(widths.items())
+        ) + '</cols>'
+    return head + '<sheetData>'
+
+
+def _plan_tasks(sheets, style_ids, temp_dir, chunk_rows):
+    """Split every sheet block into ordered render tasks"""
+    plan = []
+    for sheet_idx, sheet in enumerate(sheets):
+        parts = []
+        for block_idx, block in enumerate(sorted(sheet.get('blocks', []), key=lambda b: b['start_row'])):
+            row = block['start_row']
+            static_rows = []
+            if block.get('title'):
+                static_rows.append((row, [block['title'][0]], block['title'][1]))
+                row += 1
+            if block.get('header'):
+                static_rows.append((row, list(block['header'][0]), block['header'][1]))
+                row += 1
+
+            frame = block.get('frame')
+            total = 0 if frame is None else len(frame)
+            offsets = range(0, total, chunk_rows) if total else [0]
+            for part_idx, offset in enumerate(offsets):
+                parts.append({
+                    'path': os.path.join(temp_dir, f'sheet{sheet_idx}_{block_idx}_{part_idx}.xml'),
+                    'style_ids': style_ids,
+                    'static_rows': static_rows if part_idx == 0 else [],
+                    'start_row': row + offset,
+                    'row_offset': offset,
+                    'frame': None if frame is None else frame.iloc[offset:offset + chunk_rows],
+                    'rules': block.get('rules', {}),
+                    'overrides': block.get('overrides', {}),
+                })
+        plan.append(parts)
+    return plan
+
+
+def _package_parts(sheets):
+    sheet_names = [escape(sheet['name'], {'"': '&quot;'}) for sheet in sheets]
+    sheet_entries = ''.join(
+        f'<sheet name="{name}" sheetId="{idx + 1}" r:id="rId{idx + 1}"/>'
+        for idx, name in enumerate(sheet_names)
+    )
+    workbook_xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><bookViews><workbookView/></bookViews>'
+        f'<sheets>{sheet_entries}</sheets></workbook>'
+    )
+    workbook_rels = ''.join(
+        f'<Relationship Id="rId{idx + 1}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{idx + 1}.xml"/>'
+        for idx in range(len(sheets))
+    )
+    workbook_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{PKG_REL_NS}">{workbook_rels}'
+        f'<Relationship Id="rId{len(sheets) + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    )
+    sheet_types = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{idx + 1}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for idx in range(len(sheets))
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        f'{sheet_types}'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    )
+    root_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{PKG_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    return {
+        '[Content_Types].xml': content_types,
+        '_rels/.rels': root_rels,
+        'xl/workbook.xml': workbook_xml,
+        'xl/_rels/workbook.xml.rels': workbook_rels,
+    }
+
+
+def write_workbook(sheets, formats, output_file, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                   profiler=NULL_PROFILER, metrics=NULL_METRICS):
+    """
+    Render worksheets in worker processes and assemble the xlsx package
+
+    Each sheet is a dict with 'name', optional 'widths' ({col_idx: width})
+    and 'blocks'. A block has a 'start_row', an optional 'title'
+    (text, format) and 'header' (columns, format), a DataFrame 'frame',
+    per-column style 'rules' and optional constant value 'overrides'.
+    Cell strings are written inline, so no shared string table is needed
+    and every sheet part can be rendered independently.
+
+    Args:
+        sheets (list): Sheet specifications in workbook order
+        formats (dict): Format name -> xlsxwriter style properties
+        output_file (str): Path of the xlsx file to create
+        workers (int, optional): Worker processes (default: CPU count)
+        chunk_rows (int, optional): Rows rendered per worker task
+        profiler (StageProfiler, optional): Records the render and assembly stages
+        metrics (RunMetrics, optional): Counts rendered rows as worker parts finish
+
+    Returns:
+        str: Path to the written workbook
+    """
+    styles_xml, style_ids = build_styles(formats)
+    workers = workers or os.cpu_count() or 1
+    temp_dir = tempfile.mkdtemp(prefix='xlsx_parts_')
+
+    try:
+        plan = _plan_tasks(sheets, style_ids, temp_dir, chunk_rows)
+        tasks = [part for parts in plan for part in parts]
+        task_rows = [0 if task['frame'] is None else len(task['frame']) for task in tasks]
+
+        with profiler.stage('render_sheet_parts'), \
+                metrics.stage('render_sheet_parts', total_rows=sum(task_rows)) as progress:
+            if workers > 1 and len(tasks) > 1:
+                with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                    for rows, _ in zip(task_rows, executor.map(_render_part, tasks)):
+                        progress.advance(rows)
+            else:
+                for rows, task in zip(task_rows, tasks):
+                    _render_part(task)
+                    progress.advance(rows)
+
+        with profiler.stage('assemble_xlsx'), \
+                zipfile.ZipFile(output_file, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+            for part_name, content in _package_parts(sheets).items():
+                package.writestr(part_name, content)
+            package.writestr('xl/styles.xml', styles_xml)
+
+            for sheet_idx, (sheet, parts) in enumerate(zip(sheets, plan)):
+                with package.open(f'xl/worksheets/sheet{sheet_idx + 1}.xml', 'w', force_zip64=True) as fh:
+                    fh.write(_sheet_head(sheet.get('widths')).encode('utf-8'))
+                    for part in parts:
+                        with open(part['path'], 'rb') as fragment:
+                            shutil.copyfileobj(fragment, fh)
+                    fh.write(b'</sheetData></worksheet>')
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return output_file
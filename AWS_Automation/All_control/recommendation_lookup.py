@@ -0,0 +1,73 @@
+import pandas as pd
+
+# Sheet that holds each control's long texts exactly once
+LOOKUP_SHEET = 'Control Lookup'
+
+# Long per-control texts moved out of the finding rows
+LOOKUP_TEXT_COLUMNS = ['control_description', 'Recommendation Steps/Approach']
+
+LOOKUP_WIDTHS = {'Control ID': 12, 'control_title': 40, 'control_description': 60, 'Recommendation Steps/Approach': 80}
+
+
+def build_control_lookup(df):
+    """
+    Assign a short Control ID to every control title
+
+    Args:
+        df (pd.DataFrame): Enriched findings
+
+    Returns:
+        tuple: (lookup DataFrame with one row per control,
+                Series of Control IDs aligned with df)
+    """
+    codes, titles = pd.factorize(df['control_title'], sort=True)
+    id_values = pd.Index([f'CTL-{code + 1:04d}' for code in range(len(titles))])
+    control_ids = pd.Series(id_values.take(codes), index=df.index)
+    control_ids[codes < 0] = ''
+
+    text_columns = [column for column in LOOKUP_TEXT_COLUMNS if column in df.columns]
+    lookup = df.drop_duplicates('control_title')[['control_title'] + text_columns]
+    lookup = lookup[lookup['control_title'].notna()].sort_values('control_title')
+    lookup.insert(0, 'Control ID', id_values[:len(lookup)])
+
+    return lookup.reset_index(drop=True), control_ids
+
+
+def normalize_report_frame(df):
+    """
+    Replace the long per-control texts with a Control ID column
+
+    Args:
+        df (pd.DataFrame): Enriched findings
+
+    Returns:
+        tuple: (findings with 'Control ID' instead of the long texts,
+                lookup DataFrame for the Control Lookup sheet)
+    """
+    lookup, control_ids = build_control_lookup(df)
+
+    normalized = df.drop(columns=[column for column in LOOKUP_TEXT_COLUMNS if column in df.columns])
+    normalized.insert(normalized.columns.get_loc('control_title') + 1, 'Control ID', control_ids)
+
+    return normalized, lookup
+
+
+def replace_with_control_id(columns):
+    """
+    Swap the long text columns of a sheet layout for 'Control ID'
+
+    Args:
+        columns (list): Column layout of a findings sheet
+
+    Returns:
+        list: Layout with the first long text column replaced by 'Control ID'
+            and the remaining ones removed
+    """
+    replaced = []
+    for column in columns:
+        if column in LOOKUP_TEXT_COLUMNS:
+            if 'Control ID' not in replaced:
+                replaced.append('Control ID')
+        else:
+            replaced.append(column)
+    return replaced
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+import traceback
+
+from docx_report_template import DEFAULT_TEMPLATE_CACHE
+from io_stages import add_io_arguments
+from report_jobs import DEFAULT_PRIORITY_FILE, JOB_FORMATS, PROVIDERS, ReportEngine
+from xlsx_reader import add_xlsx_reader_arguments
+
+# Exports picked up from the drop directory
+EXPORT_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Subdirectories of the drop directory that finished exports are moved to
+PROCESSED_DIR = 'processed'
+FAILED_DIR = 'failed'
+
+# A file is taken once its size and modification time are unchanged for this many polls,
+# so an export still being copied in is not read half-written
+SETTLE_POLLS = 2
+
+JOB_LOG = 'report_jobs.jsonl'
+
+
+class ReportDaemon:
+    def __init__(self, engine, watch_dir, output_dir, workers=1, poll_interval=2.0, client_name=None,
+                 services_link='', output_format='both', provider='auto'):
+        """
+        Watch a drop directory and build reports for every export that lands in it
+
+        One thread polls the directory and queues settled exports; worker
+        threads take them off the queue and run them through the shared
+        engine. A finished export is moved to processed/ or failed/ and
+        its outcome appended to report_jobs.jsonl in the output directory.
+
+        Args:
+            engine (ReportEngine): Warm report pipeline shared by the workers
+            watch_dir (str): Drop directory for Powerpipe exports
+            output_dir (str): Where the reports are written
+            workers (int, optional): Exports reported at the same time
+            poll_interval (float, optional): Seconds between directory scans
+            client_name (str, optional): Client on the Word report; the export's
+                file name when not given
+            services_link (str, optional): Link to the detailed services Excel
+            output_format (str, optional): 'xlsx', 'html' or 'both'
+            provider (str, optional): 'aws', 'gcp', or 'auto' to tell by the file name
+        """
+        self.engine = engine
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.client_name = client_name
+        self.services_link = services_link
+        self.output_format = output_format
+        self.provider = provider
+        self.stop_event = threading.Event()
+        self.jobs = queue.Queue()
+        self.results = []
+        self._candidates = {}
+        self._queued = set()
+        self._print_lock = threading.Lock()
+        self._move_lock = threading.Lock()
+
+    def log(self, name, message):
+        with self._print_lock:
+            print(f"[{time.strftime('%H:%M:%S')}] {name}: {message}", flush=True)
+
+    def scan(self):
+        """
+        Exports in the drop directory that have settled and are not queued yet
+
+        Returns:
+            list: Paths, oldest first
+        """
+        seen = {}
+        with os.scandir(self.watch_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.name.lower().endswith(EXPORT_EXTENSIONS):
+                    continue
+                if not entry.is_file() or entry.path in self._queued:
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous, polls = self._candidates.get(entry.path, (None, 0))
+                seen[entry.path] = (signature, polls + 1 if signature == previous else 1)
+
+        # Files that disappeared before settling are forgotten
+        ready = sorted((path for path, (_, polls) in seen.items() if polls >= SETTLE_POLLS),
+                       key=lambda path: seen[path][0][1])
+        self._candidates = {path: state for path, state in seen.items() if path not in ready}
+        return ready
+
+    def _finish(self, export_path, folder):
+        target_dir = os.path.join(self.watch_dir, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(export_path))
+        # Workers finishing same-named exports in the same second each get a name of their own
+        with self._move_lock:
+            if os.path.exists(target):
+                stem, ext = os.path.splitext(target)
+                stamp = time.strftime('%Y%m%d_%H%M%S')
+                target = f"{stem}_{stamp}{ext}"
+                number = 1
+                while os.path.exists(target):
+                    number += 1
+                    target = f"{stem}_{stamp}_{number}{ext}"
+            shutil.move(export_path, target)
+        return target
+
+    def process(self, export_path):
+        """
+        Report one export and move it out of the drop directory
+
+        Returns:
+            dict: Job record with the export, status, outputs or error, and elapsed seconds
+        """
+        name = os.path.basename(export_path)
+        client_name = self.client_name or os.path.splitext(name)[0]
+        record = {'export': name, 'status': 'failed'}
+        started = time.monotonic()
+        self.log(name, "started")
+        try:
+            record['outputs'] = self.engine.run(export_path, self.output_dir, client_name, self.services_link,
+                                                self.output_format, self.provider)
+            record['status'] = 'ok'
+        except SystemExit:
+            # The report scripts exit after printing their own error
+            record['error'] = "report run aborted; see the messages above"
+        except ValueError as e:
+            # Wrong or unsupported exports, e.g. a SchemaError
+            record['error'] = str(e)
+        except Exception as e:
+            record['error'] = str(e)
+            traceback.print_exc()
+
+        record['elapsed_s'] = round(time.monotonic() - started, 1)
+        try:
+            record['moved_to'] = self._finish(export_path, PROCESSED_DIR if record['status'] == 'ok' else FAILED_DIR)
+            # A later export dropped under the same name is a new job
+            self._queued.discard(export_path)
+        except OSError as e:
+            # Left in the drop directory but kept queued, so this run does not report it again;
+            # it is picked up on the next start
+            record['status'] = 'failed'
+            move_error = f"could not move the export out of the drop directory: {e}"
+            record['error'] = f"{record['error']}; {move_error}" if record.get('error') else move_error
+        self.log(name, f"{record['status']} in {record['elapsed_s']}s"
+                       + (f": {record['error']}" if record['status'] != 'ok' else ''))
+        with self._print_lock:
+            self.results.append(record)
+            try:
+                with open(os.path.join(self.output_dir, JOB_LOG), 'a') as fh:
+                    fh.write(json.dumps(record) + '\n')
+            except OSError as e:
+                print(f"[{time.strftime('%H:%M:%S')}] {name}: could not append to {JOB_LOG}: {e}", flush=True)
+        return record
+
+    def _worker(self):
+        while True:
+            export_path = self.jobs.get()
+            try:
+                if export_path is None:
+                    return
+                self.process(export_path)
+            except Exception:
+                # A worker that died here would leave the queue undrained and --once waiting forever
+                traceback.print_exc()
+            finally:
+                self.jobs.task_done()
+
+    def run(self, once=False):
+        """
+        Poll the drop directory until stopped
+
+        Exports being reported when a stop is requested are finished first;
+        queued ones that have not started are left in the drop directory.
+
+        Args:
+            once (bool, optional): Exit once every export present has been reported
+
+        Returns:
+            list: Job records of this run
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        threads = [threading.Thread(target=self._worker, name=f'report-{number}', daemon=True)
+                   for number in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self.log('daemon', f"watching {self.watch_dir} with {self.workers} workers; reports go to {self.output_dir}")
+
+        while not self.stop_event.is_set():
+            for export_path in self.scan():
+                self._queued.add(export_path)
+                self.jobs.put(export_path)
+            if once and not self._candidates and not self.jobs.unfinished_tasks:
+                break
+            self.stop_event.wait(self.poll_interval)
+
+        # Unstarted exports stay in the drop directory for the next run
+        while True:
+            try:
+                self.jobs.get_nowait()
+                self.jobs.task_done()
+            except queue.Empty:
+                break
+        for _ in threads:
+            self.jobs.put(None)
+        for thread in threads:
+            thread.join()
+        return self.results
+
+    def stop(self, *_):
+        """Stop polling; usable as a signal handler"""
+        if not self.stop_event.is_set():
+            self.log('daemon', "stopping after the exports in progress")
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build compliance reports for Powerpipe exports dropped into a directory")
+    parser.add_argument('watch_dir', nargs='?', help="Drop directory to watch (prompted for when omitted)")
+    parser.add_argument('--output-dir', default='reports', help="Directory for the reports (default: reports)")
+    parser.add_argument('--workers', type=int, default=1, help="Exports reported at the same time (default: 1)")
+    parser.add_argument('--poll', type=float, default=2.0, help="Seconds between directory scans (default: 2)")
+    parser.add_argument('--once', action='store_true',
+                        help="Report the exports already in the directory, then exit")
+    parser.add_argument('--format', choices=JOB_FORMATS, default='both',
+                        help="Reports per export; the Word report is built with the workbook (default: both)")
+    parser.add_argument('--provider', choices=PROVIDERS, default='auto',
+                        help="Cloud of the exports; 'auto' reports files named gcp_* as GCP (default: auto)")
+    parser.add_argument('--priority-file', default=DEFAULT_PRIORITY_FILE,
+                        help=f"Annotation database, re-read when it changes (default: {DEFAULT_PRIORITY_FILE})")
+    parser.add_argument('--client-name', default=None,
+                        help="Client on the Word report title page (default: the export's file name)")
+    parser.add_argument('--services-link', default='', help="Link to the detailed services Excel")
+    parser.add_argument('--logo', default=None, help="Header logo image for the Word report")
+    parser.add_argument('--template-cache', default=DEFAULT_TEMPLATE_CACHE, metavar='DIR',
+                        help=f"Directory for cached base documents (default: {DEFAULT_TEMPLATE_CACHE})")
+    add_xlsx_reader_arguments(parser)
+    add_io_arguments(parser)
+    args = parser.parse_args()
+
+    watch_dir = args.watch_dir or input("Enter the directory to watch for exports: ").strip()
+    if not os.path.isdir(watch_dir):
+        print(f"Not a directory: {watch_dir}")
+        return 1
+
+    print("Loading the annotation index and report template...")
+    engine = ReportEngine(args.priority_file, args.logo, args.template_cache, args.xlsx_engine, args.io_workers)
+    daemon = ReportDaemon(engine, watch_dir, args.output_dir, workers=args.workers, poll_interval=args.poll,
+                          client_name=args.client_name, services_link=args.services_link,
+                          output_format=args.format, provider=args.provider)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    results = daemon.run(once=args.once)
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"\n{len(results) - len(failed)} of {len(results)} exports reported. Job log: "
+          f"{os.path.join(args.output_dir, JOB_LOG)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
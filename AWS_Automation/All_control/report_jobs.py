@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+
+from Three_Document_creator import ComplianceReportDocumentGenerator
+from Two_analyse import AWSComplianceReporter
+from benchmark_merge import load_annotation_index
+from docx_report_template import DEFAULT_TEMPLATE_CACHE, cached_template
+from export_schema import SCHEMAS, detect_benchmark, read_header, schema_for
+from io_stages import DEFAULT_IO_WORKERS
+from run_metrics import NULL_METRICS
+from stage_profiler import NULL_PROFILER
+
+# The GCP report script lives in GCP_Automation at the top of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'GCP_Automation'))
+from GCP_report_compliance import create_simplified_gcp_report
+
+DEFAULT_PRIORITY_FILE = 'PowerPipeControls_Annotations.xlsx'
+
+# Report formats a job can produce; the .docx is built from the workbook
+JOB_FORMATS = ['xlsx', 'html', 'both']
+
+# Cloud an export comes from; 'auto' tells GCP exports by their file name
+PROVIDERS = ['auto', 'aws', 'gcp']
+
+
+class ReportEngine:
+    def __init__(self, priority_file=DEFAULT_PRIORITY_FILE, logo_path=None, template_cache_dir=DEFAULT_TEMPLATE_CACHE,
+                 xlsx_engine='auto', io_workers=DEFAULT_IO_WORKERS):
+        """
+        Report pipeline kept in memory between exports
+
+        The annotation index and the base .docx template are loaded once and
+        shared by every job; the annotations are re-read when the file on
+        disk changes. Jobs may run in several threads at once.
+
+        Args:
+            priority_file (str, optional): Annotation database
+            logo_path (str, optional): Header logo image for the Word report
+            template_cache_dir (str, optional): Where cached base documents are kept
+            xlsx_engine (str, optional): 'auto', 'calamine' or 'openpyxl' for Excel input
+            io_workers (int, optional): Threads each job loads and writes with
+        """
+        self.priority_file = priority_file
+        self.logo_path = logo_path
+        self.xlsx_engine = xlsx_engine
+        self.io_workers = io_workers
+        self._lock = threading.Lock()
+        self._annotations = None
+        self._annotations_mtime = None
+        self.annotations()
+        with open(cached_template(template_cache_dir, logo_path), 'rb') as fh:
+            self.template = fh.read()
+
+    def annotations(self):
+        """
+        Annotation index, re-read when the annotation file has changed
+
+        Returns:
+            pd.DataFrame: Annotations with one row per control_title
+        """
+        mtime = os.stat(self.priority_file).st_mtime_ns
+        with self._lock:
+            if mtime != self._annotations_mtime:
+                self._annotations = load_annotation_index(self.priority_file)
+                self._annotations_mtime = mtime
+            return self._annotations
+
+    def run(self, export_path, output_dir, client_name, services_link, output_format='both', provider='auto',
+            profiler=NULL_PROFILER, metrics=NULL_METRICS):
+        """
+        Build the reports for one export
+
+        AWS exports get the workbook, HTML dashboard and Word report; GCP
+        exports get the enhanced workbook of GCP_report_compliance.py.
+
+        Args:
+            export_path (str): Powerpipe CSV or Excel export
+            output_dir (str): Directory the reports are written to
+            client_name (str): Client shown on the Word report's title page
+            services_link (str): Link to the detailed services Excel
+            output_format (str, optional): 'xlsx', 'html' or 'both'; the Word
+                report is built whenever the workbook is. AWS only
+            provider (str, optional): 'aws', 'gcp', or 'auto' to tell by the file name
+            profiler (StageProfiler, optional): Records per-stage time and memory
+            metrics (RunMetrics, optional): Reports per-stage rows, throughput and ETA
+
+        Returns:
+            dict: Paths of the written reports, keyed 'xlsx', 'html' and 'docx'; their
+                names carry a run ID, so concurrent jobs for same-named exports never collide
+
+        Raises:
+            SchemaError: When the export is missing columns its schema requires
+            ValueError: For unknown providers, GCP-named exports sent as AWS and unsupported file types
+        """
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider '{provider}'; expected one of {', '.join(PROVIDERS)}")
+        if provider == 'auto':
+            provider = 'gcp' if detect_benchmark(export_path) == 'gcp' else 'aws'
+        run_id = uuid.uuid4().hex[:8]
+        if provider == 'gcp':
+            return self._run_gcp(export_path, output_dir, run_id, profiler, metrics)
+
+        # Checked up front, so a bad export fails with its own message instead of the reporter's exit
+        schema = schema_for(export_path)
+        if schema.name == 'gcp':
+            raise ValueError(f"{export_path} is named like a GCP export but was sent as AWS")
+        schema.columns(read_header(export_path, self.xlsx_engine), export_path)
+
+        os.makedirs(output_dir, exist_ok=True)
+        reporter = AWSComplianceReporter(export_path, self.priority_file, profiler=profiler, metrics=metrics,
+                                         xlsx_engine=self.xlsx_engine, io_workers=self.io_workers,
+                                         priority_df=self.annotations())
+        outputs = reporter.generate_comprehensive_report(output_format=output_format, output_dir=output_dir,
+                                                         run_id=run_id)
+
+        if 'xlsx' in outputs:
+            # Charts go to a directory of the job's own, so concurrent jobs never overwrite each other's
+            with tempfile.TemporaryDirectory(prefix='report_charts_') as chart_dir:
+                generator = ComplianceReportDocumentGenerator(outputs['xlsx'], client_name, services_link,
+                                                              self.logo_path, profiler=profiler, metrics=metrics,
+                                                              io_workers=self.io_workers, template=self.template,
+                                                              chart_dir=chart_dir)
+                outputs['docx'] = generator.generate_comprehensive_report()
+        return outputs
+
+    def _run_gcp(self, export_path, output_dir, run_id, profiler, metrics):
+        SCHEMAS['gcp'].columns(read_header(export_path, self.xlsx_engine), export_path)
+        os.makedirs(output_dir, exist_ok=True)
+        base_name = os.path.splitext(os.path.basename(export_path))[0]
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_file = os.path.join(output_dir, f"{base_name}_enhanced_report_{timestamp}_{run_id}.xlsx")
+        create_simplified_gcp_report(export_path, output_file, profiler=profiler, metrics=metrics,
+                                     xlsx_engine=self.xlsx_engine)
+        # The GCP report prints its errors and returns without writing
+        if not os.path.exists(output_file):
+            raise RuntimeError(f"The GCP report for {export_path} was not written; see the messages above")
+        return {'xlsx': output_file}
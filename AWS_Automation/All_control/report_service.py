@@ -0,0 +1,530 @@
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Queue
+from urllib.parse import parse_qs, urlsplit
+
+from docx_report_template import DEFAULT_TEMPLATE_CACHE, template_key
+from io_stages import DEFAULT_IO_WORKERS, add_io_arguments
+from report_jobs import DEFAULT_PRIORITY_FILE, JOB_FORMATS, PROVIDERS, ReportEngine
+from run_metrics import RunMetrics
+from xlsx_reader import add_xlsx_reader_arguments
+
+# Bump when the reports change for the same input, to stop serving outdated cached reports
+CACHE_VERSION = 1
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'compliance_report_service')
+
+# Uploads are read and hashed in chunks of this size
+UPLOAD_CHUNK = 1024 * 1024
+
+# Job states; a job in a final state sends no more events
+FINAL_STATES = ('done', 'failed')
+
+# Seconds between progress records streamed from a running job
+PROGRESS_INTERVAL = 1.0
+
+# Finished jobs are forgotten after this many seconds, and the oldest beyond MAX_FINISHED_JOBS
+# sooner; their reports stay in the cache, so uploading the export again answers at once
+FINISHED_JOB_TTL = 3600
+MAX_FINISHED_JOBS = 1000
+
+
+# Set once per worker process by _init_worker, so the engine stays loaded between jobs
+_worker = {}
+
+
+def _init_worker(engine_args, events):
+    _worker.update(engine=ReportEngine(*engine_args), events=events)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _run_job(job_id, export_path, staging_dir, result_dir, options):
+    # Runs in a worker process; every outcome is sent as an event, so the
+    # progress records that came before it are always delivered first
+    events = _worker['events']
+    events.put({'ts': round(time.time(), 3), 'event': 'started', 'job': job_id, 'pid': os.getpid()})
+    metrics = RunMetrics(job_id, interval=PROGRESS_INTERVAL, log_progress=False, listener=events.put)
+    try:
+        outputs = _worker['engine'].run(export_path, staging_dir, options['client_name'], options['services_link'],
+                                        options['format'], options['provider'], metrics=metrics)
+        manifest = {
+            'export': os.path.basename(export_path),
+            'options': options,
+            'outputs': {kind: os.path.basename(path) for kind, path in outputs.items()},
+            'created': round(time.time(), 3)
+        }
+        with open(os.path.join(staging_dir, 'manifest.json'), 'w') as fh:
+            json.dump(manifest, fh, indent=2)
+        # The finished directory appears in one rename, so the cache never holds a partial result
+        try:
+            os.rename(staging_dir, result_dir)
+        except OSError:
+            # The same input finished in another worker first; its reports are equivalent
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        events.put({'ts': round(time.time(), 3), 'event': 'finished', 'job': job_id,
+                    'outputs': manifest['outputs']})
+    except SystemExit:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        events.put({'ts': round(time.time(), 3), 'event': 'failed', 'job': job_id,
+                    'error': "report run aborted; see the service log"})
+    except Exception as e:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        # Clients know the export by its name, not by its place in the cache
+        error = str(e).replace(export_path, os.path.basename(export_path))
+        events.put({'ts': round(time.time(), 3), 'event': 'failed', 'job': job_id, 'error': error})
+
+
+def _safe_filename(name):
+    name = os.path.basename(name.replace('\\', '/')).strip()
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name).lstrip('.')
+
+
+class ReportService:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, workers=2, max_pending=16, priority_file=DEFAULT_PRIORITY_FILE,
+                 logo_path=None, template_cache_dir=DEFAULT_TEMPLATE_CACHE, xlsx_engine='auto',
+                 io_workers=DEFAULT_IO_WORKERS):
+        """
+        Report jobs behind the HTTP API: a bounded pool of warm worker processes
+        and a content-addressed cache of the finished reports
+
+        Each job is keyed by a hash of the export's bytes and name, the job
+        options, the annotation database and the Word template. Reports are
+        stored under that key, so the same request again is answered from
+        the cache without running, and a request for a job already running
+        joins it.
+
+        Args:
+            cache_dir (str, optional): Uploads and finished reports
+            workers (int, optional): Worker processes, each holding a ReportEngine
+            max_pending (int, optional): Queued and running jobs accepted before
+                new uploads are turned away
+            priority_file (str, optional): Annotation database
+            logo_path (str, optional): Header logo image for the Word report
+            template_cache_dir (str, optional): Where cached base documents are kept
+            xlsx_engine (str, optional): 'auto', 'calamine' or 'openpyxl' for Excel input
+            io_workers (int, optional): Threads each job loads and writes with
+        """
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.priority_file = priority_file
+        self.logo_path = logo_path
+        self.jobs = {}
+        self.running_keys = {}
+        self._finished = {}
+        self._changed = threading.Condition()
+        self._pool_lock = threading.Lock()
+        self._annotations_digest = (None, None)
+        self.upload_dir = os.path.join(cache_dir, 'uploads')
+        self.result_dir = os.path.join(cache_dir, 'reports')
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.result_dir, exist_ok=True)
+
+        self.events = Queue()
+        self._engine_args = (priority_file, logo_path, template_cache_dir, xlsx_engine, io_workers)
+        self.pool = self._new_pool()
+        self._pump = threading.Thread(target=self._pump_events, name='job-events', daemon=True)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self._engine_args, self.events))
+
+    def _replace_pool(self, broken):
+        # A worker that died (e.g. OOM-killed) breaks the whole pool; its jobs fail through
+        # _job_done, and later jobs get fresh workers
+        with self._pool_lock:
+            if self.pool is broken:
+                print(f"[{time.strftime('%H:%M:%S')}] service: worker pool broken, starting new workers", flush=True)
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.pool = self._new_pool()
+            return self.pool
+
+    def _submit_to_pool(self, *args):
+        pool = self.pool
+        try:
+            return pool.submit(_run_job, *args)
+        except BrokenProcessPool:
+            return self._replace_pool(pool).submit(_run_job, *args)
+
+    def start(self):
+        """Start the worker processes and wait until each has loaded its engine"""
+        for future in [self.pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        self._pump.start()
+
+    def close(self):
+        """Stop accepting work; running jobs finish, queued ones are cancelled"""
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.events.put(None)
+        self._pump.join()
+
+    def _pump_events(self):
+        while True:
+            record = self.events.get()
+            if record is None:
+                return
+            with self._changed:
+                job = self.jobs.get(record['job'])
+                if job is None:
+                    continue
+                job['events'].append(record)
+                if record['event'] == 'started':
+                    job['status'] = 'running'
+                elif record['event'] == 'finished':
+                    job['status'] = 'done'
+                    job['outputs'] = record['outputs']
+                elif record['event'] == 'failed':
+                    job['status'] = 'failed'
+                    job['error'] = record['error']
+                if job['status'] in FINAL_STATES:
+                    self.running_keys.pop(job['key'], None)
+                    self._evict_finished()
+                    self._finished[job['id']] = time.monotonic()
+                self._changed.notify_all()
+
+    def _job_done(self, job_id, future):
+        # Only reached with an error when the worker could not report it, e.g. it was killed
+        if future.cancelled() or future.exception() is None:
+            return
+        self.events.put({'ts': round(time.time(), 3), 'event': 'failed', 'job': job_id,
+                         'error': f"worker failed: {future.exception()}"})
+
+    def _evict_finished(self):
+        # Called with self._changed held, before a finished job is added; _finished is in finishing order
+        cutoff = time.monotonic() - FINISHED_JOB_TTL
+        for job_id, finished in list(self._finished.items()):
+            if finished > cutoff and len(self._finished) < MAX_FINISHED_JOBS:
+                break
+            del self._finished[job_id]
+            self.jobs.pop(job_id, None)
+
+    def annotations_digest(self):
+        """Hash of the annotation database, recomputed when the file changes"""
+        stat = os.stat(self.priority_file)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._annotations_digest[0] != signature:
+            with open(self.priority_file, 'rb') as fh:
+                self._annotations_digest = (signature, hashlib.sha256(fh.read()).hexdigest())
+        return self._annotations_digest[1]
+
+    def job_key(self, export_digest, filename, options):
+        """
+        Content address of a job's reports
+
+        Returns:
+            str: Hex digest over everything the reports depend on
+        """
+        parts = [f"v{CACHE_VERSION}", export_digest, filename, json.dumps(options, sort_keys=True),
+                 self.annotations_digest(), template_key(self.logo_path)]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def save_upload(self, stream, length, filename):
+        """
+        Store an uploaded export under the hash of its bytes
+
+        Args:
+            stream (file): Request body
+            length (int): Bytes to read
+            filename (str): Sanitized export name, which selects the schema
+
+        Returns:
+            tuple: (path of the stored export, hex digest of its bytes)
+        """
+        digest = hashlib.sha256()
+        fd, temp_file = tempfile.mkstemp(dir=self.upload_dir)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                remaining = length
+                while remaining:
+                    chunk = stream.read(min(UPLOAD_CHUNK, remaining))
+                    if not chunk:
+                        raise ValueError(f"Upload ended after {length - remaining} of {length} bytes")
+                    digest.update(chunk)
+                    fh.write(chunk)
+                    remaining -= len(chunk)
+            export_dir = os.path.join(self.upload_dir, digest.hexdigest())
+            os.makedirs(export_dir, exist_ok=True)
+            export_path = os.path.join(export_dir, filename)
+            os.replace(temp_file, export_path)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return export_path, digest.hexdigest()
+
+    def submit(self, export_path, export_digest, options):
+        """
+        Create a job for a stored export, answering it from the cache when possible
+
+        Args:
+            export_path (str): Export saved by save_upload
+            export_digest (str): Hash of the export's bytes
+            options (dict): client_name, services_link, provider and format
+
+        Returns:
+            tuple: (job dict, True when the job is new and was queued)
+
+        Raises:
+            RuntimeError: When max_pending jobs are already queued or running, or
+                no worker pool could take the job
+        """
+        key = self.job_key(export_digest, os.path.basename(export_path), options)
+        result_dir = os.path.join(self.result_dir, key)
+        job = {'id': uuid.uuid4().hex, 'key': key, 'export': os.path.basename(export_path), 'options': options,
+               'status': 'queued', 'cached': False, 'created': round(time.time(), 3), 'events': [],
+               'outputs': None, 'error': None}
+
+        with self._changed:
+            self._evict_finished()
+            if key in self.running_keys:
+                return self.jobs[self.running_keys[key]], False
+            manifest_file = os.path.join(result_dir, 'manifest.json')
+            if os.path.exists(manifest_file):
+                with open(manifest_file) as fh:
+                    manifest = json.load(fh)
+                job.update(status='done', cached=True, outputs=manifest['outputs'])
+                job['events'].append({'ts': job['created'], 'event': 'finished', 'job': job['id'],
+                                      'outputs': manifest['outputs'], 'cached': True})
+                self.jobs[job['id']] = job
+                self._finished[job['id']] = time.monotonic()
+                return job, False
+            if len(self.running_keys) >= self.max_pending:
+                raise RuntimeError(f"{self.max_pending} jobs are already queued or running; try again later")
+
+            # Registered only once a pool has accepted the job, so a failed submit leaves
+            # no queued job behind for later uploads to join
+            staging_dir = f"{result_dir}.{job['id']}.tmp"
+            try:
+                future = self._submit_to_pool(job['id'], export_path, staging_dir, result_dir, options)
+            except (BrokenProcessPool, RuntimeError) as e:
+                raise RuntimeError(f"No report worker could take the job ({e}); try again later")
+            self.jobs[job['id']] = job
+            self.running_keys[key] = job['id']
+
+        future.add_done_callback(lambda done: self._job_done(job['id'], done))
+        return job, True
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._changed:
+            states = [job['status'] for job in self.jobs.values()]
+        return {state: states.count(state) for state in ('queued', 'running', 'done', 'failed')}
+
+    def describe(self, job):
+        """
+        Public view of a job
+
+        Returns:
+            dict: Job state with report URLs instead of file names
+        """
+        with self._changed:
+            view = {key: job[key] for key in ('id', 'key', 'export', 'options', 'status', 'cached', 'created', 'error')}
+            view['events'] = len(job['events'])
+            view['outputs'] = None
+            if job['outputs']:
+                view['outputs'] = {kind: f"/reports/{job['key']}/{name}" for kind, name in job['outputs'].items()}
+        return view
+
+    def follow(self, job, start=0, timeout=None):
+        """
+        Events of a job from index start, waiting for new ones if there are none yet
+
+        Returns:
+            tuple: (list of new events, True when the job has finished and sent them all)
+        """
+        with self._changed:
+            if len(job['events']) <= start and job['status'] not in FINAL_STATES:
+                self._changed.wait(timeout)
+            events = job['events'][start:]
+            return events, job['status'] in FINAL_STATES
+
+    def report_path(self, key, name):
+        """
+        Path of a cached report file, or None when there is no such report
+
+        Only names listed in the key's manifest are served.
+        """
+        if not re.fullmatch(r'[0-9a-f]{64}', key):
+            return None
+        manifest_file = os.path.join(self.result_dir, key, 'manifest.json')
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file) as fh:
+            names = json.load(fh)['outputs'].values()
+        return os.path.join(self.result_dir, key, name) if name in names else None
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs                       upload an export (request body) and start a job
+    GET  /jobs/<id>                  job state and report URLs
+    GET  /jobs/<id>/events           progress as server-sent events until the job ends
+    GET  /reports/<key>/<file>       a finished report
+    GET  /health                     worker and job counts
+    """
+    server_version = 'ComplianceReportService/1'
+    # HTTP/1.1 so clients sending 'Expect: 100-continue' with an upload are not kept waiting
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        print(f"[{time.strftime('%H:%M:%S')}] http: {self.address_string()} {format % args}", flush=True)
+
+    def _send_json(self, status, payload, close=False):
+        body = json.dumps(payload, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if close:
+            # The request body was not read, so the connection cannot carry another request
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/jobs':
+            return self._send_json(404, {'error': f"No endpoint {url.path}"}, close=True)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        filename = _safe_filename(query.get('filename', ''))
+        options = {
+            'client_name': query.get('client_name') or os.path.splitext(filename)[0],
+            'services_link': query.get('services_link', ''),
+            'provider': query.get('provider', 'auto'),
+            'format': query.get('format', 'both')
+        }
+        length = int(self.headers.get('Content-Length') or 0)
+        if not filename.lower().endswith(('.csv', '.xlsx', '.xls')):
+            return self._send_json(400, {'error': "filename must name a .csv, .xlsx or .xls export"}, close=True)
+        if options['provider'] not in PROVIDERS:
+            return self._send_json(400, {'error': f"provider must be one of {', '.join(PROVIDERS)}"}, close=True)
+        if options['format'] not in JOB_FORMATS:
+            return self._send_json(400, {'error': f"format must be one of {', '.join(JOB_FORMATS)}"}, close=True)
+        if length <= 0:
+            return self._send_json(400, {'error': "The request body must hold the export"}, close=True)
+
+        try:
+            export_path, digest = self.service.save_upload(self.rfile, length, filename)
+            job, queued = self.service.submit(export_path, digest, options)
+        except ValueError as e:
+            return self._send_json(400, {'error': str(e)}, close=True)
+        except RuntimeError as e:
+            return self._send_json(503, {'error': str(e)})
+        self._send_json(202 if queued else 200, self.service.describe(job))
+
+    def do_GET(self):
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        if parts == ['health']:
+            self._send_json(200, {'workers': self.service.workers, **self.service.counts()})
+        elif len(parts) == 3 and parts[0] == 'reports':
+            self._send_report(parts[1], parts[2])
+        elif parts[:1] == ['jobs'] and (len(parts) == 2 or parts[2:] == ['events']):
+            job = self.service.jobs.get(parts[1])
+            if job is None:
+                self._send_json(404, {'error': f"No job {parts[1]}"})
+            elif len(parts) == 2:
+                self._send_json(200, self.service.describe(job))
+            else:
+                self._stream_events(job)
+        else:
+            self._send_json(404, {'error': f"No endpoint {self.path}"})
+
+    def _stream_events(self, job):
+        # No length: the stream ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        sent = 0
+        finished = False
+        try:
+            while not finished:
+                events, finished = self.service.follow(job, sent, timeout=15)
+                if not events and not finished:
+                    # Keeps proxies and clients from timing out between progress records
+                    self.wfile.write(b': keep-alive\n\n')
+                for record in events:
+                    self.wfile.write(f"event: {record['event']}\ndata: {json.dumps(record)}\n\n".encode('utf-8'))
+                sent += len(events)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_report(self, key, name):
+        path = self.service.report_path(key, name)
+        if path is None:
+            return self._send_json(404, {'error': f"No report {key}/{name}"})
+        self.send_response(200)
+        self.send_header('Content-Type', mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        # Content-addressed: a key always names the same reports
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.send_header('Content-Disposition', f'attachment; filename="{name}"')
+        self.end_headers()
+        with open(path, 'rb') as fh:
+            shutil.copyfileobj(fh, self.wfile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service that builds compliance reports from uploaded exports")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=2, help="Worker processes building reports (default: 2)")
+    parser.add_argument('--max-pending', type=int, default=16,
+                        help="Queued and running jobs before uploads are refused with 503 (default: 16)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Uploads and finished reports (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--priority-file', default=DEFAULT_PRIORITY_FILE,
+                        help=f"Annotation database (default: {DEFAULT_PRIORITY_FILE})")
+    parser.add_argument('--logo', default=None, help="Header logo image for the Word report")
+    parser.add_argument('--template-cache', default=DEFAULT_TEMPLATE_CACHE, metavar='DIR',
+                        help=f"Directory for cached base documents (default: {DEFAULT_TEMPLATE_CACHE})")
+    add_xlsx_reader_arguments(parser)
+    add_io_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Starting {args.workers} report workers...")
+    service = ReportService(args.cache_dir, args.workers, args.max_pending, args.priority_file, args.logo,
+                            args.template_cache, args.xlsx_engine, args.io_workers)
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), ReportRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    threading.Thread(target=server.serve_forever, name='http', daemon=True).start()
+    print(f"Listening on http://{args.host}:{args.port}; reports are cached in {args.cache_dir}")
+    stop_event.wait()
+
+    print("Stopping; running jobs finish first")
+    server.shutdown()
+    service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from summary_cube import category_lookup
+
+# Risk multiplier per service category (the Advanced Configuration sheet's Service Criticality)
+DEFAULT_SERVICE_CRITICALITY = {
+    'Security and Identity': 1.5,
+    'Compute': 1.3,
+    'Database': 1.4,
+    'Network': 1.2,
+    'Storage': 1.1,
+    'Other': 1.0
+}
+
+# Points per finding priority (the Advanced Configuration sheet's Priority Impact Scores);
+# priorities not listed, such as 'No Priority', score nothing
+DEFAULT_PRIORITY_IMPACT = {
+    'High': 10,
+    'Medium': 5,
+    'Low': 2,
+    'Safe': 0
+}
+
+# Category ranking label for services in no category, which score with the default criticality
+UNCATEGORIZED = 'Uncategorized'
+
+# Ranking sheet -> cube key it ranks, and the key's column label
+RISK_RANKINGS = {
+    'Risk by Service': ('title', 'Service'),
+    'Risk by Category': ('category', 'Category'),
+    'Risk by Account': ('account_id', 'Account'),
+    'Risk by Region': ('region', 'Region')
+}
+
+
+class RiskWeights:
+    def __init__(self, service_criticality=None, priority_impact=None, default_criticality=1.0):
+        """
+        Weights of the risk score: priority impact times service criticality
+
+        Args:
+            service_criticality (dict, optional): Category -> multiplier
+            priority_impact (dict, optional): Priority -> points per finding
+            default_criticality (float, optional): Multiplier for services in no category
+        """
+        self.service_criticality = service_criticality or dict(DEFAULT_SERVICE_CRITICALITY)
+        self.priority_impact = priority_impact or dict(DEFAULT_PRIORITY_IMPACT)
+        self.default_criticality = default_criticality
+
+
+DEFAULT_RISK_WEIGHTS = RiskWeights()
+
+
+def load_risk_weights(path):
+    """
+    Read risk weights from a JSON file
+
+    The file holds 'service_criticality' and/or 'priority_impact' objects and
+    optionally 'default_criticality'. Keys it lists replace the defaults;
+    the rest keep their default weight.
+
+    Args:
+        path (str): JSON file
+
+    Returns:
+        RiskWeights: Defaults updated with the file's weights
+
+    Raises:
+        ValueError: When a section is not an object or a weight is not a number
+    """
+    with open(path) as fh:
+        config = json.load(fh)
+    weights = {'service_criticality': dict(DEFAULT_SERVICE_CRITICALITY),
+               'priority_impact': dict(DEFAULT_PRIORITY_IMPACT)}
+    for section, defaults in weights.items():
+        values = config.get(section, {})
+        if not isinstance(values, dict):
+            raise ValueError(f"{path}: '{section}' must map names to numbers")
+        for name, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{path}: weight '{section}.{name}' must be a number, not {value!r}")
+            defaults[name] = value
+    default_criticality = config.get('default_criticality', 1.0)
+    if isinstance(default_criticality, bool) or not isinstance(default_criticality, (int, float)):
+        raise ValueError(f"{path}: 'default_criticality' must be a number, not {default_criticality!r}")
+    return RiskWeights(weights['service_criticality'], weights['priority_impact'], default_criticality)
+
+
+def _lookup(values, table, default):
+    # One dictionary lookup per distinct value, then a gather by category code;
+    # missing values get code -1, which selects the trailing default
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([table.get(value, default) for value in uniques] + [default], dtype='float64')
+    return mapped[codes]
+
+
+def finding_scores(df, categories, weights=DEFAULT_RISK_WEIGHTS):
+    """
+    Weighted risk score of every finding, or of one finding in every cube cell
+
+    The score is the priority's impact times the criticality of the
+    service's category. Both only depend on a handful of distinct values,
+    so each column is factorized into codes and the weights are gathered
+    from a small array instead of being looked up row by row.
+
+    Args:
+        df (pd.DataFrame): Findings with 'priority' and 'title', or cube cells
+            with 'priority' and 'category'
+        categories (dict): Category name -> service titles
+        weights (RiskWeights, optional): Impact and criticality weights
+
+    Returns:
+        np.ndarray: Score per row
+    """
+    impact = _lookup(df['priority'], weights.priority_impact, 0.0)
+    if 'category' in df.columns:
+        criticality = _lookup(df['category'], weights.service_criticality, weights.default_criticality)
+    else:
+        by_title = {title: weights.service_criticality.get(category, weights.default_criticality)
+                    for title, category in category_lookup(categories).items()}
+        criticality = _lookup(df['title'], by_title, weights.default_criticality)
+    return impact * criticality
+
+
+def rank_risk(cube, key, label, cell_scores):
+    """
+    Total risk per value of one cube key, highest first
+
+    Args:
+        cube (pd.DataFrame): Findings cube
+        key (str): Cube key to rank, e.g. 'title' or 'account_id'
+        label (str): Column name for the key's values
+        cell_scores (np.ndarray): Per-finding score of each cube cell
+
+    Returns:
+        pd.DataFrame: Rank, label, Risk Score, Scored Findings, Findings and
+            Share of Risk (%) columns; cells with a missing key are left out
+    """
+    codes, uniques = pd.factorize(cube[key])
+    keep = codes >= 0
+    codes = codes[keep]
+    counts = cube['count'].to_numpy()[keep]
+    scores = cell_scores[keep]
+
+    risk = np.bincount(codes, weights=scores * counts, minlength=len(uniques))
+    scored = np.bincount(codes, weights=np.where(scores > 0, counts, 0), minlength=len(uniques))
+    findings = np.bincount(codes, weights=counts, minlength=len(uniques))
+    total = risk.sum()
+
+    # Stable, so equal scores keep first-seen order
+    order = np.argsort(-risk, kind='stable')
+    return pd.DataFrame({
+        'Rank': np.arange(1, len(uniques) + 1),
+        label: np.asarray(uniques)[order],
+        'Risk Score': risk[order].round(1),
+        'Scored Findings': scored[order].astype('int64'),
+        'Findings': findings[order].astype('int64'),
+        'Share of Risk (%)': (risk[order] / total * 100).round(1) if total else np.zeros(len(uniques))
+    })
+
+
+def risk_rankings(cube, categories, weights=DEFAULT_RISK_WEIGHTS):
+    """
+    Risk rankings per service, category, account and region
+
+    Every finding in a cube cell has the same score, so the rankings are
+    weighted sums over the cube's cells rather than over the findings.
+    Services in no category are ranked as UNCATEGORIZED, so every ranking
+    adds up to the same total.
+
+    Args:
+        cube (pd.DataFrame): Findings cube with the CUBE_KEYS of summary_cube
+        categories (dict): Category name -> service titles
+        weights (RiskWeights, optional): Impact and criticality weights
+
+    Returns:
+        dict: Ranking sheet name -> frame from rank_risk, in RISK_RANKINGS order
+    """
+    cell_scores = finding_scores(cube, categories, weights)
+    if 'category' in cube.columns:
+        cube = cube.assign(category=cube['category'].fillna(UNCATEGORIZED))
+    return {sheet_name: rank_risk(cube, key, label, cell_scores)
+            for sheet_name, (key, label) in RISK_RANKINGS.items() if key in cube.columns}
+
+
+def add_risk_arguments(parser):
+    """
+    Add the option that overrides the risk score weights
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--risk-weights', metavar='JSON', default=None,
+                        help="JSON file with 'service_criticality' (category -> multiplier) and/or "
+                             "'priority_impact' (priority -> points) weights for the risk rankings; "
+                             "unlisted keys keep the Advanced Configuration defaults")
+
+
+def risk_weights_from_args(args):
+    """
+    Risk weights from parsed options
+
+    Returns:
+        RiskWeights: Weights from --risk-weights, or the defaults
+    """
+    return load_risk_weights(args.risk_weights) if args.risk_weights else DEFAULT_RISK_WEIGHTS
@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('report_metrics')
+
+
+def _label_value(value):
+    """Escape a Prometheus label value: backslash, double quote and newline"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class StageProgress:
+    def __init__(self, metrics, name, total_rows=None):
+        """
+        Row counter for one stage of a report run
+
+        Args:
+            metrics (RunMetrics): Owning run
+            name (str): Stage name
+            total_rows (int, optional): Expected rows, used for the ETA
+        """
+        self.metrics = metrics
+        self.name = name
+        self.total_rows = total_rows
+        self.rows = 0
+        self.completed = False
+        self.started = time.time()
+        self._start = time.monotonic()
+        self._last_emit = self._start
+
+    def advance(self, rows=1):
+        """
+        Count processed rows; emits a progress record at most once per interval
+
+        Args:
+            rows (int, optional): Rows processed since the last call
+        """
+        self.rows += rows
+        now = time.monotonic()
+        if now - self._last_emit >= self.metrics.interval:
+            self._last_emit = now
+            self.metrics.emit('progress', self)
+
+    def snapshot(self):
+        """
+        Current counters for this stage
+
+        Returns:
+            dict: rows, total, elapsed, rows/sec and ETA
+        """
+        elapsed = time.monotonic() - self._start
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total_rows and rate > 0 and not self.completed:
+            eta = round(max(self.total_rows - self.rows, 0) / rate, 1)
+        return {
+            'stage': self.name,
+            'rows': self.rows,
+            'total_rows': self.total_rows,
+            'elapsed_s': round(elapsed, 2),
+            'rows_per_sec': round(rate, 1),
+            'eta_s': eta,
+            'completed': self.completed
+        }
+
+
+class RunMetrics:
+    def __init__(self, job, enabled=True, interval=10.0, textfile=None, log_progress=True, listener=None):
+        """
+        Per-stage row counters, throughput and ETA for long report runs
+
+        Progress is logged as one JSON object per line on the
+        'report_metrics' logger. With a textfile path, the same counters are
+        also written in Prometheus textfile-collector format.
+
+        Args:
+            job (str): Job label, e.g. the input file name
+            enabled (bool, optional): When False, every call is a no-op
+            interval (float, optional): Seconds between progress records
+            textfile (str, optional): Prometheus .prom file to keep updated
+            log_progress (bool, optional): Emit the JSON progress records
+            listener (callable, optional): Called with every progress record as a
+                dict, e.g. to stream it to a client
+        """
+        self.job = job
+        self.enabled = enabled
+        self.interval = interval
+        self.textfile = textfile
+        self.log_progress = log_progress
+        self.listener = listener
+        self.started = time.time()
+        self.stages = []
+        # Stages in StageGraph threads refresh the textfile at the same time
+        self._textfile_lock = threading.Lock()
+
+        if enabled and log_progress and not logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    @contextmanager
+    def stage(self, name, total_rows=None):
+        """
+        Context manager yielding a StageProgress for one stage
+
+        Args:
+            name (str): Stage name
+            total_rows (int, optional): Expected rows, used for the ETA
+        """
+        progress = StageProgress(self, name, total_rows)
+        if not self.enabled:
+            yield progress
+            return
+
+        self.stages.append(progress)
+        self.emit('stage_start', progress)
+        try:
+            yield progress
+        finally:
+            progress.completed = True
+            self.emit('stage_end', progress)
+
+    def emit(self, event, progress):
+        """
+        Log one structured record and refresh the Prometheus textfile
+
+        Args:
+            event (str): 'stage_start', 'progress' or 'stage_end'
+            progress (StageProgress): Stage being reported
+        """
+        if not self.enabled:
+            return
+        if self.log_progress or self.listener:
+            record = {'ts': round(time.time(), 3), 'event': event, 'job': self.job}
+            record.update(progress.snapshot())
+            if self.log_progress:
+                logger.info(json.dumps(record))
+            if self.listener:
+                self.listener(record)
+        if self.textfile:
+            self.write_textfile()
+
+    def write_textfile(self):
+        """Write every stage's counters in Prometheus textfile format (atomic replace)"""
+        with self._textfile_lock:
+            self._write_textfile()
+
+    def _write_textfile(self):
+        metrics = [
+            ('report_stage_rows_processed', 'Rows processed by the stage', 'rows'),
+            ('report_stage_rows_total', 'Rows expected for the stage', 'total_rows'),
+            ('report_stage_rows_per_second', 'Stage throughput in rows per second', 'rows_per_sec'),
+            ('report_stage_elapsed_seconds', 'Seconds since the stage started', 'elapsed_s'),
+            ('report_stage_eta_seconds', 'Estimated seconds until the stage completes', 'eta_s'),
+            ('report_stage_completed', '1 when the stage has finished', 'completed')
+        ]
+        job = _label_value(self.job)
+        snapshots = [progress.snapshot() for progress in self.stages]
+
+        lines = []
+        for metric, help_text, key in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for snapshot in snapshots:
+                value = snapshot[key]
+                if value is None:
+                    continue
+                lines.append(f'{metric}{{job="{job}",stage="{_label_value(snapshot["stage"])}"}} {float(value)}')
+        lines.append("# HELP report_job_start_timestamp_seconds Unix time the report job started")
+        lines.append("# TYPE report_job_start_timestamp_seconds gauge")
+        lines.append(f'report_job_start_timestamp_seconds{{job="{job}"}} {self.started}')
+        lines.append("# HELP report_last_update_timestamp_seconds Unix time of the last progress update")
+        lines.append("# TYPE report_last_update_timestamp_seconds gauge")
+        lines.append(f'report_last_update_timestamp_seconds{{job="{job}"}} {time.time()}')
+
+        fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(self.textfile) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                fh.write('\n'.join(lines) + '\n')
+            # mkstemp creates the file readable by its owner only; the collector may run as another user
+            os.chmod(temp_file, 0o644)
+            os.replace(temp_file, self.textfile)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+
+def add_metrics_arguments(parser):
+    """
+    Add the shared progress/metrics options to an argparse parser
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--progress', action='store_true',
+                        help="Log per-stage rows, rows/sec and ETA as JSON lines on stderr")
+    parser.add_argument('--progress-interval', type=float, default=10.0,
+                        help="Seconds between progress records (default: 10)")
+    parser.add_argument('--metrics-textfile', metavar='PATH', default=None,
+                        help="Keep a Prometheus textfile-collector .prom file updated with the same counters")
+
+
+def metrics_from_args(args, job):
+    """
+    Create RunMetrics from parsed progress options
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+        job (str): Job label
+
+    Returns:
+        RunMetrics: Enabled when --progress or --metrics-textfile was given
+    """
+    return RunMetrics(
+        job,
+        enabled=bool(args.progress or args.metrics_textfile),
+        interval=args.progress_interval,
+        textfile=args.metrics_textfile,
+        log_progress=args.progress
+    )
+
+
+# Shared disabled metrics used as the default by instrumented functions
+NULL_METRICS = RunMetrics('disabled', enabled=False)
+NULL_PROGRESS = StageProgress(NULL_METRICS, 'disabled')
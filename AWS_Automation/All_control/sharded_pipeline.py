@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from run_metrics import NULL_PROGRESS
+from summary_cube import build_cube, merge_cubes
+
+# Columns an export can be sharded by
+SHARD_KEYS = ['account_id', 'region']
+
+# A shard larger than total / (workers * SPLIT_FACTOR) rows is split so one big account cannot stall the pool
+SPLIT_FACTOR = 2
+
+
+def partition(df, shard_by='account_id', workers=None):
+    """
+    Split an export into shards by account or region
+
+    Keys keep their first-seen order. A key with more rows than its fair
+    share of the pool is cut into consecutive row chunks; all counts are
+    additive, so this changes nothing in the result.
+
+    Args:
+        df (pd.DataFrame): Findings with a unique index
+        shard_by (str, optional): Column from SHARD_KEYS
+        workers (int, optional): Worker processes the shards are sized for
+
+    Returns:
+        list: (shard key, DataFrame) pairs
+    """
+    if shard_by not in df.columns:
+        raise ValueError(f"Cannot shard by '{shard_by}': the input has no such column")
+    workers = workers or os.cpu_count() or 1
+    max_rows = max(1, -(-len(df) // (workers * SPLIT_FACTOR)))
+
+    shards = []
+    for key, shard in df.groupby(shard_by, sort=False, dropna=False):
+        if len(shard) <= max_rows:
+            shards.append((key, shard))
+            continue
+        for start in range(0, len(shard), max_rows):
+            shards.append((key, shard.iloc[start:start + max_rows]))
+    return shards
+
+
+# Set once per worker process by _init_worker, so the priority table is not pickled per shard
+_worker = {}
+
+
+def _init_worker(enrich, priority_df, categories):
+    _worker.update(enrich=enrich, priority_df=priority_df, categories=categories)
+
+
+def _process_shard(shard):
+    enriched = _worker['enrich'](shard.copy(), _worker['priority_df'])
+    return enriched, build_cube(enriched, _worker['categories'])
+
+
+def run_sharded(df, priority_df, enrich, categories, shard_by='account_id', workers=None, progress=NULL_PROGRESS):
+    """
+    Enrich and count an export shard by shard in worker processes
+
+    Args:
+        df (pd.DataFrame): Findings to enrich
+        priority_df (pd.DataFrame): Priority database
+        enrich (callable): Module-level enrich(df, priority_df) -> enriched df
+        categories (dict): Category name -> service titles
+        shard_by (str, optional): Column from SHARD_KEYS
+        workers (int, optional): Worker processes (default: CPU count)
+        progress (StageProgress, optional): Counts enriched rows as shards finish
+
+    Returns:
+        tuple: (enriched DataFrame in input order, findings cube of the whole export)
+    """
+    workers = workers or os.cpu_count() or 1
+    df = df.reset_index(drop=True)
+    shards = [shard for _, shard in partition(df, shard_by, workers)]
+
+    enriched = []
+    cubes = []
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_init_worker,
+                                 initargs=(enrich, priority_df, categories)) as executor:
+            futures = [executor.submit(_process_shard, shard) for shard in shards]
+            for future in as_completed(futures):
+                shard_df, cube = future.result()
+                enriched.append(shard_df)
+                cubes.append(cube)
+                progress.advance(len(shard_df))
+    else:
+        _init_worker(enrich, priority_df, categories)
+        for shard in shards:
+            shard_df, cube = _process_shard(shard)
+            enriched.append(shard_df)
+            cubes.append(cube)
+            progress.advance(len(shard_df))
+
+    if not enriched:
+        return df, build_cube(df, categories)
+    # Shards finish in any order; the original index restores the input row order,
+    # and the cubes' 'first' row numbers restore first-seen order in the merge
+    return pd.concat(enriched).sort_index(kind='stable'), merge_cubes(cubes)
+
+
+def add_shard_arguments(parser):
+    """
+    Add the options for sharded enrichment
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--shard-by', choices=SHARD_KEYS, default=None,
+                        help="Enrich and aggregate the export in worker processes, one shard per "
+                             "account (or region); the shards' findings cubes are merged into the summary sheets")
+    parser.add_argument('--shard-workers', type=int, default=None,
+                        help="Worker processes for --shard-by (default: CPU count)")
+
@@ -0,0 +1,268 @@
+import gzip
+import os
+import re
+
+import numpy as np
+
+from run_metrics import NULL_PROGRESS
+
+# Rows in an .xlsx worksheet, header included
+EXCEL_MAX_ROWS = 1048576
+
+# Longest sheet name Excel accepts
+MAX_SHEET_NAME = 31
+
+OVERFLOW_MODES = ['auto', 'sheets', 'sidecar']
+
+# In 'auto' mode, exports above this many rows go to a sidecar instead of continuation sheets
+DEFAULT_SIDECAR_THRESHOLD = 5000000
+
+# Rows formatted and compressed per to_csv call, so the sidecar never needs a full copy of the frame
+SIDECAR_CHUNK_ROWS = 100000
+
+
+class OverflowPolicy:
+    def __init__(self, mode='auto', sidecar_threshold=DEFAULT_SIDECAR_THRESHOLD, sheet_rows=EXCEL_MAX_ROWS - 1):
+        """
+        How a findings sheet longer than Excel's row limit is written
+
+        Args:
+            mode (str, optional): 'sheets' spills into numbered continuation sheets,
+                'sidecar' writes the full data to a gzip CSV next to the workbook,
+                'auto' picks sheets up to sidecar_threshold rows and a sidecar above it
+            sidecar_threshold (int, optional): Row count where 'auto' switches to a sidecar
+            sheet_rows (int, optional): Data rows per worksheet below the header
+        """
+        if mode not in OVERFLOW_MODES:
+            raise ValueError(f"Unknown overflow mode '{mode}'; expected one of {', '.join(OVERFLOW_MODES)}")
+        self.mode = mode
+        self.sidecar_threshold = sidecar_threshold
+        self.sheet_rows = sheet_rows
+
+    def layout(self, total_rows):
+        """
+        Pick the layout for a sheet of total_rows findings
+
+        Returns:
+            str: 'single', 'sheets' or 'sidecar'
+        """
+        if total_rows <= self.sheet_rows:
+            return 'single'
+        if self.mode == 'sheets' or (self.mode == 'auto' and total_rows <= self.sidecar_threshold):
+            return 'sheets'
+        return 'sidecar'
+
+
+# Policy used when the caller does not pass one
+DEFAULT_OVERFLOW = OverflowPolicy()
+
+
+def continuation_name(sheet_name, number):
+    """
+    Name of the number-th sheet of a spilled sheet: 'Raw Data', 'Raw Data (2)', ...
+
+    The base name is shortened so the suffix always fits Excel's 31 characters.
+    """
+    if number == 1:
+        return sheet_name[:MAX_SHEET_NAME]
+    suffix = f' ({number})'
+    return sheet_name[:MAX_SHEET_NAME - len(suffix)] + suffix
+
+
+def planned_sheets(sheet_name, total_rows, policy=DEFAULT_OVERFLOW):
+    """
+    Names of the sheets write_frame_sheets will write for total_rows findings
+
+    Lets callers that create their worksheets up front keep continuation
+    sheets next to the first one.
+    """
+    count = -(-total_rows // policy.sheet_rows) if policy.layout(total_rows) == 'sheets' else 1
+    return [continuation_name(sheet_name, number) for number in range(1, count + 1)]
+
+
+def sidecar_path(output_file, sheet_name):
+    """
+    Path of the gzip CSV holding the full data of a sheet
+
+    Args:
+        output_file (str): Path of the workbook
+        sheet_name (str): Sheet whose data the sidecar holds
+
+    Returns:
+        str: '<workbook>_<sheet>.csv.gz' next to the workbook
+    """
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', sheet_name).strip('_')
+    return f"{os.path.splitext(output_file)[0]}_{slug}.csv.gz"
+
+
+def count_rows(df, rows=None):
+    """Number of rows selected by the boolean mask rows (all rows when None)"""
+    return len(df) if rows is None else int(np.count_nonzero(rows))
+
+
+def row_chunks(df, rows=None, chunk_rows=EXCEL_MAX_ROWS - 1):
+    """
+    Consecutive slices of df, optionally only the rows selected by a mask
+
+    Only one slice is materialized at a time, so a filtered sheet never
+    needs a filtered copy of the whole frame.
+
+    Args:
+        df (pd.DataFrame): Findings
+        rows (array-like, optional): Boolean mask aligned with df
+        chunk_rows (int, optional): Rows per slice
+
+    Yields:
+        pd.DataFrame: Slices in row order
+    """
+    if rows is None:
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+    positions = np.flatnonzero(np.asarray(rows))
+    for start in range(0, len(positions), chunk_rows):
+        yield df.iloc[positions[start:start + chunk_rows]]
+
+
+def write_sidecar(df, path, rows=None, progress=NULL_PROGRESS):
+    """
+    Stream findings into a gzip-compressed CSV
+
+    Args:
+        df (pd.DataFrame): Findings
+        path (str): Sidecar file to create
+        rows (array-like, optional): Boolean mask of the rows to write
+        progress (StageProgress, optional): Counts written rows
+
+    Returns:
+        str: Path to the sidecar
+    """
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as fh:
+        for number, chunk in enumerate(row_chunks(df, rows, SIDECAR_CHUNK_ROWS)):
+            chunk.to_csv(fh, index=False, header=number == 0)
+            progress.advance(len(chunk))
+    return path
+
+
+def sidecar_note(path, total_rows):
+    """Text placed right of the header row of a sheet whose full data is in a sidecar"""
+    return f"First rows only - all {total_rows} rows: {os.path.basename(path)}"
+
+
+def write_frame_sheets(writer, df, sheet_name, output_file, rows=None, policy=DEFAULT_OVERFLOW, format_sheet=None,
+                       progress=NULL_PROGRESS, sidecar_written=False):
+    """
+    Write findings to a workbook sheet, handling Excel's row limit
+
+    Up to the limit this is a plain to_excel. Beyond it, the rows spill into
+    continuation sheets, or the sheet keeps the first rows and the full data
+    is streamed to a gzip CSV that the header row links to.
+
+    Args:
+        writer (pd.ExcelWriter): Writer using the xlsxwriter engine
+        df (pd.DataFrame): Findings
+        sheet_name (str): Name of the (first) sheet
+        output_file (str): Path of the workbook, used to place a sidecar
+        rows (array-like, optional): Boolean mask of the rows to write
+        policy (OverflowPolicy, optional): Overflow handling
+        format_sheet (callable, optional): format_sheet(worksheet, chunk), called
+            for every sheet written
+        progress (StageProgress, optional): Counts written rows
+        sidecar_written (bool, optional): The caller writes the sidecar itself,
+            e.g. in a concurrent I/O stage; the sheet still links to it
+
+    Returns:
+        tuple: (list of sheet names written, sidecar path or None)
+    """
+    total_rows = count_rows(df, rows)
+    layout = policy.layout(total_rows)
+
+    sheet_names = []
+    sidecar = None
+    chunks = row_chunks(df, rows, policy.sheet_rows)
+    if layout == 'sidecar':
+        sidecar = sidecar_path(output_file, sheet_name)
+        if not sidecar_written:
+            write_sidecar(df, sidecar, rows, progress)
+        chunks = [next(chunks)]
+    elif total_rows == 0:
+        chunks = [df.iloc[:0]]
+
+    for number, chunk in enumerate(chunks, start=1):
+        name = continuation_name(sheet_name, number)
+        chunk.to_excel(writer, sheet_name=name, index=False)
+        if format_sheet is not None:
+            format_sheet(writer.sheets[name], chunk)
+        if sidecar is None:
+            progress.advance(len(chunk))
+        sheet_names.append(name)
+
+    if sidecar is not None:
+        writer.sheets[sheet_names[0]].write_url(0, len(df.columns), f'external:{os.path.basename(sidecar)}',
+                                                string=sidecar_note(sidecar, total_rows))
+    return sheet_names, sidecar
+
+
+def frame_sheet_specs(df, sheet_name, output_file, header_format='header', policy=DEFAULT_OVERFLOW,
+                      progress=NULL_PROGRESS):
+    """
+    Sheet specs for the parallel writer, handling Excel's row limit
+
+    Same layouts as write_frame_sheets. The parallel writer has no
+    hyperlinks, so a sidecar is named in a plain header cell.
+
+    Args:
+        df (pd.DataFrame): Findings
+        sheet_name (str): Name of the (first) sheet
+        output_file (str): Path of the workbook, used to place a sidecar
+        header_format (str, optional): Format name of the header row
+        policy (OverflowPolicy, optional): Overflow handling
+        progress (StageProgress, optional): Counts rows written to a sidecar
+
+    Returns:
+        list: Sheet specs in workbook order
+    """
+    header = list(df.columns)
+    layout = policy.layout(len(df))
+
+    chunks = row_chunks(df, chunk_rows=policy.sheet_rows) if len(df) else [df]
+    if layout == 'sidecar':
+        sidecar = write_sidecar(df, sidecar_path(output_file, sheet_name), progress=progress)
+        header = header + [sidecar_note(sidecar, len(df))]
+        chunks = [next(chunks)]
+
+    return [
+        {
+            'name': continuation_name(sheet_name, number),
+            'blocks': [{'start_row': 0, 'header': (header, header_format), 'frame': chunk}]
+        }
+        for number, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def add_overflow_arguments(parser):
+    """
+    Add the options for sheets beyond Excel's row limit
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--overflow', choices=OVERFLOW_MODES, default='auto',
+                        help="Raw findings beyond Excel's 1,048,576 rows: 'sheets' spills into numbered "
+                             "continuation sheets, 'sidecar' streams all rows to a .csv.gz next to the "
+                             "workbook, 'auto' picks by --sidecar-threshold")
+    parser.add_argument('--sidecar-threshold', type=int, default=DEFAULT_SIDECAR_THRESHOLD, metavar='ROWS',
+                        help=f"Rows above which 'auto' writes a sidecar (default: {DEFAULT_SIDECAR_THRESHOLD})")
+
+
+def overflow_from_args(args):
+    """
+    Create an OverflowPolicy from parsed overflow options
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        OverflowPolicy: Policy for the run
+    """
+    return OverflowPolicy(args.overflow, args.sidecar_threshold)
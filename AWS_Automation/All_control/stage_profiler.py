@@ -0,0 +1,251 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+# tracemalloc counts every thread of the process, so its figures describe a stage only while
+# no stage runs in another thread; these count the stages running, and started, off the main thread
+_thread_stages = {'running': 0, 'started': 0}
+_thread_stages_lock = threading.Lock()
+
+
+def _rss_peak_mb():
+    """Process peak resident set size so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / MB if sys.platform == 'darwin' else peak / 1024
+
+
+def _rss_mb():
+    """Current resident set size, in MB"""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StageProfiler:
+    def __init__(self, entry_point, enabled=True, trace_memory=True, cprofile_stage=None, cprofile_path=None):
+        """
+        Record wall time, CPU time and memory for named pipeline stages
+
+        Args:
+            entry_point (str): Name of the script or class being profiled
+            enabled (bool, optional): When False, stage() is a no-op
+            trace_memory (bool, optional): Track Python allocations with tracemalloc
+            cprofile_stage (str, optional): Stage to run under cProfile
+            cprofile_path (str, optional): Where to dump the cProfile stats
+        """
+        self.entry_point = entry_point
+        self.enabled = enabled
+        self.trace_memory = trace_memory and enabled
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_path = cprofile_path
+        self.cprofile_summary = None
+        self.stages = []
+        # Stages may run in I/O threads; each thread nests its own stages
+        self._local = threading.local()
+        self._started_at = datetime.now().isoformat(timespec='seconds')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager timing one named stage; stages may be nested
+
+        Args:
+            name (str): Stage name, e.g. 'load_input' or 'sheet:Raw Data'
+        """
+        if not self.enabled:
+            yield
+            return
+
+        record = {'name': name, 'depth': len(self._stack), 'tracemalloc_peak_bytes': 0}
+        on_main_thread = threading.current_thread() is threading.main_thread()
+        if not on_main_thread:
+            record['thread'] = threading.current_thread().name
+            with _thread_stages_lock:
+                _thread_stages['running'] += 1
+                _thread_stages['started'] += 1
+        elif self.trace_memory:
+            with _thread_stages_lock:
+                thread_stages_at_start = (_thread_stages['running'], _thread_stages['started'])
+            # Only main-thread stages reset the peak, so a stage in an I/O thread
+            # cannot wipe the peak of the stage that started it
+            if self._stack:
+                # Keep the enclosing stage's peak before resetting it for this one
+                parent = self._stack[-1]
+                parent['tracemalloc_peak_bytes'] = max(parent['tracemalloc_peak_bytes'],
+                                                       tracemalloc.get_traced_memory()[1])
+            record['tracemalloc_start_bytes'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        profile = None
+        if name == self.cprofile_stage:
+            profile = cProfile.Profile()
+            profile.enable()
+
+        self._stack.append(record)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record['wall_s'] = round(time.perf_counter() - start_wall, 4)
+            record['cpu_s'] = round(time.process_time() - start_cpu, 4)
+            if profile is not None:
+                profile.disable()
+                self._save_cprofile(name, profile)
+            self._stack.pop()
+
+            if not on_main_thread:
+                with _thread_stages_lock:
+                    _thread_stages['running'] -= 1
+            if self.trace_memory:
+                alone = on_main_thread and thread_stages_at_start == (0, _thread_stages['started'])
+                self._record_memory(record, alone)
+            else:
+                record.pop('tracemalloc_peak_bytes')
+
+            rss_peak, rss = _rss_peak_mb(), _rss_mb()
+            record['rss_peak_mb'] = round(rss_peak, 2) if rss_peak is not None else None
+            record['rss_mb'] = round(rss, 2) if rss is not None else None
+            self.stages.append(record)
+
+    def _record_memory(self, record, attributable):
+        # A stage that ran beside thread stages shares its figures with them, so none are reported
+        peak = record.pop('tracemalloc_peak_bytes')
+        start = record.pop('tracemalloc_start_bytes', None)
+        record['memory_attributable'] = attributable
+        if not attributable:
+            record['tracemalloc_peak_mb'] = None
+            record['tracemalloc_delta_mb'] = None
+            return
+        current, traced_peak = tracemalloc.get_traced_memory()
+        peak = max(peak, traced_peak)
+        record['tracemalloc_peak_mb'] = round(peak / MB, 2)
+        record['tracemalloc_delta_mb'] = round((current - start) / MB, 2)
+        if self._stack:
+            parent = self._stack[-1]
+            parent['tracemalloc_peak_bytes'] = max(parent['tracemalloc_peak_bytes'], peak)
+
+    def _save_cprofile(self, name, profile):
+        dump_path = self.cprofile_path or f"{name.replace(':', '_').replace(' ', '_')}.prof"
+        profile.dump_stats(dump_path)
+
+        stats = pstats.Stats(profile)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:25]
+        self.cprofile_summary = {
+            'stage': name,
+            'dump': os.path.abspath(dump_path),
+            'top_cumulative': [
+                {
+                    'function': f"{filename}:{line}({func})",
+                    'ncalls': calls,
+                    'tottime_s': round(tottime, 4),
+                    'cumtime_s': round(cumtime, 4)
+                }
+                for (filename, line, func), (_, calls, tottime, cumtime, _) in top
+            ]
+        }
+
+    def report(self):
+        """
+        Build the profile report
+
+        Returns:
+            dict: Stages in completion order plus run totals
+        """
+        report = {
+            'entry_point': self.entry_point,
+            'started_at': self._started_at,
+            'total_wall_s': round(time.perf_counter() - self._start_wall, 4),
+            'total_cpu_s': round(time.process_time() - self._start_cpu, 4),
+            'rss_peak_mb': _rss_peak_mb(),
+            'stages': self.stages
+        }
+        if self.cprofile_summary:
+            report['cprofile'] = self.cprofile_summary
+        return report
+
+    def write_json(self, path):
+        """
+        Write the profile report as JSON
+
+        Args:
+            path (str): Output JSON path
+        """
+        if not self.enabled:
+            return
+        with open(path, 'w') as fh:
+            json.dump(self.report(), fh, indent=2)
+        print(f"Profile written: {path}")
+
+
+def add_profile_arguments(parser):
+    """
+    Add the shared --profile options to an argparse parser
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--profile', metavar='JSON_PATH', default=None,
+                        help="Record wall time, CPU time and peak memory per stage and write them as JSON")
+    parser.add_argument('--profile-stage', metavar='STAGE', default=None,
+                        help="Also run this stage under cProfile and dump its stats next to the JSON")
+    parser.add_argument('--no-trace-memory', action='store_true',
+                        help="Skip tracemalloc (it slows allocation-heavy stages); RSS is still recorded")
+
+
+def profiler_from_args(args, entry_point):
+    """
+    Create a StageProfiler from parsed --profile options
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+        entry_point (str): Name recorded in the report
+
+    Returns:
+        StageProfiler: Enabled only when --profile was given
+    """
+    cprofile_path = None
+    if args.profile and args.profile_stage:
+        safe_stage = args.profile_stage.replace(':', '_').replace(' ', '_')
+        cprofile_path = f"{os.path.splitext(args.profile)[0]}_{safe_stage}.prof"
+    return StageProfiler(
+        entry_point,
+        enabled=bool(args.profile),
+        trace_memory=not args.no_trace_memory,
+        cprofile_stage=args.profile_stage,
+        cprofile_path=cprofile_path
+    )
+
+
+# Shared disabled profiler used as the default by instrumented functions
+NULL_PROFILER = StageProfiler('disabled', enabled=False)
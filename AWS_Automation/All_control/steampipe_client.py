@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+
+import pandas as pd
+
+try:
+    from psycopg2 import sql
+    from psycopg2.extensions import parse_dsn
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:  # only needed with --steampipe-dsn
+    sql = parse_dsn = ThreadedConnectionPool = None
+
+from run_metrics import NULL_PROGRESS
+
+# Steampipe service started by the per-account containers (see start_services.sh)
+DEFAULT_DSN = 'postgresql://steampipe@localhost:9193/steampipe'
+DEFAULT_BATCH_SIZE = 5000
+
+# Columns every control query must return; extra columns (region, account_id, ...) are kept
+CONTROL_RESULT_COLUMNS = ['resource', 'status', 'reason']
+
+# Per-control fields copied from the control query file onto every result row
+CONTROL_FIELDS = ['title', 'control_title', 'control_description']
+
+# Parts of the DSN that tell one Steampipe service from another; each client's container
+# listens on its own port, so cached results must not cross endpoints
+ENDPOINT_FIELDS = ['host', 'port', 'dbname']
+
+
+class QueryCache:
+    def __init__(self, ttl=300.0, cache_dir=None):
+        """
+        Query results kept for a limited time, keyed by endpoint, query, parameters and account
+
+        Entries live in memory; with cache_dir they are also pickled to disk
+        so later runs within the TTL skip the database.
+
+        Args:
+            ttl (float, optional): Seconds an entry stays valid; 0 disables the cache
+            cache_dir (str, optional): Directory for the on-disk copy
+        """
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(query, params=None, account=None, endpoint=None):
+        """
+        Cache key of a query
+
+        Args:
+            query (str): SQL
+            params (dict or tuple, optional): Query parameters
+            account (str, optional): Steampipe connection searched first
+            endpoint (dict, optional): Host, port and database the query runs against
+
+        Returns:
+            str: Hex digest
+        """
+        material = json.dumps([endpoint, query, params, account], default=str, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Cached batches for a key
+
+        Returns:
+            list: DataFrame batches, or None when missing or expired
+        """
+        if not self.ttl:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+
+        if self.cache_dir and os.path.exists(self._path(key)):
+            if os.path.getmtime(self._path(key)) + self.ttl > now:
+                try:
+                    with open(self._path(key), 'rb') as fh:
+                        batches = pickle.load(fh)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    batches = None
+                if batches is not None:
+                    with self._lock:
+                        self._entries[key] = (os.path.getmtime(self._path(key)) + self.ttl, batches)
+                        self.hits += 1
+                    return batches
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, batches):
+        """Store the complete result of a query"""
+        if not self.ttl:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, batches)
+        if self.cache_dir:
+            temp_file = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_file, 'wb') as fh:
+                pickle.dump(batches, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self._path(key))
+
+    def clear_expired(self):
+        """Drop expired in-memory entries"""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+
+
+class SteampipeClient:
+    def __init__(self, dsn=DEFAULT_DSN, min_connections=1, max_connections=4,
+                 batch_size=DEFAULT_BATCH_SIZE, cache=None):
+        """
+        Pooled client for the Steampipe Postgres endpoint
+
+        Results are read through server-side (named) cursors and handed out
+        in DataFrame batches, so a large table never has to fit in memory
+        before enrichment starts.
+
+        Args:
+            dsn (str, optional): Connection string of the Steampipe service
+            min_connections (int, optional): Connections opened up front
+            max_connections (int, optional): Upper bound of pooled connections
+            batch_size (int, optional): Rows fetched from the server per batch
+            cache (QueryCache, optional): Result cache; None disables caching. A
+                cached query's batches are all held until it completes, so the
+                cache gives up the streaming memory bound for the queries it keeps
+        """
+        if ThreadedConnectionPool is None:
+            raise ImportError("Reading from Steampipe needs psycopg2: pip install psycopg2-binary")
+        self.dsn = dsn
+        dsn_parameters = parse_dsn(dsn)
+        self.endpoint = {field: dsn_parameters.get(field) for field in ENDPOINT_FIELDS}
+        self.batch_size = batch_size
+        self.cache = cache
+        self.pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+        self._cursor_ids = count(1)
+
+    def close(self):
+        self.pool.closeall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; the transaction is rolled back when the block ends"""
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            if not conn.closed:
+                conn.rollback()
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    def stream(self, query, params=None, account=None, batch_size=None):
+        """
+        Run a query and yield its rows in DataFrame batches
+
+        Args:
+            query (str): SQL to run
+            params (dict or tuple, optional): Query parameters
+            account (str, optional): Steampipe connection (schema) to search first,
+                e.g. 'aws_client_a'; part of the cache key
+            batch_size (int, optional): Rows per batch (default: the client's batch size)
+
+        Yields:
+            pd.DataFrame: Up to batch_size rows
+        """
+        # Batches are only buffered for a cache that keeps them
+        key = self.cache.key(query, params, account, self.endpoint) if self.cache and self.cache.ttl else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield from cached
+                return
+
+        batches = []
+        batch_size = batch_size or self.batch_size
+        with self.connection() as conn:
+            if account:
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL("set local search_path to {}, public").format(sql.Identifier(account)))
+
+            # A named cursor keeps the result set on the server and sends itersize rows per round trip
+            with conn.cursor(name=f"steampipe_stream_{next(self._cursor_ids)}") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, params)
+                columns = None
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if columns is None:
+                        columns = [desc[0] for desc in cur.description]
+                    if not rows:
+                        break
+                    batch = pd.DataFrame(rows, columns=columns)
+                    if key:
+                        batches.append(batch)
+                    yield batch
+
+        if key:
+            self.cache.put(key, batches)
+
+    def query(self, query, params=None, account=None):
+        """
+        Run a query and return the complete result
+
+        Returns:
+            pd.DataFrame: All rows
+        """
+        batches = list(self.stream(query, params, account))
+        if not batches:
+            return pd.DataFrame()
+        return pd.concat(batches, ignore_index=True)
+
+
+def load_control_queries(control_queries_file):
+    """
+    Read the control queries to run against Steampipe
+
+    The file is a JSON list; each entry has title (service group),
+    control_title, optional control_description and sql. The SQL must return
+    resource, status and reason, plus any dimension columns such as region
+    and account_id.
+
+    Args:
+        control_queries_file (str): Path to the JSON file
+
+    Returns:
+        list: Control query dictionaries
+    """
+    with open(control_queries_file) as fh:
+        controls = json.load(fh)
+    for idx, control in enumerate(controls, 1):
+        missing = [key for key in ['title', 'control_title', 'sql'] if not control.get(key)]
+        if missing:
+            raise ValueError(f"Control {idx} in {control_queries_file} is missing: {', '.join(missing)}")
+    return controls
+
+
+def stream_control_results(client, controls, accounts=None, progress=NULL_PROGRESS):
+    """
+    Yield control results in batches shaped like the Powerpipe CSV export
+
+    Args:
+        client (SteampipeClient): Connected client
+        controls (list): Control queries from load_control_queries
+        accounts (list, optional): Steampipe connections to run every control against;
+            None runs against the default search path
+        progress (StageProgress, optional): Counts fetched rows
+
+    Yields:
+        pd.DataFrame: Result rows with title, control_title, control_description,
+            resource, status, reason and the query's dimension columns
+    """
+    for account in accounts or [None]:
+        for control in controls:
+            for batch in client.stream(control['sql'], account=account):
+                missing = [column for column in CONTROL_RESULT_COLUMNS if column not in batch.columns]
+                if missing:
+                    raise ValueError(f"Query for '{control['control_title']}' does not return: {', '.join(missing)}")
+                batch = batch.copy()
+                for position, field in enumerate(CONTROL_FIELDS):
+                    batch.insert(position, field, control.get(field, ''))
+                progress.advance(len(batch))
+                yield batch
+
+
+def add_steampipe_arguments(parser):
+    """
+    Add the options for reading findings straight from Steampipe
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--steampipe-dsn', metavar='DSN', default=None,
+                        help=f"Read control results from this Steampipe endpoint instead of an input file "
+                             f"(e.g. {DEFAULT_DSN})")
+    parser.add_argument('--control-queries', metavar='PATH.json', default='control_queries.json',
+                        help="Control queries to run with --steampipe-dsn (default: control_queries.json)")
+    parser.add_argument('--accounts', default=None,
+                        help="Comma-separated Steampipe connections to query (default: the search path)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per server-side cursor batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--pool-size', type=int, default=4, help="Maximum pooled connections (default: 4)")
+    parser.add_argument('--query-cache-ttl', type=float, default=0.0,
+                        help="Seconds query results are reused for the same endpoint, query and account; "
+                             "cached queries are held in memory whole instead of streamed (default: 0, off)")
+    parser.add_argument('--query-cache-dir', metavar='DIR', default=None,
+                        help="Keep cached query results on disk so later runs within the TTL reuse them")
+
+
+def steampipe_client_from_args(args):
+    """
+    Create a SteampipeClient from parsed options
+
+    Returns:
+        SteampipeClient: Client with the configured pool, batch size and cache
+    """
+    cache = QueryCache(args.query_cache_ttl, args.query_cache_dir) if args.query_cache_ttl else None
+    return SteampipeClient(args.steampipe_dsn, max_connections=args.pool_size,
+                           batch_size=args.batch_size, cache=cache)
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions of the findings cube; every summary sheet is a roll-up over a subset of them
+CUBE_KEYS = ['category', 'title', 'control_title', 'control_description', 'priority', 'status',
+             'account_id', 'region']
+
+# Statuses counted as compliant by every summary sheet
+COMPLIANT_STATUSES = ['ok', 'info', 'skip']
+
+SUMMARY_KEYS = ['title', 'control_title', 'control_description']
+SERVICE_KEYS = ['title', 'control_title', 'control_description', 'priority']
+
+
+def category_lookup(categories):
+    """
+    Map each service title to its category
+
+    Args:
+        categories (dict): Category name -> service titles, in sheet order
+
+    Returns:
+        dict: Service title -> first category listing it
+    """
+    lookup = {}
+    for category, services in categories.items():
+        for service in services:
+            lookup.setdefault(service, category)
+    return lookup
+
+
+def build_cube(df, categories=None, keys=CUBE_KEYS, count_columns=()):
+    """
+    Count findings per combination of the cube keys in a single pass
+
+    Missing values are kept as their own key, so roll-ups drop them exactly
+    like a groupby over the full findings would. The 'first' column is the
+    lowest row label of each cell; it keeps first-seen order across merges.
+
+    Args:
+        df (pd.DataFrame): Findings
+        categories (dict, optional): Category name -> service titles; needed
+            for the 'category' key, which is derived from 'title'
+        keys (list, optional): Key columns; keys missing from df are skipped
+        count_columns (iterable, optional): Columns whose non-empty values are
+            counted per cell, under the column's own name
+
+    Returns:
+        pd.DataFrame: One row per cell with the keys, 'count' and 'first'
+    """
+    columns = {}
+    for key in keys:
+        if key == 'category' and categories is not None and 'title' in df.columns:
+            columns[key] = df['title'].map(category_lookup(categories))
+        elif key in df.columns:
+            columns[key] = df[key]
+    # Sharded runs keep the export's row numbers as the index
+    columns['first'] = df.index if pd.api.types.is_integer_dtype(df.index) else np.arange(len(df))
+    for column in count_columns:
+        columns[column] = df[column].notna()
+
+    frame = pd.DataFrame(columns, index=df.index)
+    cube_keys = [key for key in keys if key in frame.columns]
+    aggregations = {'count': ('first', 'size'), 'first': ('first', 'min')}
+    aggregations.update({column: (column, 'sum') for column in count_columns})
+    return frame.groupby(cube_keys, sort=False, dropna=False).agg(**aggregations).reset_index()
+
+
+def merge_cubes(cubes):
+    """
+    Merge cubes built from disjoint parts of an export
+
+    Args:
+        cubes (list): Cubes from build_cube with the same keys
+
+    Returns:
+        pd.DataFrame: Cube of the whole export, cells in first-seen order
+    """
+    cubes = [cube for cube in cubes if not cube.empty] or cubes[:1]
+    combined = pd.concat(cubes, ignore_index=True)
+    values = cube_values(combined)
+    keys = [column for column in combined.columns if column not in values]
+    aggregations = {column: (column, 'min' if column == 'first' else 'sum') for column in values}
+    merged = combined.groupby(keys, sort=False, dropna=False).agg(**aggregations).reset_index()
+    return merged.sort_values('first', kind='stable', ignore_index=True)
+
+
+def cube_values(cube):
+    """Value columns of a cube: 'count', 'first' and any counted columns after them"""
+    return list(cube.columns[cube.columns.get_loc('count'):])
+
+
+def status_slice(cube, statuses):
+    """
+    Cells of the cube with one of the given statuses
+
+    Args:
+        cube (pd.DataFrame): Cube from build_cube
+        statuses (list): Status values to keep
+
+    Returns:
+        pd.DataFrame: Matching cells
+    """
+    return cube[cube['status'].isin(statuses)]
+
+
+def rollup(cube, keys, column='count', sort=True):
+    """
+    Sum a value column over a subset of the cube keys
+
+    Args:
+        cube (pd.DataFrame): Cube (or a slice of it)
+        keys (list): Keys to keep; cells with a missing key are dropped
+        column (str, optional): Value column to sum
+        sort (bool, optional): Sort by the keys; False keeps first-seen order
+
+    Returns:
+        pd.Series: Sum per key combination
+    """
+    return cube.groupby(keys, sort=sort)[column].sum()
+
+
+def row_count(cube):
+    """Number of findings counted in the cube"""
+    return int(cube['count'].sum())
+
+
+def control_summary(cube, statuses):
+    """
+    Findings per control for the Summary Tables sheet
+
+    Args:
+        cube (pd.DataFrame): Cube from build_cube
+        statuses (list): Statuses of the section
+
+    Returns:
+        pd.DataFrame: title, control_title, control_description, 'Open Issues'
+            and the first priority seen for each control, sorted by control
+    """
+    section = status_slice(cube, statuses)
+    summary = rollup(section, SUMMARY_KEYS).reset_index(name='Open Issues')
+    first_priority = section.drop_duplicates('control_title').set_index('control_title')['priority']
+    summary['priority'] = summary['control_title'].map(first_priority)
+    return summary
+
+
+def category_rows(cube, categories):
+    """
+    [category, open issues, safe count, total] for each category with findings
+
+    Args:
+        cube (pd.DataFrame): Cube from build_cube
+        categories (dict): Category name -> service titles, in sheet order
+
+    Returns:
+        list: One row per category present in the findings
+    """
+    rows = []
+    for category, services in categories.items():
+        category_cells = cube[cube['title'].isin(services)]
+        if not category_cells.empty:
+            open_issues = row_count(status_slice(category_cells, ['alarm']))
+            safe_count = row_count(status_slice(category_cells, COMPLIANT_STATUSES))
+            rows.append([category, open_issues, safe_count, open_issues + safe_count])
+    return rows
+
+
+def priority_counts(cube):
+    """
+    Finding count per priority, most frequent first
+
+    Returns:
+        pd.Series: Same values and order as df['priority'].value_counts()
+    """
+    counts = rollup(cube, 'priority', sort=False)
+    counts.name = 'count'
+    return counts.sort_values(ascending=False, kind='stable')
+
+
+def service_pivot(cube):
+    """
+    Finding count per service (rows) and priority (columns)
+
+    Returns:
+        pd.DataFrame: Same frame as the 'size' pivot table of title by priority
+    """
+    counts = rollup(cube, ['title', 'priority'])
+    if counts.empty:
+        return pd.DataFrame()
+    return counts.unstack(fill_value=0)
+
+
+def service_controls(cube):
+    """
+    Open issues per service, control, description and priority
+
+    Returns:
+        pd.DataFrame: SERVICE_KEYS plus 'open_issues', sorted like a groupby
+    """
+    return rollup(status_slice(cube, ['alarm']), SERVICE_KEYS).reset_index(name='open_issues')
+
+
+def describe_cube(cube):
+    """One-line description of a cube for the console"""
+    parts = [f"{row_count(cube)} rows", f"{len(cube)} cells"]
+    parts += [f"{cube[column].nunique()} distinct {column}" for column in ['account_id', 'region']
+              if column in cube.columns]
+    return ', '.join(parts)
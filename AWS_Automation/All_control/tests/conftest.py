@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The report scripts import each other by module name from their own directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Controls of the fixture exports, one per category sheet the reports build
+CONTROLS = [('IAM', 'IAM root user should not have access keys'),
+            ('S3', 'S3 buckets should block public access'),
+            ('EC2', 'EC2 instances should use IMDSv2')]
+
+
+@pytest.fixture
+def aws_export():
+    """A small export in the aws_compliance all_controls layout"""
+    return pd.DataFrame([{
+        'group_id': 'aws_compliance.benchmark.all_controls', 'title': CONTROLS[i % 3][0],
+        'description': 'All controls', 'control_id': f"aws_compliance.control.c{i % 3}",
+        'control_title': CONTROLS[i % 3][1], 'control_description': f"{CONTROLS[i % 3][1]}.",
+        'reason': f"resource {i}", 'resource': f"arn:aws:{CONTROLS[i % 3][0].lower()}::111111111111:res-{i}",
+        'status': ['alarm', 'ok', 'alarm', 'info'][i % 4], 'severity': 'high',
+        'account_id': '111111111111', 'region': ['us-east-1', 'eu-west-1'][i % 2]} for i in range(12)])
+
+
+@pytest.fixture
+def gcp_export():
+    """A small export in the gcp_compliance layout"""
+    return pd.DataFrame([{
+        'group_id': 'gcp_compliance.benchmark.cis_v200', 'service': 'Compute', 'title': 'Compute Engine',
+        'status': ['alarm', 'ok'][i % 2], 'control_title': 'Instances should not use the default service account',
+        'control_description': 'Default service accounts have broad access.', 'reason': f"instance {i}",
+        'resource': f"projects/demo/zones/us-central1-a/instances/vm-{i}", 'project': 'demo',
+        'location': 'us-central1'} for i in range(6)])
+
+
+@pytest.fixture
+def annotations_file(tmp_path):
+    """Annotation database with a priority and recommendation for each fixture control"""
+    path = tmp_path / 'PowerPipeControls_Annotations.xlsx'
+    pd.DataFrame({'control_title': [title for _, title in CONTROLS],
+                  'priority': ['High', 'Medium', 'Low'],
+                  'Recommendation Steps/Approach': [f"Fix: {title}" for _, title in CONTROLS]}).to_excel(path, index=False)
+    return str(path)
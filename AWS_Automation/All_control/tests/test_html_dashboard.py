@@ -0,0 +1,35 @@
+import json
+import re
+
+import pandas as pd
+
+from html_dashboard import build_payload, render_dashboard
+
+HOSTILE = 'Tag "<!--<script>" & </script><b>bold</b>'
+
+
+def _aggregates():
+    return {
+        'priority_summary': pd.DataFrame({'Priority': ['High'], 'Open Issues': [1]}),
+        'service_pivot': pd.DataFrame({'High': [1]}, index=['S3']),
+        'service_analysis': pd.DataFrame({'Control': [HOSTILE], 'Open Issues': [1]}),
+    }
+
+
+def test_embedded_json_cannot_break_out_of_its_script_element(tmp_path):
+    findings = pd.DataFrame({'control_title': [HOSTILE, 'plain'], 'reason': ['a & b', '<!-- x'],
+                             'status': ['alarm', 'ok']})
+    output_file = tmp_path / 'dashboard.html'
+
+    render_dashboard(findings, _aggregates(), str(output_file), title='Acme <Q3>')
+
+    html = output_file.read_text(encoding='utf-8')
+    scripts = re.findall(r'<script id="report-data" type="application/json">(.*?)</script>', html, re.S)
+    assert len(scripts) == 1
+    assert not set('<>&') & set(scripts[0])
+
+    payload = json.loads(scripts[0])
+    expected = build_payload(findings, _aggregates(), 'Acme <Q3>')
+    assert payload['serviceAnalysis'] == expected['serviceAnalysis']
+    assert payload['findings'] == expected['findings']
+    assert payload['title'] == 'Acme <Q3>'
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+import report_daemon
+from report_daemon import JOB_LOG
+
+
+@pytest.fixture
+def drop_dir(tmp_path, aws_export, gcp_export):
+    """A drop directory with an AWS export, a GCP export and an export missing required columns"""
+    drop = tmp_path / 'drop'
+    drop.mkdir()
+    aws_export.to_csv(drop / 'aws_compliance.benchmark.all_controls.csv', index=False)
+    gcp_export.to_csv(drop / 'gcp_compliance.benchmark.cis_v200.csv', index=False)
+    aws_export.drop(columns=['status', 'region']).to_csv(drop / 'broken_export.csv', index=False)
+    return drop
+
+
+def test_once_reports_and_sorts_the_drop_dir(tmp_path, drop_dir, annotations_file, monkeypatch):
+    output_dir = tmp_path / 'reports'
+    monkeypatch.setattr(sys, 'argv', ['report_daemon.py', str(drop_dir), '--once', '--poll', '0.05',
+                                      '--output-dir', str(output_dir), '--priority-file', annotations_file,
+                                      '--template-cache', str(tmp_path / 'templates'), '--client-name', 'Acme'])
+
+    # One export failed, so the run exits with 1
+    assert report_daemon.main() == 1
+
+    assert sorted(os.listdir(drop_dir)) == ['failed', 'processed']
+    assert sorted(os.listdir(drop_dir / 'processed')) == ['aws_compliance.benchmark.all_controls.csv',
+                                                          'gcp_compliance.benchmark.cis_v200.csv']
+    assert os.listdir(drop_dir / 'failed') == ['broken_export.csv']
+
+    with open(output_dir / JOB_LOG) as fh:
+        records = {record['export']: record for record in map(json.loads, fh)}
+    assert set(records) == {'aws_compliance.benchmark.all_controls.csv', 'gcp_compliance.benchmark.cis_v200.csv',
+                            'broken_export.csv'}
+
+    aws = records['aws_compliance.benchmark.all_controls.csv']
+    assert aws['status'] == 'ok'
+    assert set(aws['outputs']) == {'xlsx', 'html', 'docx'}
+    assert aws['moved_to'] == str(drop_dir / 'processed' / 'aws_compliance.benchmark.all_controls.csv')
+    for path in aws['outputs'].values():
+        assert os.path.dirname(path) == str(output_dir)
+        assert os.path.getsize(path) > 0
+
+    gcp = records['gcp_compliance.benchmark.cis_v200.csv']
+    assert gcp['status'] == 'ok'
+    assert os.path.exists(gcp['outputs']['xlsx'])
+
+    broken = records['broken_export.csv']
+    assert broken['status'] == 'failed'
+    assert broken['moved_to'] == str(drop_dir / 'failed' / 'broken_export.csv')
+    assert broken['error'].endswith('is missing columns the all_controls schema requires: status, region')
+    assert 'outputs' not in broken
+
+
+def test_export_dropped_again_is_kept_beside_the_first(tmp_path, drop_dir, annotations_file, aws_export):
+    engine = report_daemon.ReportEngine(annotations_file, template_cache_dir=str(tmp_path / 'templates'))
+    daemon = report_daemon.ReportDaemon(engine, str(drop_dir), str(tmp_path / 'reports'), poll_interval=0.05)
+    daemon.run(once=True)
+
+    aws_export.drop(columns=['status']).to_csv(drop_dir / 'broken_export.csv', index=False)
+    results = report_daemon.ReportDaemon(engine, str(drop_dir), str(tmp_path / 'reports'),
+                                         poll_interval=0.05).run(once=True)
+
+    assert [result['export'] for result in results] == ['broken_export.csv']
+    failed = sorted(os.listdir(drop_dir / 'failed'))
+    assert len(failed) == 2 and failed[0] == 'broken_export.csv'
+    assert results[0]['moved_to'] == str(drop_dir / 'failed' / failed[1])
+
+
+def test_failed_move_is_recorded_and_the_run_ends(tmp_path, drop_dir, annotations_file, monkeypatch):
+    move = shutil.move
+
+    def locked(source, target):
+        if os.path.basename(source) == 'gcp_compliance.benchmark.cis_v200.csv':
+            raise PermissionError(13, 'Permission denied', source)
+        return move(source, target)
+
+    monkeypatch.setattr(report_daemon.shutil, 'move', locked)
+    engine = report_daemon.ReportEngine(annotations_file, template_cache_dir=str(tmp_path / 'templates'))
+    daemon = report_daemon.ReportDaemon(engine, str(drop_dir), str(tmp_path / 'reports'), poll_interval=0.05)
+
+    results = {record['export']: record for record in daemon.run(once=True)}
+
+    locked_record = results['gcp_compliance.benchmark.cis_v200.csv']
+    assert locked_record['status'] == 'failed'
+    assert 'moved_to' not in locked_record
+    assert locked_record['error'].startswith('could not move the export out of the drop directory: ')
+    assert 'Permission denied' in locked_record['error']
+    assert results['aws_compliance.benchmark.all_controls.csv']['status'] == 'ok'
+    # The export stays for the next start; the other two were moved
+    assert os.path.exists(drop_dir / 'gcp_compliance.benchmark.cis_v200.csv')
+    with open(tmp_path / 'reports' / JOB_LOG) as fh:
+        assert len(fh.readlines()) == 3
+
+
+def test_same_named_exports_never_share_an_output(tmp_path, annotations_file, aws_export, gcp_export):
+    engine = report_daemon.ReportEngine(annotations_file, template_cache_dir=str(tmp_path / 'templates'))
+    export = tmp_path / 'aws_compliance.benchmark.all_controls.csv'
+    aws_export.to_csv(export, index=False)
+    gcp = tmp_path / 'gcp_compliance.benchmark.cis_v200.csv'
+    gcp_export.to_csv(gcp, index=False)
+
+    runs = [engine.run(str(export), str(tmp_path / 'reports'), 'Acme', '') for _ in range(2)]
+    runs += [engine.run(str(gcp), str(tmp_path / 'reports'), 'Acme', '') for _ in range(2)]
+
+    paths = [path for outputs in runs for path in outputs.values()]
+    assert len(set(paths)) == len(paths) == 8
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_moves_of_same_named_exports_get_their_own_names(tmp_path, drop_dir, annotations_file):
+    daemon = report_daemon.ReportDaemon(None, str(drop_dir), str(tmp_path / 'reports'))
+    targets = []
+    for _ in range(3):
+        export = drop_dir / 'broken_export.csv'
+        export.write_text('id\n1\n')
+        targets.append(daemon._finish(str(export), report_daemon.FAILED_DIR))
+
+    assert len(set(targets)) == 3
+    assert sorted(os.listdir(drop_dir / 'failed')) == sorted(os.path.basename(target) for target in targets)
@@ -0,0 +1,137 @@
+import http.client
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import report_service
+from report_service import ReportRequestHandler, ReportService
+
+EXPORT_NAME = 'aws_compliance.benchmark.all_controls.csv'
+
+
+@pytest.fixture
+def service(tmp_path, annotations_file):
+    service = ReportService(cache_dir=str(tmp_path / 'cache'), workers=1, priority_file=annotations_file,
+                            template_cache_dir=str(tmp_path / 'templates'))
+    service.start()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReportRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.port = server.server_address[1]
+    yield service
+    server.shutdown()
+    service.close()
+
+
+@pytest.fixture
+def export(aws_export):
+    return aws_export.to_csv(index=False).encode('utf-8')
+
+
+def _request(service, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', service.port, timeout=120)
+    conn.request(method, path, body=body)
+    response = conn.getresponse()
+    payload = response.read()
+    conn.close()
+    return response, payload
+
+
+def _post(service, export, client_name='Acme'):
+    response, payload = _request(service, 'POST', f"/jobs?filename={EXPORT_NAME}&client_name={client_name}", export)
+    return response.status, json.loads(payload)
+
+
+def _events(service, job_id):
+    """Names of the job's server-sent events, read until the stream ends"""
+    conn = http.client.HTTPConnection('127.0.0.1', service.port, timeout=120)
+    conn.request('GET', f"/jobs/{job_id}/events")
+    response = conn.getresponse()
+    assert response.getheader('Content-Type') == 'text/event-stream'
+    names = [line[len('event: '):] for line in response.read().decode('utf-8').splitlines()
+             if line.startswith('event: ')]
+    conn.close()
+    return names
+
+
+def _break_pool(pool):
+    # A worker exiting mid-job breaks the whole pool, as an OOM kill would
+    future = pool.submit(os._exit, 1)
+    assert type(future.exception(timeout=60)).__name__ == 'BrokenProcessPool'
+    return pool
+
+
+def test_job_streams_to_finished_then_is_cached(service, export):
+    status, job = _post(service, export)
+    assert status == 202
+    assert job['status'] in ('queued', 'running')
+
+    events = _events(service, job['id'])
+    assert events[0] == 'started'
+    assert events[-1] == 'finished'
+    assert 'stage_end' in events
+
+    response, payload = _request(service, 'GET', f"/jobs/{job['id']}")
+    done = json.loads(payload)
+    assert done['status'] == 'done'
+    assert set(done['outputs']) == {'xlsx', 'html', 'docx'}
+    response, report = _request(service, 'GET', done['outputs']['docx'])
+    assert response.status == 200
+    assert report[:2] == b'PK'
+
+    status, cached = _post(service, export)
+    assert status == 200
+    assert cached['cached'] is True
+    assert cached['key'] == job['key']
+    assert cached['outputs'] == done['outputs']
+    assert _events(service, cached['id']) == ['finished']
+
+
+def test_broken_pool_is_replaced(service, export):
+    _break_pool(service.pool)
+
+    status, job = _post(service, export)
+
+    assert status == 202
+    assert _events(service, job['id'])[-1] == 'finished'
+
+
+def test_failed_submit_leaves_no_job_behind(service, export, monkeypatch):
+    _break_pool(service.pool)
+    # The replacement workers die as well
+    monkeypatch.setattr(service, '_new_pool', lambda: _break_pool(ProcessPoolExecutor(max_workers=1)))
+
+    status, error = _post(service, export)
+
+    assert status == 503
+    assert 'No report worker could take the job' in error['error']
+    assert service.jobs == {}
+    assert service.running_keys == {}
+
+    # The next upload gets a working pool and is queued, not joined to the failed attempt
+    monkeypatch.undo()
+    status, job = _post(service, export)
+    assert status == 202
+    assert _events(service, job['id'])[-1] == 'finished'
+
+
+def test_finished_jobs_are_evicted(service, export, monkeypatch):
+    status, first = _post(service, export)
+    _events(service, first['id'])
+    monkeypatch.setattr(report_service, 'MAX_FINISHED_JOBS', 2)
+
+    cached = [_post(service, export)[1] for _ in range(3)]
+
+    assert set(service.jobs) == {cached[1]['id'], cached[2]['id']}
+    response, _ = _request(service, 'GET', f"/jobs/{first['id']}")
+    assert response.status == 404
+
+    monkeypatch.setattr(report_service, 'FINISHED_JOB_TTL', 0)
+    status, latest = _post(service, export)
+    assert status == 200
+    assert list(service.jobs) == [latest['id']]
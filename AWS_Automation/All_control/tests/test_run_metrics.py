@@ -0,0 +1,43 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from run_metrics import RunMetrics
+
+
+def test_textfile_escapes_label_values(tmp_path):
+    textfile = tmp_path / 'report.prom'
+    metrics = RunMetrics('C:\\exports\\"acme"\nq3.csv', textfile=str(textfile), log_progress=False)
+
+    with metrics.stage('sheet:"Raw Data"\n', total_rows=10) as progress:
+        progress.advance(4)
+
+    lines = textfile.read_text().splitlines()
+    job = 'job="C:\\\\exports\\\\\\"acme\\"\\nq3.csv"'
+    assert f'report_stage_rows_processed{{{job},stage="sheet:\\"Raw Data\\"\\n"}} 4.0' in lines
+    assert any(line.startswith(f'report_job_start_timestamp_seconds{{{job}}} ') for line in lines)
+    # Every sample stays on one line: the HELP/TYPE pairs and one sample per series
+    assert all(line.startswith(('# HELP ', '# TYPE ', 'report_')) for line in lines)
+
+
+def test_textfile_written_from_concurrent_stages(tmp_path):
+    textfile = tmp_path / 'report.prom'
+    metrics = RunMetrics('export.csv', interval=0.0, textfile=str(textfile), log_progress=False)
+    start = threading.Barrier(4)
+
+    def stage(name):
+        start.wait()
+        with metrics.stage(name, total_rows=200) as progress:
+            for _ in range(200):
+                progress.advance()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        # result() re-raises an error from any of the writers
+        for future in [pool.submit(stage, f"sheet:{number}") for number in range(4)]:
+            future.result()
+
+    lines = textfile.read_text().splitlines()
+    for number in range(4):
+        assert f'report_stage_completed{{job="export.csv",stage="sheet:{number}"}} 1.0' in lines
+    assert os.listdir(tmp_path) == ['report.prom']
+    assert textfile.stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,44 @@
+from io_stages import StageGraph
+from stage_profiler import StageProfiler
+
+
+def _stages(profiler):
+    return {stage['name']: stage for stage in profiler.stages}
+
+
+def test_concurrent_stages_get_no_tracemalloc_figures():
+    profiler = StageProfiler('test')
+    with profiler.stage('load'):
+        held = bytearray(4 * 1024 * 1024)
+    with profiler.stage('write'):
+        outputs = StageGraph(2, profiler)
+        outputs.add('sheet', bytearray, 2 * 1024 * 1024)
+        outputs.add('dashboard', bytearray, 1024 * 1024)
+        outputs.run()
+    with profiler.stage('save'):
+        pass
+
+    stages = _stages(profiler)
+    assert stages['load']['memory_attributable'] is True
+    assert stages['load']['tracemalloc_delta_mb'] >= 4
+    assert stages['save']['memory_attributable'] is True
+    for name in ('sheet', 'dashboard', 'write'):
+        assert stages[name]['memory_attributable'] is False
+        assert stages[name]['tracemalloc_peak_mb'] is None
+        assert stages[name]['tracemalloc_delta_mb'] is None
+    assert stages['sheet']['thread'].startswith('io')
+    del held
+
+
+def test_single_worker_graph_keeps_per_stage_memory():
+    profiler = StageProfiler('test')
+    with profiler.stage('write'):
+        outputs = StageGraph(1, profiler)
+        outputs.add('sheet', bytearray, 2 * 1024 * 1024)
+        outputs.run()
+
+    stages = _stages(profiler)
+    assert stages['sheet']['memory_attributable'] is True
+    assert stages['sheet']['tracemalloc_peak_mb'] >= 2
+    # The parent's peak includes its child's
+    assert stages['write']['tracemalloc_peak_mb'] >= stages['sheet']['tracemalloc_peak_mb']
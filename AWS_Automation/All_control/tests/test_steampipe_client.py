@@ -0,0 +1,119 @@
+import argparse
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+pgserver = pytest.importorskip('pgserver')
+
+from steampipe_client import (QueryCache, SteampipeClient, add_steampipe_arguments, load_control_queries,
+                              steampipe_client_from_args, stream_control_results)
+
+FINDINGS_QUERY = "select resource, status, reason, region from findings order by resource"
+
+
+def _create_database(admin_uri, dbname, accounts):
+    # Steampipe puts every connection in its own schema; each client database gets its own data
+    admin = psycopg2.connect(admin_uri)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"create database {dbname}")
+    admin.close()
+
+    uri = admin_uri.replace('/postgres?', f'/{dbname}?')
+    conn = psycopg2.connect(uri)
+    with conn, conn.cursor() as cur:
+        for schema, rows in accounts.items():
+            cur.execute(f"create schema {schema}")
+            cur.execute(f"create table {schema}.findings (resource text, status text, reason text, region text)")
+            cur.executemany(f"insert into {schema}.findings values (%s, %s, %s, %s)", rows)
+        cur.execute("create table public.findings as table aws_client_a.findings")
+    conn.close()
+    return uri
+
+
+def _rows(prefix, count, status='alarm'):
+    return [(f"arn:aws:s3:::{prefix}-{number:03d}", status, f"{prefix} bucket {number}", 'us-east-1')
+            for number in range(count)]
+
+
+@pytest.fixture(scope='module')
+def endpoints(tmp_path_factory):
+    server = pgserver.get_server(str(tmp_path_factory.mktemp('pgdata')), cleanup_mode='stop')
+    admin_uri = server.get_uri()
+    yield {
+        'client_a': _create_database(admin_uri, 'client_a', {'aws_client_a': _rows('a', 12),
+                                                             'aws_client_b': _rows('b', 3, 'ok')}),
+        'client_b': _create_database(admin_uri, 'client_b', {'aws_client_a': _rows('other', 5)}),
+    }
+    server.cleanup()
+
+
+def test_stream_yields_server_side_batches(endpoints):
+    with SteampipeClient(endpoints['client_a'], batch_size=5) as client:
+        batches = list(client.stream(FINDINGS_QUERY))
+
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert list(batches[0].columns) == ['resource', 'status', 'reason', 'region']
+    assert batches[0]['resource'].iloc[0] == 'arn:aws:s3:::a-000'
+
+
+def test_account_sets_search_path(endpoints):
+    with SteampipeClient(endpoints['client_a']) as client:
+        result = client.query(FINDINGS_QUERY, account='aws_client_b')
+
+    assert len(result) == 3
+    assert set(result['status']) == {'ok'}
+
+
+def test_cache_reuses_results_of_the_same_endpoint(endpoints, tmp_path):
+    cache = QueryCache(ttl=60, cache_dir=str(tmp_path))
+    with SteampipeClient(endpoints['client_a'], cache=cache) as client:
+        first = client.query(FINDINGS_QUERY)
+        second = client.query(FINDINGS_QUERY)
+
+    assert first.equals(second)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_does_not_cross_endpoints(endpoints, tmp_path):
+    # Two clients' containers, one shared on-disk cache and no --accounts
+    with SteampipeClient(endpoints['client_a'], cache=QueryCache(60, str(tmp_path))) as client:
+        client_a = client.query(FINDINGS_QUERY)
+    cache = QueryCache(60, str(tmp_path))
+    with SteampipeClient(endpoints['client_b'], cache=cache) as client:
+        client_b = client.query(FINDINGS_QUERY)
+
+    assert len(client_a) == 12
+    assert len(client_b) == 5
+    assert client_b['resource'].str.contains('other').all()
+    assert cache.hits == 0
+
+
+def test_cache_is_off_by_default(endpoints):
+    parser = argparse.ArgumentParser()
+    add_steampipe_arguments(parser)
+    args = parser.parse_args(['--steampipe-dsn', endpoints['client_a']])
+
+    with steampipe_client_from_args(args) as client:
+        assert client.cache is None
+        assert len(client.query(FINDINGS_QUERY)) == 12
+
+
+def test_stream_control_results_shapes_export_rows(endpoints, tmp_path):
+    queries = tmp_path / 'control_queries.json'
+    queries.write_text('[{"title": "S3", "control_title": "S3 versioning", "sql": "%s"}]' % FINDINGS_QUERY)
+
+    with SteampipeClient(endpoints['client_a'], batch_size=100) as client:
+        batches = list(stream_control_results(client, load_control_queries(str(queries)),
+                                              accounts=['aws_client_a', 'aws_client_b']))
+
+    assert [len(batch) for batch in batches] == [12, 3]
+    assert list(batches[0].columns[:4]) == ['title', 'control_title', 'control_description', 'resource']
+    assert set(batches[1]['control_title']) == {'S3 versioning'}
+
+
+def test_stream_control_results_rejects_incomplete_queries(endpoints, tmp_path):
+    controls = [{'title': 'S3', 'control_title': 'No status', 'sql': 'select resource from findings'}]
+    with SteampipeClient(endpoints['client_a']) as client:
+        with pytest.raises(ValueError, match='status, reason'):
+            list(stream_control_results(client, controls))
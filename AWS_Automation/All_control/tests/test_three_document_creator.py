@@ -0,0 +1,16 @@
+import sys
+
+import pytest
+
+import Three_Document_creator
+
+
+@pytest.mark.parametrize('value', ['0', '-3', 'ten'])
+def test_service_top_n_must_be_positive(value, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['Three_Document_creator.py', '--service-top-n', value])
+
+    with pytest.raises(SystemExit) as exit_info:
+        Three_Document_creator.main()
+
+    assert exit_info.value.code == 2
+    assert 'argument --service-top-n' in capsys.readouterr().err
@@ -0,0 +1,202 @@
+import openpyxl
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # optional; pip install python-calamine
+    CalamineWorkbook = None
+
+XLSX_ENGINES = ['auto', 'calamine', 'openpyxl']
+
+
+def resolve_engine(engine='auto'):
+    """
+    Pick the xlsx engine to use
+
+    Args:
+        engine (str, optional): 'calamine', 'openpyxl', or 'auto' for calamine
+            when python-calamine is installed and openpyxl otherwise
+
+    Returns:
+        str: 'calamine' or 'openpyxl'
+    """
+    if engine == 'auto':
+        return 'calamine' if CalamineWorkbook is not None else 'openpyxl'
+    if engine == 'calamine' and CalamineWorkbook is None:
+        raise ValueError("The calamine engine needs python-calamine (pip install python-calamine)")
+    if engine not in XLSX_ENGINES:
+        raise ValueError(f"Unknown xlsx engine '{engine}'; expected one of {', '.join(XLSX_ENGINES)}")
+    return engine
+
+
+def _header_names(header):
+    # Blank and repeated headers are named the way pd.read_excel names them
+    names = []
+    seen = {}
+    for idx, name in enumerate(header):
+        name = f'Unnamed: {idx}' if name in (None, '') else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _selected(names, usecols, path):
+    if usecols is None:
+        return list(range(len(names)))
+    missing = [column for column in usecols if column not in names]
+    if missing:
+        raise ValueError(f"Columns not found in {path}: {', '.join(map(str, missing))}")
+    wanted = set(usecols)
+    return [idx for idx, name in enumerate(names) if name in wanted]
+
+
+def _column(values, dtype=None):
+    # Empty cells become NaN; without a dtype the rest follows pd.read_excel: numeric
+    # text and whole-number floats become numbers, and date cells become datetime64
+    series = pd.Series(values, dtype=object)
+    series = series.mask(series.eq('') | series.isna())
+    if dtype is not None:
+        return _cast(series, dtype)
+    series = series.infer_objects()
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind == 'string':
+        try:
+            series = pd.to_numeric(series)
+        except (ValueError, TypeError):
+            pass
+    elif kind in ('date', 'datetime'):
+        series = pd.to_datetime(series)
+    if series.dtype.kind == 'f' and series.notna().all() and (series % 1 == 0).all():
+        series = series.astype('int64')
+    return series
+
+
+def _cast(series, dtype):
+    # An explicit dtype skips inference, so text such as '012345678901' keeps
+    # its leading zero; number cells in a text column read '12', not '12.0'
+    if dtype == 'str' and pd.api.types.infer_dtype(series, skipna=True) != 'string':
+        series = series.map(lambda value: str(int(value)) if isinstance(value, float) and value.is_integer()
+                            else str(value), na_action='ignore')
+    return series.astype(dtype)
+
+
+def _frame(header, names, selected, columns, dtype=None):
+    # Trailing columns with neither a header nor data are only formatting
+    dtype = dtype or {}
+    keep = list(zip(selected, columns))
+    while keep and header[keep[-1][0]] in (None, '') and all(value in (None, '') for value in keep[-1][1]):
+        keep.pop()
+    return pd.DataFrame({names[idx]: _column(values, dtype.get(names[idx])) for idx, values in keep})
+
+
+def _read_calamine(path, usecols, sheet_name, dtype):
+    workbook = CalamineWorkbook.from_path(path)
+    if isinstance(sheet_name, int):
+        sheet = workbook.get_sheet_by_index(sheet_name)
+    else:
+        sheet = workbook.get_sheet_by_name(sheet_name)
+    rows = sheet.to_python()
+    if not rows:
+        return pd.DataFrame()
+
+    names = _header_names(rows[0])
+    selected = _selected(names, usecols, path)
+    width = len(rows[0])
+    body = [row for row in rows[1:] if row.count('') != width]
+    columns = [[row[idx] for row in body] for idx in selected]
+    return _frame(rows[0], names, selected, columns, dtype)
+
+
+def _read_openpyxl(path, usecols, sheet_name, dtype):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+
+        names = _header_names(header)
+        selected = _selected(names, usecols, path)
+        buffers = [[] for _ in selected]
+        for row in rows:
+            if row.count(None) == len(row):
+                continue
+            # Short rows leave trailing cells empty
+            row = row + (None,) * (len(names) - len(row))
+            for buffer, idx in zip(buffers, selected):
+                buffer.append(row[idx])
+        return _frame(header, names, selected, buffers, dtype)
+    finally:
+        workbook.close()
+
+
+def read_xlsx(path, usecols=None, sheet_name=0, engine='auto', dtype=None):
+    """
+    Read one worksheet into a DataFrame
+
+    calamine parses the workbook natively and is several times faster than
+    pd.read_excel. Without it, openpyxl streams the rows in read-only mode
+    into per-column buffers, which skips pandas' row-by-row parser.
+
+    Args:
+        path (str): .xlsx file (calamine also reads .xls)
+        usecols (list, optional): Column names to keep, in file order
+        sheet_name (int or str, optional): Sheet index or name
+        engine (str, optional): 'auto', 'calamine' or 'openpyxl'
+        dtype (dict, optional): Column name -> dtype; these columns skip type inference
+
+    Returns:
+        pd.DataFrame: Sheet contents with the first row as header
+
+    Raises:
+        ValueError: When a usecols column is missing or the engine is unavailable
+    """
+    if resolve_engine(engine) == 'calamine':
+        return _read_calamine(path, usecols, sheet_name, dtype)
+    return _read_openpyxl(path, usecols, sheet_name, dtype)
+
+
+def read_xlsx_header(path, sheet_name=0, engine='auto'):
+    """
+    Column names of a worksheet without loading its rows
+
+    Args:
+        path (str): .xlsx file
+        sheet_name (int or str, optional): Sheet index or name
+        engine (str, optional): 'auto', 'calamine' or 'openpyxl'
+
+    Returns:
+        list: Header names as read_xlsx would name them
+    """
+    if resolve_engine(engine) == 'calamine':
+        workbook = CalamineWorkbook.from_path(path)
+        if isinstance(sheet_name, int):
+            sheet = workbook.get_sheet_by_index(sheet_name)
+        else:
+            sheet = workbook.get_sheet_by_name(sheet_name)
+        header = next(iter(sheet.iter_rows()), [])
+    else:
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+            header = next(sheet.iter_rows(values_only=True), ())
+        finally:
+            workbook.close()
+    return _header_names(header)
+
+
+def add_xlsx_reader_arguments(parser):
+    """
+    Add the option that picks the xlsx input engine
+
+    Args:
+        parser (argparse.ArgumentParser): Entry point parser
+    """
+    parser.add_argument('--xlsx-engine', choices=XLSX_ENGINES, default='auto',
+                        help="Engine for .xlsx input: 'calamine' (pip install python-calamine) or 'openpyxl' "
+                             "streaming; 'auto' uses calamine when installed")
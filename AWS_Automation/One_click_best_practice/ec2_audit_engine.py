@@ -0,0 +1,321 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import boto3
+from botocore.config import Config
+
+# Same settings as EC2_automation_compliance.sh
+MAX_RETRIES = 5
+DEFAULT_REGION = "us-east-1"
+LOG_FILE = "ec2_compliance.log"
+REPORT_FILE = "ec2_compliance_report.json"
+
+# describe-images accepts this many image IDs per filter
+IMAGE_BATCH_SIZE = 200
+
+# Instance types that only run paravirtual AMIs (ec2_control42)
+PARAVIRTUAL_TYPES = {"t1.micro", "m1.small", "m1.medium", "c1.medium", "cc2.8xlarge", "hi1.4xlarge", "hs1.8xlarge", "cr1.8xlarge"}
+
+# Remote administration ports that should not be open to the internet
+ADMIN_PORTS = [22, 3389]
+OPEN_CIDRS = {"0.0.0.0/0", "::/0"}
+
+MAX_INSTANCE_AGE_DAYS = 180
+
+logger = logging.getLogger('ec2_compliance')
+
+
+class RegionSnapshot:
+    def __init__(self, region, instances, volumes, security_groups, images):
+        """
+        Everything the audit rules need for one region, indexed by ID
+
+        Args:
+            region (str): AWS region
+            instances (list): Instances from describe-instances
+            volumes (list): Volumes from describe-volumes
+            security_groups (list): Groups from describe-security-groups
+            images (list): AMIs used by the instances, from describe-images
+        """
+        self.region = region
+        self.instances = instances
+        self.volumes = {volume['VolumeId']: volume for volume in volumes}
+        self.security_groups = {group['GroupId']: group for group in security_groups}
+        self.images = {image['ImageId']: image for image in images}
+
+
+def _paginate(client, operation, key, **kwargs):
+    items = []
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        items.extend(page.get(key, []))
+    return items
+
+
+def fetch_region_snapshot(client, region):
+    """
+    Page every describe call once for the region
+
+    Args:
+        client (botocore.client.EC2): EC2 client for the region
+        region (str): AWS region
+
+    Returns:
+        RegionSnapshot: Indexed instances, volumes, security groups and AMIs
+    """
+    reservations = _paginate(client, 'describe_instances', 'Reservations')
+    instances = [instance for reservation in reservations for instance in reservation.get('Instances', [])]
+    instances = [instance for instance in instances if instance.get('State', {}).get('Name') != 'terminated']
+
+    volumes = _paginate(client, 'describe_volumes', 'Volumes')
+    security_groups = _paginate(client, 'describe_security_groups', 'SecurityGroups')
+
+    # Only the AMIs the instances use; a filter (unlike ImageIds) skips deregistered AMIs instead of failing
+    image_ids = sorted({instance['ImageId'] for instance in instances if instance.get('ImageId')})
+    images = []
+    for start in range(0, len(image_ids), IMAGE_BATCH_SIZE):
+        images.extend(_paginate(client, 'describe_images', 'Images',
+                                Filters=[{'Name': 'image-id', 'Values': image_ids[start:start + IMAGE_BATCH_SIZE]}]))
+
+    logger.info(f"{region}: {len(instances)} instances, {len(volumes)} volumes, "
+                f"{len(security_groups)} security groups, {len(images)} AMIs")
+    return RegionSnapshot(region, instances, volumes, security_groups, images)
+
+
+def _attached_volumes(instance, snapshot):
+    volume_ids = [mapping['Ebs']['VolumeId'] for mapping in instance.get('BlockDeviceMappings', [])
+                  if mapping.get('Ebs', {}).get('VolumeId')]
+    return [snapshot.volumes[volume_id] for volume_id in volume_ids if volume_id in snapshot.volumes]
+
+
+def _instance_groups(instance, snapshot):
+    return [snapshot.security_groups.get(group['GroupId'], group) for group in instance.get('SecurityGroups', [])]
+
+
+def ami_encrypted(instance, snapshot):
+    # None when the AMI is no longer visible (deregistered or shared and revoked)
+    image = snapshot.images.get(instance.get('ImageId'))
+    if image is None:
+        return None
+    ebs = [mapping['Ebs'] for mapping in image.get('BlockDeviceMappings', []) if 'Ebs' in mapping]
+    return bool(ebs) and all(mapping.get('Encrypted', False) for mapping in ebs)
+
+
+def has_public_ip(instance, snapshot):
+    return bool(instance.get('PublicIpAddress'))
+
+
+def using_imdsv2(instance, snapshot):
+    return instance.get('MetadataOptions', {}).get('HttpTokens') == 'required'
+
+
+def has_iam_profile(instance, snapshot):
+    return bool(instance.get('IamInstanceProfile'))
+
+
+def ebs_volumes_encrypted(instance, snapshot):
+    volumes = _attached_volumes(instance, snapshot)
+    return all(volume.get('Encrypted', False) for volume in volumes) if volumes else None
+
+
+def delete_on_termination(instance, snapshot):
+    # The instance's own block device mappings carry the flag; the volume attachment is the fallback
+    flags = []
+    for mapping in instance.get('BlockDeviceMappings', []):
+        ebs = mapping.get('Ebs')
+        if not ebs:
+            continue
+        flag = ebs.get('DeleteOnTermination')
+        if flag is None and ebs.get('VolumeId') in snapshot.volumes:
+            flag = next((attachment.get('DeleteOnTermination') for attachment in
+                         snapshot.volumes[ebs['VolumeId']].get('Attachments', [])
+                         if attachment.get('InstanceId') == instance['InstanceId']), None)
+        flags.append(bool(flag))
+    return all(flags) if flags else None
+
+
+def detailed_monitoring(instance, snapshot):
+    return instance.get('Monitoring', {}).get('State') == 'enabled'
+
+
+def ebs_optimized(instance, snapshot):
+    return bool(instance.get('EbsOptimized'))
+
+
+def in_vpc(instance, snapshot):
+    return bool(instance.get('VpcId'))
+
+
+def uses_key_pair(instance, snapshot):
+    return bool(instance.get('KeyName'))
+
+
+def launch_wizard_security_group(instance, snapshot):
+    return any('launch-wizard' in group.get('GroupName', '') or 'launch wizard' in group.get('GroupName', '')
+               for group in _instance_groups(instance, snapshot))
+
+
+def admin_ports_open_to_internet(instance, snapshot):
+    for group in _instance_groups(instance, snapshot):
+        for permission in group.get('IpPermissions', []):
+            ranges = {ip_range.get('CidrIp') for ip_range in permission.get('IpRanges', [])}
+            ranges |= {ip_range.get('CidrIpv6') for ip_range in permission.get('Ipv6Ranges', [])}
+            if not ranges & OPEN_CIDRS:
+                continue
+            if permission.get('IpProtocol') == '-1':
+                return True
+            from_port, to_port = permission.get('FromPort', 0), permission.get('ToPort', 65535)
+            if any(from_port <= port <= to_port for port in ADMIN_PORTS):
+                return True
+    return False
+
+
+def older_than_180_days(instance, snapshot):
+    launch_time = instance.get('LaunchTime')
+    if launch_time is None:
+        return None
+    if isinstance(launch_time, str):
+        launch_time = datetime.fromisoformat(launch_time.replace('Z', '+00:00'))
+    return (datetime.now(timezone.utc) - launch_time).days > MAX_INSTANCE_AGE_DAYS
+
+
+def multiple_enis(instance, snapshot):
+    return len(instance.get('NetworkInterfaces', [])) > 1
+
+
+def paravirtual_type(instance, snapshot):
+    return instance.get('InstanceType') in PARAVIRTUAL_TYPES or instance.get('VirtualizationType') == 'paravirtual'
+
+
+# Report fields in output order; the first four are the ones audit_instance writes
+RULES = [
+    ('ami_encrypted', ami_encrypted),
+    ('has_public_ip', has_public_ip),
+    ('using_imdsv2', using_imdsv2),
+    ('has_iam_profile', has_iam_profile),
+    ('ebs_volumes_encrypted', ebs_volumes_encrypted),
+    ('delete_on_termination', delete_on_termination),
+    ('detailed_monitoring', detailed_monitoring),
+    ('ebs_optimized', ebs_optimized),
+    ('in_vpc', in_vpc),
+    ('uses_key_pair', uses_key_pair),
+    ('launch_wizard_security_group', launch_wizard_security_group),
+    ('admin_ports_open_to_internet', admin_ports_open_to_internet),
+    ('older_than_180_days', older_than_180_days),
+    ('multiple_enis', multiple_enis),
+    ('paravirtual_type', paravirtual_type)
+]
+
+
+def _report_value(value):
+    # The shell report stores "true"/"false" strings and "None" for unknown values
+    if value is None:
+        return "None"
+    return "true" if value else "false"
+
+
+def audit_snapshot(snapshot, rules=RULES):
+    """
+    Evaluate every rule for every instance of a region
+
+    Args:
+        snapshot (RegionSnapshot): Fetched region data
+        rules (list, optional): (field, function) pairs
+
+    Returns:
+        list: One report entry per instance
+    """
+    entries = []
+    for instance in snapshot.instances:
+        entry = {"instance_id": instance['InstanceId']}
+        for field, rule in rules:
+            entry[field] = _report_value(rule(instance, snapshot))
+        entry["region"] = snapshot.region
+        entries.append(entry)
+    return entries
+
+
+def audit_regions(regions, session=None, endpoint_url=None, max_workers=4):
+    """
+    Fetch and audit several regions in parallel
+
+    Args:
+        regions (list): AWS regions
+        session (boto3.Session, optional): Session to create the clients from
+        endpoint_url (str, optional): EC2 endpoint override, e.g. a local stand-in
+        max_workers (int, optional): Regions fetched at the same time
+
+    Returns:
+        list: Report entries for all regions, in region order
+    """
+    session = session or boto3.Session()
+    config = Config(retries={'max_attempts': MAX_RETRIES, 'mode': 'adaptive'})
+    # Clients are created up front: sessions are not thread-safe, clients are
+    clients = {region: session.client('ec2', region_name=region, endpoint_url=endpoint_url, config=config)
+               for region in regions}
+
+    def audit_region(region):
+        return audit_snapshot(fetch_region_snapshot(clients[region], region))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(audit_region, regions))
+    return [entry for entries in results for entry in entries]
+
+
+def write_report(entries, report_file=REPORT_FILE):
+    """Write the report as a JSON array with one instance per line, like audit_all_instances"""
+    temp_file = f"{report_file}.tmp"
+    with open(temp_file, 'w') as fh:
+        fh.write("[\n")
+        fh.write(",\n".join(json.dumps(entry) for entry in entries))
+        fh.write("\n]\n")
+    os.replace(temp_file, report_file)
+
+
+def setup_logging(log_file=LOG_FILE):
+    formatter = logging.Formatter('[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    for handler in [logging.StreamHandler(), logging.FileHandler(log_file, mode='w')]:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit all EC2 instances with one paged describe call per resource type and region")
+    parser.add_argument('--regions', default=None,
+                        help=f"Comma-separated regions (default: $AWS_REGION or {DEFAULT_REGION})")
+    parser.add_argument('--all-regions', action='store_true', help="Audit every region enabled for the account")
+    parser.add_argument('--report-file', default=REPORT_FILE, help=f"Output report (default: {REPORT_FILE})")
+    parser.add_argument('--log-file', default=LOG_FILE, help=f"Log file (default: {LOG_FILE})")
+    parser.add_argument('--max-workers', type=int, default=4, help="Regions audited at the same time (default: 4)")
+    parser.add_argument('--endpoint-url', default=None,
+                        help="EC2 endpoint override, e.g. http://localhost:5000 for a local moto server")
+    args = parser.parse_args()
+
+    setup_logging(args.log_file)
+    logger.info("Starting comprehensive audit of all EC2 instances")
+
+    session = boto3.Session()
+    if args.all_regions:
+        client = session.client('ec2', region_name=os.environ.get('AWS_REGION', DEFAULT_REGION),
+                                endpoint_url=args.endpoint_url)
+        regions = sorted(region['RegionName'] for region in client.describe_regions()['Regions'])
+    elif args.regions:
+        regions = [region.strip() for region in args.regions.split(',') if region.strip()]
+    else:
+        regions = [os.environ.get('AWS_REGION', DEFAULT_REGION)]
+    logger.info(f"Using AWS Regions: {', '.join(regions)}")
+
+    started = time.monotonic()
+    entries = audit_regions(regions, session=session, endpoint_url=args.endpoint_url, max_workers=args.max_workers)
+    write_report(entries, args.report_file)
+    logger.info(f"Audit complete: {len(entries)} instances in {time.monotonic() - started:.1f}s. "
+                f"Results saved to {args.report_file}")
+
+
+if __name__ == "__main__":
+    main()
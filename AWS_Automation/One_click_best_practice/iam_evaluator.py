@@ -0,0 +1,610 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import shlex
+import time
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+MAX_RETRIES = 5
+LOG_FILE = "iam_compliance.log"
+PLAN_FILE = "iam_remediation_plan.json"
+
+# Thresholds used by IAM_automation_compliance.sh; rotate_user_access_keys says 90 days
+SETTINGS = {
+    'access_key_max_age_days': 90,
+    'console_max_idle_days': 45,
+    'role_max_idle_days': 60
+}
+
+# Values set by set_iam_password_policy
+PASSWORD_POLICY = {
+    'MinimumPasswordLength': 14,
+    'RequireLowercaseCharacters': True,
+    'RequireUppercaseCharacters': True,
+    'RequireNumbers': True,
+    'RequireSymbols': True,
+    'PasswordReusePrevention': 5,
+    'MaxPasswordAge': 90
+}
+
+ADMINISTRATOR_ACCESS_ARN = "arn:aws:iam::aws:policy/AdministratorAccess"
+CLOUDSHELL_FULL_ACCESS = "AWSCloudShellFullAccess"
+SECURITY_AUDIT_ARN = "arn:aws:iam::aws:policy/SecurityAudit"
+FULL_SERVICE_ACTIONS = {"cloudtrail:*", "kms:*"}
+
+# Seconds to wait for generate-credential-report to finish
+CREDENTIAL_REPORT_TIMEOUT = 60
+
+logger = logging.getLogger('iam_compliance')
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _document(document):
+    # boto3 decodes policy documents; other sources hand back the URL-encoded JSON string
+    if isinstance(document, str):
+        return json.loads(unquote(document))
+    return document or {}
+
+
+def _parse_time(value):
+    # Credential report fields are ISO timestamps or "N/A", "no_information", "not_supported"
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value or not value[0].isdigit():
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class IamSnapshot:
+    def __init__(self, authorization_details, credential_report, password_policy=None,
+                 server_certificates=None, now=None):
+        """
+        The account's IAM configuration, indexed by name and ARN
+
+        Args:
+            authorization_details (dict): Merged pages of get-account-authorization-details
+            credential_report (list): Rows of the credential report as dictionaries
+            password_policy (dict, optional): Account password policy; None when none is set
+            server_certificates (list, optional): Server certificate metadata
+            now (datetime, optional): Evaluation time (default: current UTC time)
+        """
+        self.users = {user['UserName']: user for user in authorization_details.get('UserDetailList', [])}
+        self.roles = {role['RoleName']: role for role in authorization_details.get('RoleDetailList', [])}
+        self.groups = {group['GroupName']: group for group in authorization_details.get('GroupDetailList', [])}
+        self.policies = {policy['Arn']: policy for policy in authorization_details.get('Policies', [])}
+        self.credentials = {row['user']: row for row in credential_report}
+        self.password_policy = password_policy
+        self.server_certificates = server_certificates or []
+        self.now = now or datetime.now(timezone.utc)
+
+        # Reverse indexes that replace list-entities-for-policy and get-group
+        self.group_members = {name: [] for name in self.groups}
+        self.policy_entities = {arn: {'users': [], 'roles': [], 'groups': []} for arn in self.policies}
+        for user_name, user in self.users.items():
+            for group_name in user.get('GroupList', []):
+                self.group_members.setdefault(group_name, []).append(user_name)
+            self._index_attachments('users', user_name, user)
+        for role_name, role in self.roles.items():
+            self._index_attachments('roles', role_name, role)
+        for group_name, group in self.groups.items():
+            self._index_attachments('groups', group_name, group)
+
+    def _index_attachments(self, kind, name, entity):
+        for attached in entity.get('AttachedManagedPolicies', []):
+            entities = self.policy_entities.setdefault(attached['PolicyArn'], {'users': [], 'roles': [], 'groups': []})
+            entities[kind].append(name)
+
+    def policy_document(self, policy):
+        """Default version document of a managed policy"""
+        for version in policy.get('PolicyVersionList', []):
+            if version.get('IsDefaultVersion') or version.get('VersionId') == policy.get('DefaultVersionId'):
+                return _document(version.get('Document'))
+        return {}
+
+    def local_policies(self):
+        return [policy for arn, policy in self.policies.items() if not arn.startswith('arn:aws:iam::aws:')]
+
+    def days_since(self, value):
+        moment = _parse_time(value)
+        return None if moment is None else (self.now - moment).days
+
+
+def _paginate_details(client):
+    details = {'UserDetailList': [], 'GroupDetailList': [], 'RoleDetailList': [], 'Policies': []}
+    # AWS managed policies are matched by ARN only, so their documents are not downloaded
+    paginator = client.get_paginator('get_account_authorization_details')
+    for page in paginator.paginate(Filter=['User', 'Role', 'Group', 'LocalManagedPolicy']):
+        for key in details:
+            details[key].extend(page.get(key, []))
+    return details
+
+
+def fetch_credential_report(client, timeout=CREDENTIAL_REPORT_TIMEOUT):
+    """
+    Generate (or reuse) the credential report and parse it
+
+    AWS returns a cached report when one was generated in the last four
+    hours, so this is usually a single round trip.
+
+    Returns:
+        list: One dictionary per user, plus the <root_account> row
+    """
+    deadline = time.monotonic() + timeout
+    delay = 1.0
+    while client.generate_credential_report().get('State') != 'COMPLETE':
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Credential report not ready after {timeout}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 8.0)
+    content = client.get_credential_report()['Content']
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return list(csv.DictReader(io.StringIO(content)))
+
+
+def fetch_snapshot(client):
+    """
+    Fetch everything the checks need with a handful of calls
+
+    Returns:
+        IamSnapshot: Indexed users, roles, groups, policies and credential report
+    """
+    details = _paginate_details(client)
+    credential_report = fetch_credential_report(client)
+    try:
+        password_policy = client.get_account_password_policy()['PasswordPolicy']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchEntity':
+            raise
+        password_policy = None
+    certificates = []
+    for page in client.get_paginator('list_server_certificates').paginate():
+        certificates.extend(page.get('ServerCertificateMetadataList', []))
+
+    snapshot = IamSnapshot(details, credential_report, password_policy, certificates)
+    logger.info(f"Snapshot: {len(snapshot.users)} users, {len(snapshot.roles)} roles, {len(snapshot.groups)} groups, "
+                f"{len(snapshot.policies)} managed policies, {len(credential_report)} credential report rows")
+    return snapshot
+
+
+def is_admin_statement(statement):
+    return (statement.get('Effect') == 'Allow'
+            and '*' in _as_list(statement.get('Action'))
+            and '*' in _as_list(statement.get('Resource')))
+
+
+def has_admin_statement(document):
+    return any(is_admin_statement(statement) for statement in _as_list(document.get('Statement')))
+
+
+def _finding(check, entity_type, entity, reason, commands):
+    return {
+        'check': check,
+        'entity_type': entity_type,
+        'entity': entity,
+        'reason': reason,
+        'commands': commands
+    }
+
+
+def _detach_everywhere(snapshot, policy_arn):
+    entities = snapshot.policy_entities.get(policy_arn, {})
+    commands = [['aws', 'iam', 'detach-role-policy', '--role-name', role, '--policy-arn', policy_arn]
+                for role in entities.get('roles', [])]
+    commands += [['aws', 'iam', 'detach-user-policy', '--user-name', user, '--policy-arn', policy_arn]
+                 for user in entities.get('users', [])]
+    commands += [['aws', 'iam', 'detach-group-policy', '--group-name', group, '--policy-arn', policy_arn]
+                 for group in entities.get('groups', [])]
+    return commands
+
+
+def _delete_policy(snapshot, policy):
+    # delete-policy fails while non-default versions exist or the policy is attached
+    commands = _detach_everywhere(snapshot, policy['Arn'])
+    commands += [['aws', 'iam', 'delete-policy-version', '--policy-arn', policy['Arn'], '--version-id', version['VersionId']]
+                 for version in policy.get('PolicyVersionList', []) if not version.get('IsDefaultVersion')]
+    commands.append(['aws', 'iam', 'delete-policy', '--policy-arn', policy['Arn']])
+    return commands
+
+
+def _attached_count(snapshot, policy):
+    return sum(len(names) for names in snapshot.policy_entities.get(policy['Arn'], {}).values())
+
+
+def check_password_policy(snapshot, settings):
+    policy = snapshot.password_policy or {}
+    differences = []
+    for key, required in PASSWORD_POLICY.items():
+        value = policy.get(key)
+        if isinstance(required, bool):
+            weaker = value is not True
+        elif key == 'MaxPasswordAge':
+            weaker = not value or value > required
+        else:
+            weaker = (value or 0) < required
+        if weaker:
+            differences.append(key)
+    if not differences:
+        return []
+    command = ['aws', 'iam', 'update-account-password-policy',
+               '--minimum-password-length', str(PASSWORD_POLICY['MinimumPasswordLength']),
+               '--require-lowercase-characters', '--require-uppercase-characters', '--require-numbers',
+               '--require-symbols', '--password-reuse-prevention', str(PASSWORD_POLICY['PasswordReusePrevention']),
+               '--max-password-age', str(PASSWORD_POLICY['MaxPasswordAge'])]
+    reason = "No password policy" if snapshot.password_policy is None else f"Weaker than required: {', '.join(differences)}"
+    return [_finding('set_iam_password_policy', 'account', 'password-policy', reason, [command])]
+
+
+def check_unattached_admin_policies(snapshot, settings):
+    return [_finding('check_unattached_admin_policies', 'policy', policy['Arn'],
+                     "Unattached policy allows * on *", _delete_policy(snapshot, policy))
+            for policy in snapshot.local_policies()
+            if not _attached_count(snapshot, policy) and has_admin_statement(snapshot.policy_document(policy))]
+
+
+def check_empty_groups(snapshot, settings):
+    findings = []
+    for group_name, group in snapshot.groups.items():
+        if snapshot.group_members.get(group_name):
+            continue
+        # The shell function asks whether to add a user instead; the plan proposes removal
+        commands = [['aws', 'iam', 'detach-group-policy', '--group-name', group_name, '--policy-arn', attached['PolicyArn']]
+                    for attached in group.get('AttachedManagedPolicies', [])]
+        commands += [['aws', 'iam', 'delete-group-policy', '--group-name', group_name, '--policy-name', inline['PolicyName']]
+                     for inline in group.get('GroupPolicyList', [])]
+        commands.append(['aws', 'iam', 'delete-group', '--group-name', group_name])
+        findings.append(_finding('ensure_iam_groups_have_users_or_remove', 'group', group_name, "Group has no users", commands))
+    return findings
+
+
+def check_inline_admin_policies(snapshot, settings):
+    return [_finding('check_inline_policies_for_admin_privileges', 'role', role_name,
+                     f"Inline policy {inline['PolicyName']} allows * on *",
+                     [['aws', 'iam', 'delete-role-policy', '--role-name', role_name, '--policy-name', inline['PolicyName']]])
+            for role_name, role in snapshot.roles.items()
+            for inline in role.get('RolePolicyList', [])
+            if has_admin_statement(_document(inline.get('PolicyDocument')))]
+
+
+def check_roles_without_managed_policies(snapshot, settings):
+    # Attaching a policy needs a human decision, so these findings carry no commands
+    return [_finding('check_managed_policies_attached', 'role', role_name, "No managed policy attached", [])
+            for role_name, role in snapshot.roles.items() if not role.get('AttachedManagedPolicies')]
+
+
+def check_full_access_policies(snapshot, settings):
+    # Unattached ones are reported by check_unattached_admin_policies
+    return [_finding('detach_and_delete_full_access_policies', 'policy', policy['Arn'],
+                     "Attached policy allows * on *", _delete_policy(snapshot, policy))
+            for policy in snapshot.local_policies()
+            if _attached_count(snapshot, policy) and has_admin_statement(snapshot.policy_document(policy))]
+
+
+def check_cloudtrail_kms_full_access(snapshot, settings):
+    findings = []
+    for policy in snapshot.local_policies():
+        actions = {action.lower() for statement in _as_list(snapshot.policy_document(policy).get('Statement'))
+                   if statement.get('Effect') == 'Allow' for action in _as_list(statement.get('Action'))}
+        granted = sorted(actions & FULL_SERVICE_ACTIONS)
+        if granted:
+            findings.append(_finding('delete_policies_with_full_access_cloudtrail_kms', 'policy', policy['Arn'],
+                                     f"Allows {', '.join(granted)}", _delete_policy(snapshot, policy)))
+    return findings
+
+
+def check_admin_access_on_roles(snapshot, settings):
+    return [_finding('detach_admin_access_policy', 'role', role_name, "AdministratorAccess attached",
+                     [['aws', 'iam', 'detach-role-policy', '--role-name', role_name, '--policy-arn', ADMINISTRATOR_ACCESS_ARN]])
+            for role_name in snapshot.policy_entities.get(ADMINISTRATOR_ACCESS_ARN, {}).get('roles', [])]
+
+
+def check_unused_roles(snapshot, settings):
+    findings = []
+    max_idle = settings['role_max_idle_days']
+    for role_name, role in snapshot.roles.items():
+        # Service-linked roles can only be deleted by their service
+        if role.get('Path', '/').startswith('/aws-service-role/'):
+            continue
+        last_used = role.get('RoleLastUsed', {}).get('LastUsedDate')
+        idle_days = snapshot.days_since(last_used)
+        if idle_days is None:
+            # Never used: only flag roles that have existed for the whole window
+            if (snapshot.days_since(role.get('CreateDate')) or 0) < max_idle:
+                continue
+            reason = f"Never used, created {role.get('CreateDate')}"
+        elif idle_days >= max_idle:
+            reason = f"Last used {idle_days} days ago"
+        else:
+            continue
+        commands = [['aws', 'iam', 'detach-role-policy', '--role-name', role_name, '--policy-arn', attached['PolicyArn']]
+                    for attached in role.get('AttachedManagedPolicies', [])]
+        commands += [['aws', 'iam', 'delete-role-policy', '--role-name', role_name, '--policy-name', inline['PolicyName']]
+                     for inline in role.get('RolePolicyList', [])]
+        commands += [['aws', 'iam', 'remove-role-from-instance-profile', '--instance-profile-name',
+                      profile['InstanceProfileName'], '--role-name', role_name]
+                     for profile in role.get('InstanceProfileList', [])]
+        commands.append(['aws', 'iam', 'delete-role', '--role-name', role_name])
+        findings.append(_finding('delete_unused_roles', 'role', role_name, reason, commands))
+    return findings
+
+
+def check_unused_custom_policies(snapshot, settings):
+    # Admin policies are already covered by check_unattached_admin_policies
+    return [_finding('delete_unattached_iam_policies', 'policy', policy['Arn'],
+                     "Not attached to any user, group or role", _delete_policy(snapshot, policy))
+            for policy in snapshot.local_policies()
+            if not _attached_count(snapshot, policy) and not has_admin_statement(snapshot.policy_document(policy))]
+
+
+def check_root_access_keys(snapshot, settings):
+    root = snapshot.credentials.get('<root_account>', {})
+    active = [slot for slot in ('1', '2') if root.get(f'access_key_{slot}_active') == 'true']
+    if not active:
+        return []
+    # IAM cannot delete root keys; they are removed from the root user's Security credentials page
+    return [_finding('delete_root_access_keys', 'root', '<root_account>',
+                     f"Root user has {len(active)} active access key(s)", [])]
+
+
+def check_expired_certificates(snapshot, settings):
+    return [_finding('remove_expired_certificates', 'server-certificate', certificate['ServerCertificateName'],
+                     f"Expired {certificate['Expiration']}",
+                     [['aws', 'iam', 'delete-server-certificate', '--server-certificate-name',
+                       certificate['ServerCertificateName']]])
+            for certificate in snapshot.server_certificates
+            if _parse_time(certificate.get('Expiration')) and _parse_time(certificate['Expiration']) <= snapshot.now]
+
+
+def check_security_audit_role(snapshot, settings):
+    if snapshot.policy_entities.get(SECURITY_AUDIT_ARN, {}).get('roles'):
+        return []
+    trust = json.dumps({"Version": "2012-10-17", "Statement": {"Effect": "Allow", "Principal": {"Service": "ec2.amazonaws.com"},
+                                                                "Action": "sts:AssumeRole"}})
+    return [_finding('create_security_audit_role', 'role', 'SecurityAuditRole', "No role has SecurityAudit attached",
+                     [['aws', 'iam', 'create-role', '--role-name', 'SecurityAuditRole', '--assume-role-policy-document', trust],
+                      ['aws', 'iam', 'attach-role-policy', '--role-name', 'SecurityAuditRole', '--policy-arn', SECURITY_AUDIT_ARN]])]
+
+
+def _active_keys(row):
+    return [slot for slot in ('1', '2') if row.get(f'access_key_{slot}_active') == 'true']
+
+
+def check_stale_access_keys(snapshot, settings):
+    findings = []
+    max_age = settings['access_key_max_age_days']
+    for user_name, row in snapshot.credentials.items():
+        if user_name not in snapshot.users:
+            continue
+        for slot in _active_keys(row):
+            age = snapshot.days_since(row.get(f'access_key_{slot}_last_rotated'))
+            if age is not None and age >= max_age:
+                # Key IDs are not in the credential report; resolve_access_key_ids fills them in
+                findings.append(_finding('rotate_user_access_keys', 'access-key', f"{user_name}/key{slot}",
+                                         f"Last rotated {age} days ago",
+                                         [['aws', 'iam', 'create-access-key', '--user-name', user_name],
+                                          ['aws', 'iam', 'update-access-key', '--user-name', user_name,
+                                           '--access-key-id', f'<key{slot}>', '--status', 'Inactive']]))
+    return findings
+
+
+def check_unused_console_users(snapshot, settings):
+    findings = []
+    max_idle = settings['console_max_idle_days']
+    for user_name, row in snapshot.credentials.items():
+        if user_name not in snapshot.users or row.get('password_enabled') != 'true':
+            continue
+        idle_days = snapshot.days_since(row.get('password_last_used'))
+        if idle_days is None:
+            idle_days = snapshot.days_since(row.get('password_last_changed') or row.get('user_creation_time'))
+            reason = f"Console password never used ({idle_days} days old)"
+        else:
+            reason = f"Console last used {idle_days} days ago"
+        if idle_days is not None and idle_days >= max_idle:
+            findings.append(_finding('disable_unused_console_users', 'user', user_name, reason,
+                                     [['aws', 'iam', 'update-login-profile', '--user-name', user_name,
+                                       '--password-reset-required']]))
+    return findings
+
+
+def check_cloudshell_access(snapshot, settings):
+    return [_finding('restrict_cloudshell_access', 'user', user_name, f"{CLOUDSHELL_FULL_ACCESS} attached",
+                     [['aws', 'iam', 'detach-user-policy', '--user-name', user_name, '--policy-arn', attached['PolicyArn']]])
+            for user_name, user in snapshot.users.items()
+            for attached in user.get('AttachedManagedPolicies', [])
+            if attached['PolicyArn'].endswith(f"/{CLOUDSHELL_FULL_ACCESS}")]
+
+
+def check_multiple_active_keys(snapshot, settings):
+    # Like the shell function, the first active key is kept and the second disabled
+    return [_finding('enable_single_active_access_key', 'access-key', f"{user_name}/key2", "Two active access keys",
+                     [['aws', 'iam', 'update-access-key', '--user-name', user_name,
+                       '--access-key-id', '<key2>', '--status', 'Inactive']])
+            for user_name, row in snapshot.credentials.items()
+            if user_name in snapshot.users and len(_active_keys(row)) > 1]
+
+
+def check_inline_policies(snapshot, settings):
+    findings = []
+    for kind, entities, list_key in [('user', snapshot.users, 'UserPolicyList'),
+                                     ('role', snapshot.roles, 'RolePolicyList'),
+                                     ('group', snapshot.groups, 'GroupPolicyList')]:
+        for name, entity in entities.items():
+            for inline in entity.get(list_key, []):
+                findings.append(_finding('delete_inline_policies', kind, name, f"Inline policy {inline['PolicyName']}",
+                                         [['aws', 'iam', f'delete-{kind}-policy', f'--{kind}-name', name,
+                                           '--policy-name', inline['PolicyName']]]))
+    return findings
+
+
+# Checks in the order of the "Execute functions" list in IAM_automation_compliance.sh.
+# The Access Analyzer functions are regional and assign_access_keys_passwords creates
+# credentials rather than checking them, so they have no equivalent here.
+CHECKS = [
+    ('set_iam_password_policy', check_password_policy),
+    ('check_managed_policies_attached', check_roles_without_managed_policies),
+    ('check_unattached_admin_policies', check_unattached_admin_policies),
+    ('ensure_iam_groups_have_users_or_remove', check_empty_groups),
+    ('check_inline_policies_for_admin_privileges', check_inline_admin_policies),
+    ('detach_and_delete_full_access_policies', check_full_access_policies),
+    ('delete_policies_with_full_access_cloudtrail_kms', check_cloudtrail_kms_full_access),
+    ('delete_unattached_iam_policies', check_unused_custom_policies),
+    ('detach_admin_access_policy', check_admin_access_on_roles),
+    ('delete_unused_roles', check_unused_roles),
+    ('delete_root_access_keys', check_root_access_keys),
+    ('remove_expired_certificates', check_expired_certificates),
+    ('create_security_audit_role', check_security_audit_role),
+    ('rotate_user_access_keys', check_stale_access_keys),
+    ('disable_unused_console_users', check_unused_console_users),
+    ('restrict_cloudshell_access', check_cloudshell_access),
+    ('enable_single_active_access_key', check_multiple_active_keys),
+    ('delete_inline_policies', check_inline_policies)
+]
+
+
+def evaluate(snapshot, checks=CHECKS, settings=None):
+    """
+    Run every check against the snapshot
+
+    Args:
+        snapshot (IamSnapshot): Fetched account data
+        checks (list, optional): (name, function) pairs
+        settings (dict, optional): Thresholds overriding SETTINGS
+
+    Returns:
+        list: Findings, each with check, entity_type, entity, reason and commands
+    """
+    settings = {**SETTINGS, **(settings or {})}
+    findings = []
+    for name, check in checks:
+        found = check(snapshot, settings)
+        logger.info(f"{name}: {len(found)} finding(s)")
+        findings.extend(found)
+    return findings
+
+
+def resolve_access_key_ids(client, findings):
+    """
+    Replace the <key1>/<key2> placeholders with real access key IDs
+
+    Only users with an access key finding are looked up, one list-access-keys
+    call each. Keys are matched to the credential report slots by creation
+    order, which is how the report numbers them.
+    """
+    users = sorted({finding['entity'].split('/')[0] for finding in findings if finding['entity_type'] == 'access-key'})
+    for user_name in users:
+        keys = sorted(client.list_access_keys(UserName=user_name)['AccessKeyMetadata'], key=lambda key: key['CreateDate'])
+        placeholders = {f'<key{slot}>': key['AccessKeyId'] for slot, key in enumerate(keys, 1)}
+        for finding in findings:
+            if finding['entity_type'] == 'access-key' and finding['entity'].startswith(f"{user_name}/"):
+                finding['commands'] = [[placeholders.get(arg, arg) for arg in command] for command in finding['commands']]
+    return findings
+
+
+def build_plan(findings, account_id=None):
+    """
+    Collect findings into a plan with one ordered, de-duplicated command list
+
+    Commands are rendered as shell-quoted strings here.
+    The same command can come from several checks (for example an unused
+    role that also has an admin inline policy); it is listed once, at its
+    first position.
+    """
+    by_check = {}
+    for finding in findings:
+        finding['commands'] = [shlex.join(command) for command in finding['commands']]
+        by_check[finding['check']] = by_check.get(finding['check'], 0) + 1
+    commands = list(dict.fromkeys(command for finding in findings for command in finding['commands']))
+    return {
+        'account_id': account_id,
+        'generated_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'findings_by_check': by_check,
+        'findings': findings,
+        'commands': commands
+    }
+
+
+def write_plan(plan, plan_file=PLAN_FILE):
+    temp_file = f"{plan_file}.tmp"
+    with open(temp_file, 'w') as fh:
+        json.dump(plan, fh, indent=2)
+        fh.write("\n")
+    os.replace(temp_file, plan_file)
+
+
+def setup_logging(log_file=LOG_FILE):
+    formatter = logging.Formatter('[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    for handler in [logging.StreamHandler(), logging.FileHandler(log_file, mode='w')]:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the IAM checks of IAM_automation_compliance.sh against one "
+                                                 "account snapshot and write a remediation plan; nothing is changed")
+    parser.add_argument('--checks', default=None,
+                        help="Comma-separated shell function names to evaluate (default: all)")
+    parser.add_argument('--plan-file', default=PLAN_FILE, help=f"Output plan (default: {PLAN_FILE})")
+    parser.add_argument('--log-file', default=LOG_FILE, help=f"Log file (default: {LOG_FILE})")
+    parser.add_argument('--access-key-max-age', type=int, default=SETTINGS['access_key_max_age_days'],
+                        help=f"Days before an access key is due for rotation (default: {SETTINGS['access_key_max_age_days']})")
+    parser.add_argument('--console-max-idle', type=int, default=SETTINGS['console_max_idle_days'],
+                        help=f"Days of console inactivity before a user is flagged (default: {SETTINGS['console_max_idle_days']})")
+    parser.add_argument('--role-max-idle', type=int, default=SETTINGS['role_max_idle_days'],
+                        help=f"Days of inactivity before a role is flagged (default: {SETTINGS['role_max_idle_days']})")
+    parser.add_argument('--no-key-ids', action='store_true',
+                        help="Keep <key1>/<key2> placeholders instead of looking up the flagged users' key IDs")
+    parser.add_argument('--endpoint-url', default=None,
+                        help="IAM endpoint override, e.g. http://localhost:5000 for a local moto server")
+    args = parser.parse_args()
+
+    checks = CHECKS
+    if args.checks:
+        wanted = [name.strip() for name in args.checks.split(',') if name.strip()]
+        unknown = sorted(set(wanted) - {name for name, _ in CHECKS})
+        if unknown:
+            parser.error(f"Unknown checks: {', '.join(unknown)}")
+        checks = [(name, check) for name, check in CHECKS if name in wanted]
+
+    setup_logging(args.log_file)
+    logger.info("Fetching IAM account snapshot")
+    config = Config(retries={'max_attempts': MAX_RETRIES, 'mode': 'adaptive'})
+    session = boto3.Session()
+    client = session.client('iam', endpoint_url=args.endpoint_url, config=config)
+
+    started = time.monotonic()
+    snapshot = fetch_snapshot(client)
+    findings = evaluate(snapshot, checks, {
+        'access_key_max_age_days': args.access_key_max_age,
+        'console_max_idle_days': args.console_max_idle,
+        'role_max_idle_days': args.role_max_idle
+    })
+    if not args.no_key_ids:
+        resolve_access_key_ids(client, findings)
+
+    account_id = None
+    try:
+        account_id = session.client('sts', endpoint_url=args.endpoint_url).get_caller_identity()['Account']
+    except ClientError:
+        pass
+    plan = build_plan(findings, account_id)
+    write_plan(plan, args.plan_file)
+    logger.info(f"Evaluation complete: {len(findings)} findings, {len(plan['commands'])} commands in "
+                f"{time.monotonic() - started:.1f}s. Plan saved to {args.plan_file}")
+
+
+if __name__ == "__main__":
+    main()
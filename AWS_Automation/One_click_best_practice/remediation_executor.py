@@ -0,0 +1,487 @@
+import argparse
+import csv
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pandas as pd
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, ConnectionError as BotoConnectionError
+from botocore.parsers import ResponseParserError
+
+# Same retry settings as EC2_automation_compliance.sh
+MAX_RETRIES = 5
+INITIAL_DELAY = 5
+MAX_DELAY = 60
+LOG_FILE = "changes.log"
+RESULTS_FILE = "remediation_results.csv"
+
+# Sheet of the enriched report (One_ReportFormatter.py) that holds every finding row
+REPORT_SHEET = 'Report_Raw.pp'
+
+# Requests per second allowed per service; AWS throttles mutating EC2 calls well below describe calls
+DEFAULT_RATES = {'ec2': 5.0}
+
+# Error codes that mean "slow down", retried with backoff
+THROTTLE_CODES = {'Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'TooManyRequestsException',
+                  'RequestThrottled', 'SlowDown'}
+
+# describe-* calls take this many IDs per filter
+DESCRIBE_BATCH_SIZE = 200
+
+RESULT_COLUMNS = ['control_title', 'region', 'account_id', 'resource', 'action', 'status', 'message']
+
+logger = logging.getLogger('remediation')
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        Thread-safe token bucket; acquire() blocks until a token is free
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float, optional): Largest burst (default: one second of tokens)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Action:
+    def __init__(self, name, service, apply, prefetch=None, per_region=False):
+        """
+        Remediation for one control
+
+        Args:
+            name (str): Action name written to the results
+            service (str): AWS service the calls go to; selects the rate limit
+            apply (callable): apply(executor, region, resource_id, state, dry_run) -> (status, message)
+            prefetch (callable, optional): prefetch(executor, region, resource_ids) -> state;
+                one batched read per control and region
+            per_region (bool, optional): Apply once per region instead of once per resource
+        """
+        self.name = name
+        self.service = service
+        self.apply = apply
+        self.prefetch = prefetch
+        self.per_region = per_region
+
+
+def _chunks(items, size=DESCRIBE_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _describe_instances(executor, region, instance_ids):
+    instances = {}
+    for chunk in _chunks(sorted(set(instance_ids))):
+        for page in executor.paginate('ec2', region, 'describe_instances',
+                                      Filters=[{'Name': 'instance-id', 'Values': chunk}]):
+            for reservation in page.get('Reservations', []):
+                for instance in reservation.get('Instances', []):
+                    instances[instance['InstanceId']] = instance
+    return instances
+
+
+def _mutate(executor, region, operation, dry_run, **kwargs):
+    # EC2's DryRun checks permissions and parameters without changing anything
+    try:
+        executor.call('ec2', region, operation, DryRun=dry_run, **kwargs)
+    except ClientError as e:
+        if dry_run and e.response['Error']['Code'] == 'DryRunOperation':
+            return 'would_fix', 'Dry run succeeded'
+        raise
+    return ('would_fix', 'Dry run succeeded') if dry_run else ('fixed', operation)
+
+
+def prefetch_volume_attachments(executor, region, volume_ids):
+    volumes = {}
+    for chunk in _chunks(sorted(set(volume_ids))):
+        for page in executor.paginate('ec2', region, 'describe_volumes',
+                                      Filters=[{'Name': 'volume-id', 'Values': chunk}]):
+            volumes.update({volume['VolumeId']: volume for volume in page.get('Volumes', [])})
+    instance_ids = [attachment['InstanceId'] for volume in volumes.values()
+                    for attachment in volume.get('Attachments', [])]
+    return {'volumes': volumes, 'instances': _describe_instances(executor, region, instance_ids)}
+
+
+def ensure_delete_on_termination(executor, region, volume_id, state, dry_run):
+    volume = state['volumes'].get(volume_id)
+    if volume is None:
+        return 'skipped', 'Volume not found in region'
+    if not volume.get('Attachments'):
+        return 'skipped', 'Volume is not attached to an instance'
+    attachment = volume['Attachments'][0]
+    instance = state['instances'].get(attachment['InstanceId'], {})
+    mapping = next((mapping for mapping in instance.get('BlockDeviceMappings', [])
+                    if mapping.get('DeviceName') == attachment['Device']), {})
+    if mapping.get('Ebs', {}).get('DeleteOnTermination', attachment.get('DeleteOnTermination')):
+        return 'compliant', 'DeleteOnTermination already enabled'
+    return _mutate(executor, region, 'modify_instance_attribute', dry_run, InstanceId=attachment['InstanceId'],
+                   BlockDeviceMappings=[{'DeviceName': attachment['Device'], 'Ebs': {'DeleteOnTermination': True}}])
+
+
+def prefetch_instances(executor, region, instance_ids):
+    return {'instances': _describe_instances(executor, region, instance_ids)}
+
+
+def require_imdsv2(executor, region, instance_id, state, dry_run):
+    instance = state['instances'].get(instance_id)
+    if instance is None:
+        return 'skipped', 'Instance not found in region'
+    if instance.get('MetadataOptions', {}).get('HttpTokens') == 'required':
+        return 'compliant', 'IMDSv2 already required'
+    return _mutate(executor, region, 'modify_instance_metadata_options', dry_run, InstanceId=instance_id,
+                   HttpTokens='required', HttpEndpoint='enabled')
+
+
+def enable_detailed_monitoring(executor, region, instance_id, state, dry_run):
+    instance = state['instances'].get(instance_id)
+    if instance is None:
+        return 'skipped', 'Instance not found in region'
+    if instance.get('Monitoring', {}).get('State') in ('enabled', 'pending'):
+        return 'compliant', 'Detailed monitoring already enabled'
+    return _mutate(executor, region, 'monitor_instances', dry_run, InstanceIds=[instance_id])
+
+
+def prefetch_ebs_default_encryption(executor, region, resource_ids):
+    return {'enabled': executor.call('ec2', region, 'get_ebs_encryption_by_default')['EbsEncryptionByDefault']}
+
+
+def enable_ebs_default_encryption(executor, region, resource_id, state, dry_run):
+    if state['enabled']:
+        return 'compliant', 'EBS encryption by default already enabled'
+    return _mutate(executor, region, 'enable_ebs_encryption_by_default', dry_run)
+
+
+def encrypt_volume(executor, region, volume_id, state, dry_run):
+    # EBS_loop_test.sh calls "aws ec2 encrypt-volume", which does not exist: an existing volume
+    # can only be replaced by an encrypted copy (snapshot, copy-snapshot --encrypted, create-volume)
+    return 'manual', 'Replace with an encrypted copy; enable EBS encryption by default for new volumes'
+
+
+DELETE_ON_TERMINATION = Action('ensure_delete_on_termination', 'ec2', ensure_delete_on_termination,
+                               prefetch_volume_attachments)
+REQUIRE_IMDSV2 = Action('require_imdsv2', 'ec2', require_imdsv2, prefetch_instances)
+DETAILED_MONITORING = Action('enable_detailed_monitoring', 'ec2', enable_detailed_monitoring, prefetch_instances)
+EBS_DEFAULT_ENCRYPTION = Action('enable_ebs_encryption_by_default', 'ec2', enable_ebs_default_encryption,
+                                prefetch_ebs_default_encryption, per_region=True)
+ENCRYPT_VOLUME = Action('ensure_encryption_enabled', 'ec2', encrypt_volume)
+
+# Control titles as they appear in the report, mapped to their remediation
+ACTIONS = {
+    'Attached EBS volumes should have delete on termination enabled': DELETE_ON_TERMINATION,
+    'Ensure EBS volumes attached to an EC2 instance is marked for deletion upon instance termination': DELETE_ON_TERMINATION,
+    'EC2 instances should use IMDSv2': REQUIRE_IMDSV2,
+    'EC2 instance detailed monitoring should be enabled': DETAILED_MONITORING,
+    'EBS default encryption should be enabled': EBS_DEFAULT_ENCRYPTION,
+    'EBS encryption by default should be enabled': EBS_DEFAULT_ENCRYPTION,
+    'Attached EBS volumes should have encryption enabled': ENCRYPT_VOLUME,
+    'EBS volume encryption at rest should be enabled': ENCRYPT_VOLUME
+}
+
+
+def resource_region(resource, region=None):
+    # arn:aws:ec2:<region>:<account>:volume/vol-...; the report's region column wins when set
+    if isinstance(region, str) and region.strip():
+        return region.strip()
+    parts = str(resource).split(':')
+    return parts[3] if len(parts) > 5 and parts[3] else None
+
+
+def resource_id(resource):
+    return str(resource).rsplit('/', 1)[-1].rsplit(':', 1)[-1]
+
+
+def load_alarm_rows(report_file, sheet=REPORT_SHEET):
+    """
+    Read the alarm rows of an enriched report or a Powerpipe CSV export
+
+    Args:
+        report_file (str): .xlsx from One_ReportFormatter.py, or .csv
+        sheet (str, optional): Worksheet holding the finding rows
+
+    Returns:
+        pd.DataFrame: Rows with status 'alarm'
+    """
+    if report_file.lower().endswith('.csv'):
+        df = pd.read_csv(report_file, dtype=str, keep_default_na=False)
+    else:
+        df = pd.read_excel(report_file, sheet_name=sheet, dtype=str, keep_default_na=False)
+    missing = [column for column in ['control_title', 'resource', 'status'] if column not in df.columns]
+    if missing:
+        raise ValueError(f"{report_file} does not have the required columns: {', '.join(missing)}")
+    return df[df['status'].str.strip().str.lower() == 'alarm']
+
+
+def group_alarms(alarms, account_id=None):
+    """
+    Group alarm rows by control and region
+
+    Args:
+        alarms (pd.DataFrame): Alarm rows
+        account_id (str, optional): Account the credentials belong to; rows of other
+            accounts are returned as skipped results
+
+    Returns:
+        tuple: ({(control_title, region): [row dicts]}, skipped result rows)
+    """
+    groups = {}
+    skipped = []
+    for row in alarms.to_dict('records'):
+        row['region'] = resource_region(row['resource'], row.get('region'))
+        result = {column: row.get(column, '') for column in RESULT_COLUMNS}
+        action = ACTIONS.get(row['control_title'].strip())
+        if action is None:
+            continue
+        result['action'] = action.name
+        if account_id and row.get('account_id') and str(row['account_id']).strip() != account_id:
+            skipped.append({**result, 'status': 'skipped', 'message': f"Belongs to account {row['account_id']}"})
+        elif not row['region']:
+            skipped.append({**result, 'status': 'skipped', 'message': 'No region in the row or resource ARN'})
+        else:
+            groups.setdefault((row['control_title'].strip(), row['region']), []).append(row)
+    return groups, skipped
+
+
+class RemediationExecutor:
+    def __init__(self, session=None, endpoint_url=None, max_workers=8, rates=None,
+                 max_retries=MAX_RETRIES, initial_delay=INITIAL_DELAY, dry_run=False):
+        """
+        Run remediation actions through a bounded pool with per-service rate limits
+
+        Args:
+            session (boto3.Session, optional): Session to create the clients from
+            endpoint_url (str, optional): Endpoint override, e.g. a local stand-in
+            max_workers (int, optional): Calls in flight at once
+            rates (dict, optional): Requests per second per service (default: DEFAULT_RATES)
+            max_retries (int, optional): Attempts per call for throttling and server errors
+            initial_delay (float, optional): First backoff delay in seconds; doubles per attempt
+            dry_run (bool, optional): Send mutating calls with DryRun so nothing changes
+        """
+        self.session = session or boto3.Session()
+        self.endpoint_url = endpoint_url
+        self.max_workers = max_workers
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.dry_run = dry_run
+        self.retries = Counter()
+        self._buckets = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        # Retries are handled here, so botocore's own retry loop is switched off
+        self._config = Config(retries={'max_attempts': 1, 'mode': 'standard'})
+
+    def client(self, service, region):
+        with self._lock:
+            if (service, region) not in self._clients:
+                self._clients[(service, region)] = self.session.client(
+                    service, region_name=region, endpoint_url=self.endpoint_url, config=self._config)
+                self._buckets.setdefault(service, TokenBucket(self.rates.get(service, 5.0)))
+            return self._clients[(service, region)]
+
+    def _with_backoff(self, service, region, request):
+        client = self.client(service, region)
+        for attempt in range(1, self.max_retries + 1):
+            self._buckets[service].acquire()
+            try:
+                return request(client)
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+                if (code not in THROTTLE_CODES and status < 500) or attempt == self.max_retries:
+                    raise
+                reason = code
+            except BotoConnectionError as e:
+                if attempt == self.max_retries:
+                    raise
+                reason = type(e).__name__
+            delay = min(self.initial_delay * 2 ** (attempt - 1), MAX_DELAY)
+            delay = random.uniform(delay / 2, delay)
+            with self._lock:
+                self.retries[service] += 1
+            logger.warning(f"{service} {region}: {reason}, retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+    def call(self, service, region, operation, **kwargs):
+        """Rate-limited API call, retried with exponential backoff on throttling and 5xx errors"""
+        return self._with_backoff(service, region, lambda client: getattr(client, operation)(**kwargs))
+
+    def paginate(self, service, region, operation, **kwargs):
+        """Pages of a NextToken-paginated call; every page request is rate-limited and retried on its own"""
+        token = None
+        while True:
+            page = self.call(service, region, operation, **kwargs, **({'NextToken': token} if token else {}))
+            yield page
+            token = page.get('NextToken')
+            if not token:
+                return
+
+    def _apply(self, action, region, row, state):
+        result = {column: row.get(column, '') for column in RESULT_COLUMNS}
+        result.update({'region': region, 'action': action.name})
+        try:
+            status, message = action.apply(self, region, resource_id(row['resource']), state, self.dry_run)
+        except ClientError as e:
+            status, message = 'failed', f"{e.response['Error']['Code']}: {e.response['Error'].get('Message', '')}"
+        except (BotoCoreError, ResponseParserError) as e:
+            # A parser error means the endpoint answered with something other than the API's XML
+            status, message = 'failed', str(e).splitlines()[0]
+        result.update({'status': status, 'message': message})
+        logger.info(f"{action.name} {region} {row['resource']}: {status} ({message})")
+        return result
+
+    @staticmethod
+    def _failed(action, region, row, message):
+        return {**{column: row.get(column, '') for column in RESULT_COLUMNS},
+                'region': region, 'action': action.name, 'status': 'failed', 'message': message}
+
+    def _prefetch(self, action, region, rows):
+        if action.prefetch is None:
+            return None
+        return action.prefetch(self, region, [resource_id(row['resource']) for row in rows])
+
+    def run(self, groups):
+        """
+        Prefetch every (control, region) group, then apply the actions in parallel
+
+        Args:
+            groups (dict): {(control_title, region): [row dicts]} from group_alarms
+
+        Returns:
+            list: One result dict per remediated row
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            keys = list(groups)
+            prefetched = {}
+            futures = {key: pool.submit(self._prefetch, ACTIONS[key[0]], key[1], groups[key]) for key in keys}
+            for key, future in futures.items():
+                try:
+                    prefetched[key] = future.result()
+                except (ClientError, BotoCoreError, ResponseParserError) as e:
+                    logger.error(f"{key[0]} in {key[1]}: lookup failed, skipping {len(groups[key])} resources: {e}")
+                    results.extend(self._failed(ACTIONS[key[0]], key[1], row, f"Lookup failed: {e}")
+                                   for row in groups[key])
+                except Exception as e:
+                    # A bug in one lookup must not cost the results of every other group
+                    logger.exception(f"{key[0]} in {key[1]}: unexpected lookup error, "
+                                     f"skipping {len(groups[key])} resources")
+                    results.extend(self._failed(ACTIONS[key[0]], key[1], row,
+                                                f"Lookup failed: {type(e).__name__}: {e}")
+                                   for row in groups[key])
+
+            tasks = []
+            for key, state in prefetched.items():
+                action = ACTIONS[key[0]]
+                rows = groups[key]
+                if action.per_region:
+                    # One call fixes the whole region; the other rows share its result
+                    tasks.append((pool.submit(self._apply, action, key[1], rows[0], state), action, key[1], rows))
+                else:
+                    tasks.extend((pool.submit(self._apply, action, key[1], row, state), action, key[1], [row])
+                                 for row in rows)
+
+            for future, action, region, rows in tasks:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # _apply records API errors itself; anything else fails only this task
+                    logger.exception(f"{action.name} {region} {rows[0].get('resource', '')}: unexpected error")
+                    result = self._failed(action, region, rows[0], f"{type(e).__name__}: {e}")
+                for row in rows:
+                    results.append({**result, 'resource': row.get('resource', ''),
+                                    'account_id': row.get('account_id', ''),
+                                    'control_title': row.get('control_title', '')})
+        return results
+
+
+def write_results(results, results_file=RESULTS_FILE):
+    temp_file = f"{results_file}.tmp"
+    with open(temp_file, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+    os.replace(temp_file, results_file)
+
+
+def parse_rates(values):
+    rates = {}
+    for value in values or []:
+        service, _, rate = value.partition('=')
+        rates[service.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(log_file=LOG_FILE):
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    for handler in [logging.StreamHandler(), logging.FileHandler(log_file)]:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remediate the alarm rows of an enriched report, grouped by control and region")
+    parser.add_argument('report', help=f"Enriched report (.xlsx, sheet {REPORT_SHEET}) or Powerpipe CSV export")
+    parser.add_argument('--dry-run', action='store_true', help="Send mutating calls with DryRun; nothing is changed")
+    parser.add_argument('--max-workers', type=int, default=8, help="Calls in flight at once (default: 8)")
+    parser.add_argument('--rate', action='append', metavar='SERVICE=N',
+                        help=f"Requests per second for a service, repeatable (default: ec2={DEFAULT_RATES['ec2']:g})")
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                        help=f"Attempts per call on throttling and server errors (default: {MAX_RETRIES})")
+    parser.add_argument('--initial-delay', type=float, default=INITIAL_DELAY,
+                        help=f"First backoff delay in seconds, doubled per attempt (default: {INITIAL_DELAY})")
+    parser.add_argument('--results-file', default=RESULTS_FILE, help=f"Per-resource results (default: {RESULTS_FILE})")
+    parser.add_argument('--log-file', default=LOG_FILE, help=f"Log file, appended to (default: {LOG_FILE})")
+    parser.add_argument('--endpoint-url', default=None,
+                        help="AWS endpoint override, e.g. http://localhost:5000 for a local moto server")
+    args = parser.parse_args()
+
+    setup_logging(args.log_file)
+    logger.info(f"========== Run on {time.strftime('%Y-%m-%d %H:%M:%S')}{' (dry run)' if args.dry_run else ''} ==========")
+
+    session = boto3.Session()
+    account_id = session.client('sts', endpoint_url=args.endpoint_url).get_caller_identity()['Account']
+    alarms = load_alarm_rows(args.report)
+    groups, skipped = group_alarms(alarms, account_id)
+    logger.info(f"{len(alarms)} alarm rows, {sum(len(rows) for rows in groups.values())} with a remediation "
+                f"in {len(groups)} control/region groups, {len(skipped)} skipped")
+
+    executor = RemediationExecutor(session, endpoint_url=args.endpoint_url, max_workers=args.max_workers,
+                                   rates=parse_rates(args.rate), max_retries=args.max_retries,
+                                   initial_delay=args.initial_delay, dry_run=args.dry_run)
+    started = time.monotonic()
+    results = skipped + executor.run(groups)
+    write_results(results, args.results_file)
+
+    counts = Counter(result['status'] for result in results)
+    logger.info(f"Done in {time.monotonic() - started:.1f}s: "
+                f"{', '.join(f'{status}={count}' for status, count in sorted(counts.items()))}; "
+                f"{sum(executor.retries.values())} retried calls. Results saved to {args.results_file}")
+    return 1 if counts.get('failed') else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
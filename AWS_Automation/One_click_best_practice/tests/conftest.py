@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The engines are scripts that sit next to the shell versions they replace
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """A moto stand-in for the AWS APIs, with fake credentials so nothing reaches AWS"""
+    moto = pytest.importorskip('moto')
+    for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')]:
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    with moto.mock_aws():
+        yield
@@ -0,0 +1,106 @@
+import json
+
+import boto3
+import pytest
+
+from ec2_audit_engine import RULES, audit_regions, write_report
+
+# moto registers its sample AMIs in every region
+AMI = 'ami-12c6146b'
+
+# Fields audit_instance in EC2_automation_compliance.sh writes, in its order
+SHELL_FIELDS = ['instance_id', 'ami_encrypted', 'has_public_ip', 'using_imdsv2', 'has_iam_profile']
+
+
+@pytest.fixture
+def fleet(aws):
+    """A hardened and an exposed instance in us-east-1, a default one in eu-west-1 and a terminated one"""
+    iam = boto3.client('iam')
+    iam.create_instance_profile(InstanceProfileName='app')
+
+    east = boto3.client('ec2', region_name='us-east-1')
+    east.create_key_pair(KeyName='ops')
+    open_group = east.create_security_group(GroupName='launch-wizard-1', Description='ssh from anywhere')['GroupId']
+    east.authorize_security_group_ingress(GroupId=open_group, IpPermissions=[
+        {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}])
+
+    hardened = east.run_instances(ImageId=AMI, MinCount=1, MaxCount=1, InstanceType='t3.micro',
+                                  MetadataOptions={'HttpTokens': 'required'},
+                                  IamInstanceProfile={'Name': 'app'}, Monitoring={'Enabled': True},
+                                  EbsOptimized=True)['Instances'][0]['InstanceId']
+    exposed = east.run_instances(ImageId=AMI, MinCount=1, MaxCount=1, KeyName='ops',
+                                 SecurityGroupIds=[open_group])['Instances'][0]['InstanceId']
+    terminated = east.run_instances(ImageId=AMI, MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+    east.terminate_instances(InstanceIds=[terminated])
+
+    west = boto3.client('ec2', region_name='eu-west-1')
+    default = west.run_instances(ImageId=AMI, MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+    return {'hardened': hardened, 'exposed': exposed, 'terminated': terminated, 'default': default,
+            'clients': {'us-east-1': east, 'eu-west-1': west}}
+
+
+@pytest.fixture
+def report(fleet, tmp_path):
+    report_file = tmp_path / 'ec2_compliance_report.json'
+    write_report(audit_regions(['us-east-1', 'eu-west-1'], session=boto3.Session()), str(report_file))
+    with open(report_file) as fh:
+        return {entry['instance_id']: entry for entry in json.load(fh)}
+
+
+def _shell_values(client, instance_id):
+    """
+    What audit_instance computes from the same describe output
+
+    The shell reads ami_encrypted from Images[0].Encrypted, which describe-images
+    does not return, so it always wrote "None"; the engine uses the AMI's EBS mappings.
+    """
+    instance = client.describe_instances(InstanceIds=[instance_id])['Reservations'][0]['Instances'][0]
+    image = client.describe_images(ImageIds=[instance['ImageId']])['Images'][0]
+    return {
+        'instance_id': instance_id,
+        'ami_encrypted': str(all(mapping['Ebs'].get('Encrypted', False)
+                                 for mapping in image['BlockDeviceMappings'] if 'Ebs' in mapping)).lower(),
+        'has_public_ip': 'true' if instance.get('PublicIpAddress') else 'false',
+        'using_imdsv2': 'true' if instance.get('MetadataOptions', {}).get('HttpTokens') == 'required' else 'false',
+        'has_iam_profile': 'true' if instance.get('IamInstanceProfile') else 'false',
+    }
+
+
+def test_report_lists_live_instances_of_every_region(fleet, report):
+    assert set(report) == {fleet['hardened'], fleet['exposed'], fleet['default']}
+    assert report[fleet['default']]['region'] == 'eu-west-1'
+    assert report[fleet['hardened']]['region'] == 'us-east-1'
+
+
+def test_report_entries_match_the_shell_report(fleet, report):
+    for name, region in [('hardened', 'us-east-1'), ('exposed', 'us-east-1'), ('default', 'eu-west-1')]:
+        entry = report[fleet[name]]
+        # The shell fields come first, then the remaining rules and the region
+        assert list(entry) == SHELL_FIELDS + [field for field, _ in RULES[4:]] + ['region']
+        assert {field: entry[field] for field in SHELL_FIELDS} == _shell_values(fleet['clients'][region], fleet[name])
+        assert set(entry.values()) - {fleet[name], region} <= {'true', 'false', 'None'}
+
+
+def test_rule_values(fleet, report):
+    hardened, exposed = report[fleet['hardened']], report[fleet['exposed']]
+
+    assert (hardened['using_imdsv2'], hardened['has_iam_profile']) == ('true', 'true')
+    assert (exposed['using_imdsv2'], exposed['has_iam_profile']) == ('false', 'false')
+    assert (hardened['detailed_monitoring'], exposed['detailed_monitoring']) == ('true', 'false')
+    assert (hardened['ebs_optimized'], exposed['ebs_optimized']) == ('true', 'false')
+    assert (hardened['uses_key_pair'], exposed['uses_key_pair']) == ('false', 'true')
+    assert exposed['launch_wizard_security_group'] == 'true'
+    assert exposed['admin_ports_open_to_internet'] == 'true'
+    assert hardened['admin_ports_open_to_internet'] == 'false'
+    assert hardened['older_than_180_days'] == 'false'
+    assert hardened['in_vpc'] == 'true'
+
+
+def test_report_file_is_one_instance_per_line(fleet, tmp_path):
+    report_file = tmp_path / 'ec2_compliance_report.json'
+    write_report(audit_regions(['us-east-1'], session=boto3.Session()), str(report_file))
+
+    lines = report_file.read_text().splitlines()
+    assert lines[0] == '[' and lines[-1] == ']'
+    assert len(lines) == 4
+    assert all(line.startswith('{"instance_id": ') for line in lines[1:-1])
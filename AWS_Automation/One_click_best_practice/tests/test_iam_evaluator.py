@@ -0,0 +1,81 @@
+import json
+
+import boto3
+import pytest
+
+from iam_evaluator import build_plan, evaluate, fetch_snapshot, resolve_access_key_ids
+
+ADMIN_POLICY = json.dumps({"Version": "2012-10-17",
+                           "Statement": [{"Effect": "Allow", "Action": "*", "Resource": "*"}]})
+READ_POLICY = json.dumps({"Version": "2012-10-17",
+                          "Statement": [{"Effect": "Allow", "Action": "s3:Get*", "Resource": "*"}]})
+
+
+@pytest.fixture
+def iam(aws):
+    client = boto3.client('iam')
+    # alice: two active keys; bob: one key and a group; nobody in empty-group
+    client.create_user(UserName='alice')
+    alice_keys = [client.create_access_key(UserName='alice')['AccessKey']['AccessKeyId'] for _ in range(2)]
+    client.create_user(UserName='bob')
+    client.create_access_key(UserName='bob')
+    client.create_group(GroupName='devs')
+    client.add_user_to_group(GroupName='devs', UserName='bob')
+    admin_arn = client.create_policy(PolicyName='AdminUnattached', PolicyDocument=ADMIN_POLICY)['Policy']['Arn']
+    read_arn = client.create_policy(PolicyName='ReadAttached', PolicyDocument=READ_POLICY)['Policy']['Arn']
+    client.attach_group_policy(GroupName='devs', PolicyArn=read_arn)
+    client.create_group(GroupName='empty-group')
+    client.attach_group_policy(GroupName='empty-group', PolicyArn=read_arn)
+    return {'client': client, 'alice_keys': alice_keys, 'admin_arn': admin_arn, 'read_arn': read_arn}
+
+
+def _plan(client, **settings):
+    findings = evaluate(fetch_snapshot(client), settings=settings)
+    resolve_access_key_ids(client, findings)
+    return build_plan(findings, '123456789012')
+
+
+def _entities(plan, check):
+    return [finding['entity'] for finding in plan['findings'] if finding['check'] == check]
+
+
+def test_plan_flags_the_seeded_problems(iam):
+    plan = _plan(iam['client'])
+
+    assert _entities(plan, 'enable_single_active_access_key') == ['alice/key2']
+    assert _entities(plan, 'ensure_iam_groups_have_users_or_remove') == ['empty-group']
+    assert _entities(plan, 'check_unattached_admin_policies') == [iam['admin_arn']]
+    assert _entities(plan, 'set_iam_password_policy') == ['password-policy']
+    # Attached and not admin, so not a candidate for deletion
+    assert iam['read_arn'] not in _entities(plan, 'delete_unattached_iam_policies')
+    assert plan['account_id'] == '123456789012'
+    assert plan['findings_by_check']['enable_single_active_access_key'] == 1
+
+
+def test_plan_commands_are_resolved_and_ordered(iam):
+    plan = _plan(iam['client'])
+    commands = plan['commands']
+
+    # The second key is the newer one, matching the credential report's slot order
+    assert (f"aws iam update-access-key --user-name alice --access-key-id {iam['alice_keys'][1]} "
+            f"--status Inactive") in commands
+    assert not any('<key' in command for command in commands)
+
+    detach = f"aws iam detach-group-policy --group-name empty-group --policy-arn {iam['read_arn']}"
+    assert commands.index(detach) < commands.index("aws iam delete-group --group-name empty-group")
+    assert f"aws iam delete-policy --policy-arn {iam['admin_arn']}" in commands
+    assert len(commands) == len(set(commands))
+
+
+def test_strong_password_policy_is_not_flagged(iam):
+    iam['client'].update_account_password_policy(
+        MinimumPasswordLength=16, RequireLowercaseCharacters=True, RequireUppercaseCharacters=True,
+        RequireNumbers=True, RequireSymbols=True, PasswordReusePrevention=5, MaxPasswordAge=60)
+
+    assert _entities(_plan(iam['client']), 'set_iam_password_policy') == []
+
+
+def test_key_age_threshold_comes_from_settings(iam):
+    plan = _plan(iam['client'], access_key_max_age_days=0)
+
+    assert sorted(_entities(plan, 'rotate_user_access_keys')) == ['alice/key1', 'alice/key2', 'bob/key1']
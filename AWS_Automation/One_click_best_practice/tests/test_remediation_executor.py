@@ -0,0 +1,158 @@
+import boto3
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError
+
+from remediation_executor import ACTIONS, Action, RemediationExecutor, group_alarms
+
+REGION = 'us-east-1'
+ACCOUNT = '123456789012'
+EBS_DEFAULT = 'EBS default encryption should be enabled'
+IMDSV2 = 'EC2 instances should use IMDSv2'
+
+
+def _alarms(rows):
+    return pd.DataFrame([{'status': 'alarm', 'account_id': ACCOUNT, 'region': '', **row} for row in rows])
+
+
+def _executor(**options):
+    return RemediationExecutor(boto3.Session(), max_workers=4, rates={'ec2': 1000.0}, initial_delay=0.0, **options)
+
+
+def _volume_rows(ec2, count):
+    volumes = [ec2.create_volume(AvailabilityZone=f'{REGION}a', Size=1)['VolumeId'] for _ in range(count)]
+    return [{'control_title': EBS_DEFAULT, 'resource': f'arn:aws:ec2:{REGION}:{ACCOUNT}:volume/{volume}'}
+            for volume in volumes]
+
+
+def _client_error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+                       'EnableEbsEncryptionByDefault')
+
+
+def test_group_alarms_by_control_and_region():
+    alarms = _alarms([
+        {'control_title': IMDSV2, 'resource': f'arn:aws:ec2:us-east-1:{ACCOUNT}:instance/i-1'},
+        {'control_title': IMDSV2, 'resource': f'arn:aws:ec2:us-east-1:{ACCOUNT}:instance/i-2'},
+        {'control_title': IMDSV2, 'resource': 'i-3', 'region': 'eu-west-1'},
+        {'control_title': IMDSV2, 'resource': 'arn:aws:ec2:us-east-1:999999999999:instance/i-4',
+         'account_id': '999999999999'},
+        {'control_title': IMDSV2, 'resource': 'i-5'},
+        {'control_title': 'A control without a remediation', 'resource': 'arn:aws:s3:::bucket'},
+    ])
+
+    groups, skipped = group_alarms(alarms, ACCOUNT)
+
+    assert {key: [row['resource'][-3:] for row in rows] for key, rows in groups.items()} == {
+        (IMDSV2, 'us-east-1'): ['i-1', 'i-2'],
+        (IMDSV2, 'eu-west-1'): ['i-3'],
+    }
+    assert [(row['resource'][-3:], row['message']) for row in skipped] == [
+        ('i-4', 'Belongs to account 999999999999'),
+        ('i-5', 'No region in the row or resource ARN'),
+    ]
+
+
+def test_dry_run_changes_nothing_then_apply_fixes(aws):
+    ec2 = boto3.client('ec2', region_name=REGION)
+    groups, _ = group_alarms(_alarms(_volume_rows(ec2, 1)), ACCOUNT)
+
+    dry_run = _executor(dry_run=True).run(groups)
+    assert [result['status'] for result in dry_run] == ['would_fix']
+    assert ec2.get_ebs_encryption_by_default()['EbsEncryptionByDefault'] is False
+
+    applied = _executor().run(groups)
+    assert [result['status'] for result in applied] == ['fixed']
+    assert ec2.get_ebs_encryption_by_default()['EbsEncryptionByDefault'] is True
+
+    assert [result['status'] for result in _executor().run(groups)] == ['compliant']
+
+
+def test_per_region_action_runs_once_for_every_row(aws, monkeypatch):
+    ec2 = boto3.client('ec2', region_name=REGION)
+    rows = _volume_rows(ec2, 3)
+    groups, _ = group_alarms(_alarms(rows), ACCOUNT)
+    executor = _executor()
+    calls = []
+    call = executor.call
+    monkeypatch.setattr(executor, 'call', lambda service, region, operation, **kwargs:
+                        calls.append(operation) or call(service, region, operation, **kwargs))
+
+    results = executor.run(groups)
+
+    assert calls.count('enable_ebs_encryption_by_default') == 1
+    assert sorted(result['resource'] for result in results) == sorted(row['resource'] for row in rows)
+    assert {result['status'] for result in results} == {'fixed'}
+
+
+def test_imdsv2_is_required_on_the_instance(aws):
+    ec2 = boto3.client('ec2', region_name=REGION)
+    instance = ec2.run_instances(ImageId='ami-12c6146b', MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+    groups, _ = group_alarms(_alarms([{'control_title': IMDSV2, 'resource': f'arn:aws:ec2:{REGION}:{ACCOUNT}:instance/{instance}'},
+                                      {'control_title': IMDSV2, 'resource': f'arn:aws:ec2:{REGION}:{ACCOUNT}:instance/i-0000000000000000'}]),
+                             ACCOUNT)
+
+    results = {result['resource'].rsplit('/', 1)[-1]: result for result in _executor().run(groups)}
+
+    assert results[instance]['status'] == 'fixed'
+    assert results['i-0000000000000000']['status'] == 'skipped'
+    described = ec2.describe_instances(InstanceIds=[instance])['Reservations'][0]['Instances'][0]
+    assert described['MetadataOptions']['HttpTokens'] == 'required'
+
+
+def test_backoff_retries_request_limit_exceeded(aws):
+    executor = _executor(max_retries=4)
+    attempts = []
+
+    def throttled(client):
+        attempts.append(client)
+        if len(attempts) < 3:
+            raise _client_error('RequestLimitExceeded', 503)
+        return {'EbsEncryptionByDefault': True}
+
+    assert executor._with_backoff('ec2', REGION, throttled) == {'EbsEncryptionByDefault': True}
+    assert len(attempts) == 3
+    assert executor.retries['ec2'] == 2
+
+
+def test_backoff_gives_up_and_skips_client_errors(aws):
+    executor = _executor(max_retries=3)
+    attempts = []
+
+    def failing(code):
+        def request(client):
+            attempts.append(code)
+            raise _client_error(code)
+        return request
+
+    with pytest.raises(ClientError, match='RequestLimitExceeded'):
+        executor._with_backoff('ec2', REGION, failing('RequestLimitExceeded'))
+    with pytest.raises(ClientError, match='UnauthorizedOperation'):
+        executor._with_backoff('ec2', REGION, failing('UnauthorizedOperation'))
+
+    assert attempts.count('RequestLimitExceeded') == 3
+    assert attempts.count('UnauthorizedOperation') == 1
+
+
+def test_unexpected_error_fails_only_its_task(aws, monkeypatch):
+    def apply(executor, region, resource_id, state, dry_run):
+        if resource_id == 'i-broken':
+            raise KeyError('InstanceId')
+        return 'fixed', 'stub'
+
+    monkeypatch.setitem(ACTIONS, 'Stub control', Action('stub', 'ec2', apply))
+    monkeypatch.setitem(ACTIONS, 'Stub lookup control',
+                        Action('stub_lookup', 'ec2', apply, prefetch=lambda executor, region, ids: 1 / 0))
+    groups, _ = group_alarms(_alarms([
+        {'control_title': 'Stub control', 'resource': f'arn:aws:ec2:{REGION}:{ACCOUNT}:instance/i-ok'},
+        {'control_title': 'Stub control', 'resource': f'arn:aws:ec2:{REGION}:{ACCOUNT}:instance/i-broken'},
+        {'control_title': 'Stub lookup control', 'resource': f'arn:aws:ec2:{REGION}:{ACCOUNT}:instance/i-other'},
+    ]), ACCOUNT)
+
+    results = {result['resource'].rsplit('/', 1)[-1]: result for result in _executor().run(groups)}
+
+    assert results['i-ok']['status'] == 'fixed'
+    assert results['i-broken']['status'] == 'failed'
+    assert results['i-broken']['message'] == "KeyError: 'InstanceId'"
+    assert results['i-other']['status'] == 'failed'
+    assert 'ZeroDivisionError' in results['i-other']['message']
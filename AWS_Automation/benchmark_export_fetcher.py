@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+import webbrowser
+
+import aiohttp
+
+DEFAULT_SERVER = "http://10.10.30.93:9102"
+
+# Benchmarks exported for every client report
+BENCHMARKS = [
+    "aws_thrifty.benchmark.secretsmanager",
+    "aws_thrifty.benchmark.s3",
+    "aws_thrifty.benchmark.route53",
+    "aws_thrifty.benchmark.redshift",
+    "aws_thrifty.benchmark.rds",
+    "aws_thrifty.benchmark.network",
+    "aws_thrifty.benchmark.emr",
+    "aws_thrifty.benchmark.elasticache",
+    "aws_thrifty.benchmark.eks",
+    "aws_thrifty.benchmark.ecs",
+    "aws_thrifty.benchmark.ec2",
+    "aws_thrifty.benchmark.ebs",
+    "aws_thrifty.benchmark.dynamodb",
+    "aws_thrifty.benchmark.cost_explorer",
+    "aws_thrifty.benchmark.cloudwatch",
+    "aws_thrifty.benchmark.cloudfront",
+    "aws_top_10.benchmark.account_security",
+    "aws_well_architected.benchmark.well_architected_framework",
+    "aws_compliance.benchmark.foundational_security",
+    "aws_compliance.benchmark.all_controls"
+]
+
+# Where the JSON export of a benchmark is published; {server} and {benchmark} are filled in
+DEFAULT_URL_TEMPLATE = "{server}/{benchmark}.json"
+
+# Columns of Powerpipe's CSV export, which One_ReportFormatter.py and Two_analyse.py load
+EXPORT_COLUMNS = [
+    'group_id', 'title', 'description', 'control_id', 'control_title',
+    'control_description', 'reason', 'resource', 'status', 'severity'
+]
+
+# HTTP statuses worth retrying; other 4xx responses fail immediately
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Dashboard filters --open adds to a benchmark's URL, as important_mod_link_open.py did
+DASHBOARD_QUERIES = {
+    "aws_compliance.benchmark.foundational_security": (
+        "where=%2B%22operator%22%3A%22and%22%2C%22expressions%22%3A%5B%2B%22operator%22%3A%22equal%22%2C"
+        "%22value%22%3A%22aws_compliance.benchmark.foundational_security%22%2C%22type%22%3A%22benchmark%22%2C"
+        "%22title%22%3A%22AWS+Foundational+Security+Best+Practices%22%2D%5D%2D"
+    )
+}
+
+
+class FetchError(Exception):
+    pass
+
+
+def _children(parent, key):
+    # Groups, controls and results must all be JSON objects
+    children = parent.get(key) or []
+    if not isinstance(children, list) or not all(isinstance(child, dict) for child in children):
+        raise ValueError(f"'{key}' of {parent.get('group_id') or parent.get('control_id') or 'the export'} "
+                         f"is not a list of objects")
+    return children
+
+
+def dashboard_url(server, benchmark):
+    """Dashboard URL of a benchmark, with its filter from DASHBOARD_QUERIES"""
+    url = f"{server.rstrip('/')}/{benchmark}"
+    query = DASHBOARD_QUERIES.get(benchmark)
+    return f"{url}?{query}" if query else url
+
+
+def flatten_benchmark(export):
+    """
+    Flatten a Powerpipe benchmark JSON export into CSV export rows
+
+    Controls are nested in groups to any depth; each result becomes one
+    row carrying its parent group and the result dimensions (account_id,
+    region, ...) as extra columns.
+
+    Args:
+        export (dict): Parsed `powerpipe benchmark run --output json` document
+
+    Returns:
+        tuple: (rows as dicts, dimension column names in first-seen order)
+
+    Raises:
+        ValueError: When the document is not shaped like a benchmark export
+    """
+    if not isinstance(export, dict):
+        raise ValueError(f"expected a benchmark export object, got a JSON {type(export).__name__}")
+    rows = []
+    dimension_columns = []
+    seen_dimensions = set()
+
+    stack = [export]
+    while stack:
+        group = stack.pop()
+        # Keep the export order: children are pushed reversed onto the stack
+        stack.extend(reversed(_children(group, 'groups')))
+        for control in _children(group, 'controls'):
+            for result in _children(control, 'results'):
+                row = {
+                    'group_id': group.get('group_id', ''),
+                    'title': group.get('title', ''),
+                    'description': group.get('description', ''),
+                    'control_id': control.get('control_id', ''),
+                    'control_title': control.get('title', ''),
+                    'control_description': control.get('description', ''),
+                    'reason': result.get('reason', ''),
+                    'resource': result.get('resource', ''),
+                    'status': result.get('status', ''),
+                    'severity': control.get('severity', '')
+                }
+                for dimension in _children(result, 'dimensions'):
+                    key = dimension.get('key')
+                    if not key or key in EXPORT_COLUMNS:
+                        continue
+                    if key not in seen_dimensions:
+                        seen_dimensions.add(key)
+                        dimension_columns.append(key)
+                    row[key] = dimension.get('value', '')
+                rows.append(row)
+    return rows, dimension_columns
+
+
+def write_export(export, output_dir, benchmark, keep_json=False, raw=None):
+    """
+    Write a benchmark export as the CSV our loaders accept
+
+    Args:
+        export (dict): Parsed benchmark JSON export
+        output_dir (str): Output directory
+        benchmark (str): Benchmark name, used for the file name
+        keep_json (bool, optional): Also save the raw JSON next to the CSV
+        raw (bytes, optional): Response body to save with keep_json
+
+    Returns:
+        tuple: (CSV path, number of rows)
+
+    Raises:
+        ValueError: When the export is not shaped like a benchmark export
+        OSError: When the files cannot be written
+    """
+    rows, dimension_columns = flatten_benchmark(export)
+    output_file = os.path.join(output_dir, f"{benchmark}.csv")
+    temp_file = f"{output_file}.tmp"
+    with open(temp_file, 'w', newline='', encoding='utf-8') as fh:
+        writer = csv.DictWriter(fh, fieldnames=EXPORT_COLUMNS + dimension_columns, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temp_file, output_file)
+
+    if keep_json and raw is not None:
+        with open(os.path.join(output_dir, f"{benchmark}.json"), 'wb') as fh:
+            fh.write(raw)
+    return output_file, len(rows)
+
+
+async def fetch_json(session, url, retries=3, backoff=1.0):
+    """
+    GET a JSON document, retrying timeouts, connection errors and 5xx/429 responses
+
+    Args:
+        session (aiohttp.ClientSession): Shared session (pooled connections)
+        url (str): URL to fetch
+        retries (int, optional): Extra attempts after a failure
+        backoff (float, optional): First retry delay ceiling in seconds; doubles per attempt
+
+    Returns:
+        tuple: (parsed JSON, raw body bytes, attempts used)
+    """
+    for attempt in range(1, retries + 2):
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    raw = await response.read()
+                    break
+                error = f"HTTP {response.status}"
+                if response.status not in RETRY_STATUSES:
+                    raise FetchError(f"{url}: {error}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+        if attempt > retries:
+            raise FetchError(f"{url}: {error} after {attempt} attempts")
+        await asyncio.sleep(random.uniform(0, backoff * (2 ** (attempt - 1))))
+
+    try:
+        return json.loads(raw), raw, attempt
+    except json.JSONDecodeError as e:
+        raise FetchError(f"{url}: response is not JSON ({e})")
+
+
+async def fetch_all(benchmarks, server=DEFAULT_SERVER, url_template=DEFAULT_URL_TEMPLATE,
+                    output_dir='benchmark_exports', concurrency=6, timeout=120.0,
+                    retries=3, backoff=1.0, keep_json=False):
+    """
+    Download and convert every benchmark export, at most `concurrency` at a time
+
+    All requests share one ClientSession, so connections to the server are
+    kept alive and reused. Converting and writing a finished export runs in
+    a worker thread while the other downloads continue.
+
+    Args:
+        benchmarks (list): Benchmark names
+        server (str, optional): Base URL of the server publishing the exports
+        url_template (str, optional): Export URL with {server} and {benchmark} placeholders
+        output_dir (str, optional): Directory for the CSV files
+        concurrency (int, optional): Requests in flight at once
+        timeout (float, optional): Seconds allowed per request
+        retries (int, optional): Extra attempts per benchmark
+        backoff (float, optional): First retry delay ceiling in seconds
+        keep_json (bool, optional): Also save the raw JSON exports
+
+    Returns:
+        list: One result dict per benchmark, in input order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def fetch_one(session, benchmark):
+        url = url_template.format(server=server.rstrip('/'), benchmark=benchmark)
+        started = time.monotonic()
+        async with semaphore:
+            try:
+                export, raw, attempts = await fetch_json(session, url, retries, backoff)
+                output_file, row_count = await asyncio.to_thread(
+                    write_export, export, output_dir, benchmark, keep_json, raw
+                )
+            except (FetchError, ValueError, OSError) as e:
+                # A bad export or a failed write only fails its own benchmark
+                error = str(e) if isinstance(e, FetchError) else f"{url}: {e}"
+                print(f"FAILED {benchmark}: {error}")
+                return {'benchmark': benchmark, 'status': 'failed', 'error': error}
+        elapsed = round(time.monotonic() - started, 2)
+        print(f"{benchmark}: {row_count} rows -> {output_file} ({elapsed}s, {attempts} attempt(s))")
+        return {'benchmark': benchmark, 'status': 'ok', 'output': output_file,
+                'rows': row_count, 'attempts': attempts, 'elapsed_s': elapsed}
+
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        return await asyncio.gather(*(fetch_one(session, benchmark) for benchmark in benchmarks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch Powerpipe benchmark exports and write them as report-ready CSV files")
+    parser.add_argument('--server', default=DEFAULT_SERVER, help=f"Base URL of the export server (default: {DEFAULT_SERVER})")
+    parser.add_argument('--benchmark', action='append', dest='benchmarks', metavar='NAME',
+                        help="Benchmark to fetch, repeatable (default: the standard client report list)")
+    parser.add_argument('--url-template', default=DEFAULT_URL_TEMPLATE,
+                        help=f"Export URL with {{server}} and {{benchmark}} placeholders (default: {DEFAULT_URL_TEMPLATE})")
+    parser.add_argument('--output-dir', default='benchmark_exports', help="Directory for the CSV files (default: benchmark_exports)")
+    parser.add_argument('--concurrency', type=int, default=6, help="Requests in flight at once (default: 6)")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Seconds allowed per request (default: 120)")
+    parser.add_argument('--retries', type=int, default=3, help="Extra attempts per benchmark (default: 3)")
+    parser.add_argument('--backoff', type=float, default=1.0, help="First retry delay ceiling in seconds (default: 1)")
+    parser.add_argument('--keep-json', action='store_true', help="Also save the raw JSON exports")
+    parser.add_argument('--open', action='store_true',
+                        help="Only open the benchmark dashboards in the browser, as important_mod_link_open.py did")
+    args = parser.parse_args()
+
+    benchmarks = args.benchmarks or BENCHMARKS
+    if args.open:
+        for benchmark in benchmarks:
+            webbrowser.open(dashboard_url(args.server, benchmark))
+            time.sleep(2)  # Give the browser time to open each tab
+        return 0
+
+    started = time.monotonic()
+    results = asyncio.run(fetch_all(
+        benchmarks,
+        server=args.server,
+        url_template=args.url_template,
+        output_dir=args.output_dir,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        retries=args.retries,
+        backoff=args.backoff,
+        keep_json=args.keep_json
+    ))
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"\n{len(results) - len(failed)} of {len(results)} benchmarks exported to {args.output_dir} "
+          f"in {time.monotonic() - started:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# benchmark_export_fetcher.py is a script at the top of AWS_Automation
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
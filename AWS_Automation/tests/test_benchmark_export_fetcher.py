@@ -0,0 +1,163 @@
+import asyncio
+import csv
+import json
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmark_export_fetcher import DASHBOARD_QUERIES, dashboard_url, fetch_all, flatten_benchmark
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SNAPSHOT = 'aws_compliance.benchmark.foundational_security'
+
+
+def _snapshot():
+    with open(os.path.join(FIXTURES, f"{SNAPSHOT}.json"), 'rb') as fh:
+        return fh.read()
+
+
+def _run(routes, benchmarks, output_dir, **options):
+    """Serve the routes on a local port and fetch the benchmarks from it"""
+    hits = {}
+
+    def counted(handler, name):
+        async def wrapper(request):
+            hits[name] = hits.get(name, 0) + 1
+            return await handler(request, hits[name])
+        return wrapper
+
+    async def main():
+        app = web.Application()
+        for name, handler in routes.items():
+            app.router.add_get(f"/{name}.json", counted(handler, name))
+        async with TestServer(app) as server:
+            options.setdefault('backoff', 0.0)
+            return await fetch_all(benchmarks, server=str(server.make_url('')), output_dir=str(output_dir),
+                                   **options)
+
+    return asyncio.run(main()), hits
+
+
+async def _serve_snapshot(request, attempt):
+    return web.Response(body=_snapshot(), content_type='application/json')
+
+
+def _results(results):
+    return {result['benchmark']: result for result in results}
+
+
+def test_flatten_benchmark_walks_nested_groups():
+    rows, dimensions = flatten_benchmark(json.loads(_snapshot()))
+
+    assert [row['control_title'] for row in rows] == [
+        'S3 buckets should have versioning enabled',
+        'S3 buckets should have versioning enabled',
+        'IAM user access keys should be rotated every 90 days',
+    ]
+    # Each row carries the group it sits in, however deep
+    assert rows[2]['group_id'] == 'aws_compliance.benchmark.foundational_security_iam_keys'
+    assert rows[2]['title'] == 'IAM Access Keys'
+    assert dimensions == ['account_id', 'region', 'partition']
+    assert rows[0]['region'] == 'us-east-1'
+    assert 'partition' not in rows[0]
+
+
+def test_flatten_benchmark_rejects_non_exports():
+    with pytest.raises(ValueError, match='JSON list'):
+        flatten_benchmark([1, 2])
+    with pytest.raises(ValueError, match="'controls'"):
+        flatten_benchmark({'group_id': 'g', 'controls': ['not a control']})
+
+
+def test_fetch_writes_report_ready_csv(tmp_path):
+    results, hits = _run({SNAPSHOT: _serve_snapshot}, [SNAPSHOT], tmp_path)
+
+    assert results[0]['status'] == 'ok'
+    assert results[0]['rows'] == 3
+    with open(tmp_path / f"{SNAPSHOT}.csv", newline='') as fh:
+        rows = list(csv.DictReader(fh))
+    assert [row['status'] for row in rows] == ['alarm', 'ok', 'alarm']
+    assert rows[2]['partition'] == 'aws'
+    assert rows[0]['partition'] == ''
+
+
+def test_retries_503_and_429(tmp_path):
+    async def flaky(request, attempt):
+        if attempt == 1:
+            return web.Response(status=503)
+        if attempt == 2:
+            return web.Response(status=429)
+        return await _serve_snapshot(request, attempt)
+
+    results, hits = _run({SNAPSHOT: flaky}, [SNAPSHOT], tmp_path, retries=3)
+
+    assert results[0]['status'] == 'ok'
+    assert results[0]['attempts'] == 3
+    assert hits[SNAPSHOT] == 3
+
+
+def test_gives_up_after_retries(tmp_path):
+    async def unavailable(request, attempt):
+        return web.Response(status=503)
+
+    results, hits = _run({SNAPSHOT: unavailable}, [SNAPSHOT], tmp_path, retries=2)
+
+    assert results[0]['status'] == 'failed'
+    assert 'HTTP 503 after 3 attempts' in results[0]['error']
+    assert hits[SNAPSHOT] == 3
+
+
+def test_does_not_retry_404(tmp_path):
+    async def missing(request, attempt):
+        return web.Response(status=404)
+
+    results, hits = _run({SNAPSHOT: missing}, [SNAPSHOT], tmp_path, retries=3)
+
+    assert results[0]['status'] == 'failed'
+    assert results[0]['error'].endswith('HTTP 404')
+    assert hits[SNAPSHOT] == 1
+
+
+def test_timeout_fails_the_benchmark(tmp_path):
+    async def slow(request, attempt):
+        await asyncio.sleep(2)
+        return await _serve_snapshot(request, attempt)
+
+    results, hits = _run({SNAPSHOT: slow}, [SNAPSHOT], tmp_path, timeout=0.2, retries=1)
+
+    assert results[0]['status'] == 'failed'
+    assert 'after 2 attempts' in results[0]['error']
+    assert hits[SNAPSHOT] == 2
+
+
+def test_bad_export_fails_only_its_benchmark(tmp_path):
+    async def not_an_object(request, attempt):
+        return web.json_response([1, 2, 3])
+
+    results, hits = _run({SNAPSHOT: _serve_snapshot, 'aws_top_10.benchmark.account_security': not_an_object},
+                         [SNAPSHOT, 'aws_top_10.benchmark.account_security'], tmp_path)
+
+    results = _results(results)
+    assert results[SNAPSHOT]['status'] == 'ok'
+    assert results['aws_top_10.benchmark.account_security']['status'] == 'failed'
+    assert 'JSON list' in results['aws_top_10.benchmark.account_security']['error']
+
+
+def test_write_error_fails_only_its_benchmark(tmp_path):
+    # The CSV of a benchmark named with a missing subdirectory cannot be created
+    results, hits = _run({SNAPSHOT: _serve_snapshot, 'missing/dir': _serve_snapshot},
+                         [SNAPSHOT, 'missing/dir'], tmp_path)
+
+    results = _results(results)
+    assert results[SNAPSHOT]['status'] == 'ok'
+    assert results['missing/dir']['status'] == 'failed'
+    assert 'No such file or directory' in results['missing/dir']['error']
+
+
+def test_dashboard_url_keeps_the_foundational_security_filter():
+    assert dashboard_url('http://server:9102/', SNAPSHOT) == \
+        f"http://server:9102/{SNAPSHOT}?{DASHBOARD_QUERIES[SNAPSHOT]}"
+    assert dashboard_url('http://server:9102', 'aws_compliance.benchmark.all_controls') == \
+        'http://server:9102/aws_compliance.benchmark.all_controls'
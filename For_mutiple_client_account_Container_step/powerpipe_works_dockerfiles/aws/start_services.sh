@@ -0,0 +1,39 @@
+#!/bin/bash
+
+# Container entrypoint: start Steampipe and Powerpipe from the mods baked into the image
+# and record how long each service takes to come up in /home/powerpipe/startup.log
+
+STEAMPIPE_PORT="${STEAMPIPE_PORT:-9193}"
+POWERPIPE_PORT="${POWERPIPE_PORT:-9033}"
+MOD_LOCATION=/home/powerpipe/mod
+STARTUP_LOG=/home/powerpipe/startup.log
+
+now_ms() {
+    local now="${EPOCHREALTIME/./}"
+    echo $((now / 1000))
+}
+
+seconds_since() {
+    local elapsed=$(($(now_ms) - $1))
+    printf "%d.%03d" $((elapsed / 1000)) $((elapsed % 1000))
+}
+
+START=$(now_ms)
+
+# Returns once the database accepts connections
+steampipe service start --port "$STEAMPIPE_PORT" > /home/powerpipe/steampipe.log 2>&1
+STEAMPIPE_SECONDS=$(seconds_since "$START")
+
+# Log the total once Powerpipe is listening too
+(
+    if /usr/local/bin/wait_ready.sh "${READY_TIMEOUT:-300}" > /dev/null; then
+        STATUS=ready
+    else
+        STATUS=timeout
+    fi
+    echo "$(date -u +%FT%TZ) status=$STATUS steampipe_seconds=$STEAMPIPE_SECONDS total_seconds=$(seconds_since "$START")" \
+        | tee -a "$STARTUP_LOG"
+) &
+
+cd "$MOD_LOCATION"
+exec powerpipe server --port "$POWERPIPE_PORT"
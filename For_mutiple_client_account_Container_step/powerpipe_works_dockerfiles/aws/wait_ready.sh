@@ -0,0 +1,31 @@
+#!/bin/bash
+
+# Readiness probe: wait until Steampipe and Powerpipe accept connections
+# Usage: wait_ready.sh [timeout-seconds]   (ports come from STEAMPIPE_PORT / POWERPIPE_PORT)
+
+TIMEOUT="${1:-300}"
+STEAMPIPE_PORT="${STEAMPIPE_PORT:-9193}"
+POWERPIPE_PORT="${POWERPIPE_PORT:-9033}"
+
+now_ms() {
+    local now="${EPOCHREALTIME/./}"
+    echo $((now / 1000))
+}
+
+port_open() {
+    (exec 3<>"/dev/tcp/127.0.0.1/$1") 2>/dev/null
+}
+
+START=$(now_ms)
+for port in "$STEAMPIPE_PORT" "$POWERPIPE_PORT"; do
+    until port_open "$port"; do
+        if [ $(($(now_ms) - START)) -ge $((TIMEOUT * 1000)) ]; then
+            echo "Port $port not ready after ${TIMEOUT}s"
+            exit 1
+        fi
+        sleep 0.5
+    done
+done
+
+ELAPSED=$(($(now_ms) - START))
+printf "Ready after %d.%03ds\n" $((ELAPSED / 1000)) $((ELAPSED % 1000))
@@ -0,0 +1,568 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import shlex
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Defaults taken from Close_yet_does_not_work.sh
+DEFAULT_IMAGE = 'pp-sp-img'
+DEFAULT_NETWORK = 'aws_default_network'
+DEFAULT_CONTAINER_PREFIX = 'pp_scan'
+STEAMPIPE_BASE_PORT = 9194
+POWERPIPE_BASE_PORT = 9040
+DEFAULT_BENCHMARK = 'aws_compliance.benchmark.all_controls'
+MOD_LOCATION = '/home/powerpipe/mod'
+
+# Label set on every container this script creates, so warm containers can be found again
+ORCHESTRATOR_LABEL = 'scan.orchestrator=powerpipe'
+
+# Powerpipe exits non-zero when controls alarm or error; codes from 249 up mean the run itself failed
+RUN_FAILURE_EXIT_CODE = 249
+
+
+class ScanError(Exception):
+    def __init__(self, message, recreate=False):
+        """
+        Failure of one scan attempt
+
+        Args:
+            message (str): What went wrong
+            recreate (bool, optional): The container is unhealthy and should be replaced on retry
+        """
+        super().__init__(message)
+        self.recreate = recreate
+
+
+class PortPool:
+    def __init__(self, steampipe_base=STEAMPIPE_BASE_PORT, powerpipe_base=POWERPIPE_BASE_PORT, size=100):
+        """
+        Thread-safe pool of Steampipe/Powerpipe host port pairs
+
+        Pair i is (steampipe_base + i, powerpipe_base + i). A pair is handed
+        out only when neither port is owned by another container and both
+        can be bound on this host.
+
+        Args:
+            steampipe_base (int, optional): First Steampipe port
+            powerpipe_base (int, optional): First Powerpipe port
+            size (int, optional): Number of pairs in the pool
+        """
+        self.steampipe_base = steampipe_base
+        self.powerpipe_base = powerpipe_base
+        self.size = size
+        self.owners = {}
+        self._lock = threading.Lock()
+
+    def _used_ports(self, exclude=None):
+        return {port for owner, pair in self.owners.items() if owner != exclude for port in pair}
+
+    def reserve(self, owner, ports):
+        """
+        Claim a specific pair, e.g. the ports a warm container was created with
+
+        Args:
+            owner (str): Container name
+            ports (tuple): (steampipe_port, powerpipe_port)
+
+        Returns:
+            bool: False when another container already owns one of the ports
+        """
+        with self._lock:
+            if self._used_ports(exclude=owner) & set(ports):
+                return False
+            self.owners[owner] = tuple(ports)
+            return True
+
+    def acquire(self, owner):
+        """
+        Hand out a free pair for a new container
+
+        Args:
+            owner (str): Container name
+
+        Returns:
+            tuple: (steampipe_port, powerpipe_port)
+        """
+        with self._lock:
+            used = self._used_ports(exclude=owner)
+            for offset in range(self.size):
+                pair = (self.steampipe_base + offset, self.powerpipe_base + offset)
+                if pair[0] == pair[1] or used & set(pair):
+                    continue
+                if all(port_is_free(port) for port in pair):
+                    self.owners[owner] = pair
+                    return pair
+        raise ScanError(f"No free port pair left in the pool of {self.size}")
+
+    def release(self, owner):
+        """Return an owner's pair to the pool"""
+        with self._lock:
+            self.owners.pop(owner, None)
+
+
+def port_is_free(port):
+    """True when nothing on this host is listening on the TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(('0.0.0.0', port))
+        except OSError:
+            return False
+    return True
+
+
+def port_is_open(port, host='127.0.0.1', timeout=1.0):
+    """True when a TCP connection to the port succeeds"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def load_accounts(accounts_file):
+    """
+    Read the accounts to scan from a JSON list or a CSV file
+
+    Each account needs name, aws_access_key_id and aws_secret_access_key;
+    region and aws_session_token are optional.
+
+    Args:
+        accounts_file (str): Path to the .json or .csv file
+
+    Returns:
+        list: Account dictionaries
+    """
+    with open(accounts_file, newline='') as fh:
+        if accounts_file.lower().endswith('.json'):
+            accounts = json.load(fh)
+        else:
+            accounts = list(csv.DictReader(fh))
+
+    required = ['name', 'aws_access_key_id', 'aws_secret_access_key']
+    seen = set()
+    for idx, account in enumerate(accounts, 1):
+        missing = [key for key in required if not account.get(key)]
+        if missing:
+            raise ValueError(f"Account {idx} in {accounts_file} is missing: {', '.join(missing)}")
+        if account['name'] in seen:
+            raise ValueError(f"Duplicate account name in {accounts_file}: {account['name']}")
+        seen.add(account['name'])
+        account.setdefault('region', 'us-east-1')
+        account['region'] = account['region'] or 'us-east-1'
+    return accounts
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Exponential backoff with full jitter for the given retry number (1-based)"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+class ScanOrchestrator:
+    def __init__(self, docker_bin='docker', image=DEFAULT_IMAGE, network=DEFAULT_NETWORK,
+                 prefix=DEFAULT_CONTAINER_PREFIX, benchmarks=None, output_dir='scan_output',
+                 max_parallel=4, retries=3, backoff_base=5.0, backoff_max=60.0,
+                 health_timeout=300.0, scan_timeout=3600.0, port_pool=None,
+                 reuse=True, stop_after=False):
+        """
+        Run Powerpipe benchmarks for many AWS accounts, one container per account
+
+        Args:
+            docker_bin (str, optional): Docker command, e.g. 'docker' or a stand-in script
+            image (str, optional): Image built from Dockerfileaws
+            network (str, optional): Docker network for the containers
+            prefix (str, optional): Container name prefix
+            benchmarks (list, optional): Benchmarks to run per account
+            output_dir (str, optional): Where the per-account CSV exports go
+            max_parallel (int, optional): Accounts scanned at the same time
+            retries (int, optional): Extra attempts per account after a failure
+            backoff_base (float, optional): First retry delay ceiling in seconds
+            backoff_max (float, optional): Largest retry delay ceiling in seconds
+            health_timeout (float, optional): Seconds to wait for the services to come up
+            scan_timeout (float, optional): Seconds allowed for one benchmark run
+            port_pool (PortPool, optional): Host port pairs to allocate from
+            reuse (bool, optional): Reuse warm containers from earlier runs
+            stop_after (bool, optional): Stop each container after its scan instead of leaving it running
+        """
+        self.docker_cmd = shlex.split(docker_bin)
+        self.image = image
+        self.network = network
+        self.prefix = prefix
+        self.benchmarks = benchmarks or [DEFAULT_BENCHMARK]
+        self.output_dir = output_dir
+        self.max_parallel = max_parallel
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.health_timeout = health_timeout
+        self.scan_timeout = scan_timeout
+        self.port_pool = port_pool or PortPool()
+        self.reuse = reuse
+        self.stop_after = stop_after
+        self._print_lock = threading.Lock()
+
+    def log(self, account_name, message):
+        with self._print_lock:
+            print(f"[{time.strftime('%H:%M:%S')}] {account_name}: {message}", flush=True)
+
+    def docker(self, *args, env=None, timeout=120, check=True):
+        """
+        Run a docker command and capture its output
+
+        Args:
+            *args (str): Docker arguments
+            env (dict, optional): Extra environment for the docker client, used for credentials
+            timeout (float, optional): Seconds before the command is abandoned
+            check (bool, optional): Raise ScanError on a non-zero exit code
+
+        Returns:
+            subprocess.CompletedProcess: Finished command
+        """
+        full_env = None
+        if env:
+            full_env = dict(os.environ)
+            full_env.update(env)
+        try:
+            result = subprocess.run(self.docker_cmd + list(args), capture_output=True, text=True,
+                                    env=full_env, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise ScanError(f"docker {args[0]} timed out after {timeout}s")
+        if check and result.returncode != 0:
+            raise ScanError(f"docker {args[0]} failed ({result.returncode}): {result.stderr.strip()[-500:]}")
+        return result
+
+    def container_name(self, account):
+        return f"{self.prefix}_{re.sub(r'[^A-Za-z0-9_.-]', '_', account['name'])}"
+
+    def ensure_network(self):
+        """Create the Docker network if it does not exist yet"""
+        if self.docker('network', 'inspect', self.network, check=False).returncode != 0:
+            self.docker('network', 'create', self.network)
+            print(f"Created Docker network: {self.network}")
+
+    def load_warm_ports(self):
+        """Reserve the port pairs of containers left by earlier runs, so new containers never collide"""
+        result = self.docker(
+            'ps', '-a', '--filter', f'label={ORCHESTRATOR_LABEL}', '--format',
+            '{{.Names}}|{{.Label "scan.steampipe_port"}}|{{.Label "scan.powerpipe_port"}}',
+            check=False
+        )
+        for line in result.stdout.splitlines():
+            parts = line.strip().split('|')
+            if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+                self.port_pool.reserve(parts[0], (int(parts[1]), int(parts[2])))
+
+    def inspect_container(self, name):
+        """
+        State of an existing container
+
+        Returns:
+            dict: running, ports and credentials fingerprint, or None when the container does not exist
+        """
+        result = self.docker(
+            'inspect', '--format',
+            '{{.State.Running}}|{{index .Config.Labels "scan.steampipe_port"}}|'
+            '{{index .Config.Labels "scan.powerpipe_port"}}|{{index .Config.Labels "scan.credentials"}}',
+            name, check=False
+        )
+        if result.returncode != 0:
+            return None
+        parts = result.stdout.strip().split('|')
+        if len(parts) != 4 or not parts[1].isdigit() or not parts[2].isdigit():
+            return {'running': False, 'ports': None, 'credentials': None}
+        return {
+            'running': parts[0] == 'true',
+            'ports': (int(parts[1]), int(parts[2])),
+            'credentials': parts[3]
+        }
+
+    @staticmethod
+    def credentials_env(account):
+        """Environment passed to the docker client; docker run only names the variables"""
+        env = {
+            'AWS_ACCESS_KEY_ID': account['aws_access_key_id'],
+            'AWS_SECRET_ACCESS_KEY': account['aws_secret_access_key'],
+            'AWS_REGION': account['region']
+        }
+        if account.get('aws_session_token'):
+            env['AWS_SESSION_TOKEN'] = account['aws_session_token']
+        return env
+
+    @staticmethod
+    def credentials_fingerprint(account):
+        """Short hash of the credentials, stored as a label to detect rotated keys"""
+        material = '|'.join(account.get(key) or '' for key in
+                            ['aws_access_key_id', 'aws_secret_access_key', 'aws_session_token', 'region'])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+    def remove_container(self, name):
+        self.docker('rm', '-f', name, check=False)
+        self.port_pool.release(name)
+
+    def ensure_container(self, account, recreate=False):
+        """
+        Start a warm container for the account or create a new one
+
+        A container is reused when it exists, was created with the same
+        credentials and its ports can be reserved; a stopped one is started.
+
+        Args:
+            account (dict): Account to scan
+            recreate (bool, optional): Replace any existing container
+
+        Returns:
+            tuple: (container name, (steampipe_port, powerpipe_port), warm)
+        """
+        name = self.container_name(account)
+        fingerprint = self.credentials_fingerprint(account)
+        state = self.inspect_container(name)
+
+        if state is not None:
+            reusable = (self.reuse and not recreate and state['ports'] is not None
+                        and state['credentials'] == fingerprint
+                        and self.port_pool.reserve(name, state['ports']))
+            if reusable:
+                if not state['running']:
+                    self.log(account['name'], "Starting stopped container")
+                    try:
+                        self.docker('start', name)
+                    except ScanError as e:
+                        # E.g. its host port was taken meanwhile; the next attempt creates a new
+                        # container on a free pair instead of repeating the same start
+                        raise ScanError(f"Warm container did not start: {e}", recreate=True)
+                return name, state['ports'], True
+            self.log(account['name'], "Removing old container")
+            self.remove_container(name)
+
+        steampipe_port, powerpipe_port = self.port_pool.acquire(name)
+        args = [
+            'run', '-d', '--name', name,
+            '--network', self.network,
+            '-p', f"{steampipe_port}:{steampipe_port}",
+            '-p', f"{powerpipe_port}:{powerpipe_port}",
+            '-e', f"STEAMPIPE_PORT={steampipe_port}",
+            '-e', f"POWERPIPE_PORT={powerpipe_port}",
+            '--label', ORCHESTRATOR_LABEL,
+            '--label', f"scan.account={account['name']}",
+            '--label', f"scan.steampipe_port={steampipe_port}",
+            '--label', f"scan.powerpipe_port={powerpipe_port}",
+            '--label', f"scan.credentials={fingerprint}"
+        ]
+        env = self.credentials_env(account)
+        for var in env:
+            args += ['-e', var]
+        args.append(self.image)
+
+        self.log(account['name'], f"Creating container on ports {steampipe_port}/{powerpipe_port}")
+        try:
+            self.docker(*args, env=env)
+        except ScanError:
+            self.remove_container(name)
+            raise
+        return name, (steampipe_port, powerpipe_port), False
+
+    def wait_healthy(self, account, name, ports):
+        """
+        Wait until both services accept connections and the AWS credentials work
+
+        Returns:
+            tuple: (AWS account ID reported by Steampipe, seconds until both ports accepted connections)
+        """
+        started = time.monotonic()
+        deadline = started + self.health_timeout
+        delay = 0.5
+        while not all(port_is_open(port) for port in ports):
+            if time.monotonic() >= deadline:
+                raise ScanError(f"Services not listening on {ports[0]}/{ports[1]} after {self.health_timeout}s",
+                                recreate=True)
+            state = self.inspect_container(name)
+            if not state or not state['running']:
+                logs = self.docker('logs', '--tail', '20', name, check=False)
+                raise ScanError(f"Container exited: {(logs.stdout + logs.stderr).strip()[-500:]}", recreate=True)
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+        ready_s = round(time.monotonic() - started, 1)
+
+        # Credential check: the same query the plugin needs for every control
+        result = self.docker(
+            'exec', name, 'steampipe', 'query', 'select account_id from aws_account', '--output', 'csv',
+            timeout=max(deadline - time.monotonic(), 30), check=False
+        )
+        rows = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+        if result.returncode != 0 or len(rows) < 2:
+            raise ScanError(f"Credential check failed: {(result.stderr or result.stdout).strip()[-500:]}")
+        return rows[1], ready_s
+
+    def run_benchmarks(self, account, name, ports):
+        """
+        Run every benchmark inside the container and save the CSV exports
+
+        Returns:
+            list: Paths of the written CSV files
+        """
+        account_dir = os.path.join(self.output_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', account['name']))
+        os.makedirs(account_dir, exist_ok=True)
+        database = f"postgres://steampipe@localhost:{ports[0]}/steampipe"
+
+        outputs = []
+        for benchmark in self.benchmarks:
+            self.log(account['name'], f"Running {benchmark}")
+            result = self.docker(
+                'exec', '-w', MOD_LOCATION, name,
+                'powerpipe', 'benchmark', 'run', benchmark,
+                '--mod-location', MOD_LOCATION, '--database', database, '--output', 'csv',
+                timeout=self.scan_timeout, check=False
+            )
+            if result.returncode >= RUN_FAILURE_EXIT_CODE or not result.stdout.strip():
+                raise ScanError(f"{benchmark} failed ({result.returncode}): {result.stderr.strip()[-500:]}")
+
+            output_file = os.path.join(account_dir, f"{benchmark}.csv")
+            temp_file = f"{output_file}.tmp"
+            with open(temp_file, 'w', newline='') as fh:
+                fh.write(result.stdout)
+            os.replace(temp_file, output_file)
+            outputs.append(output_file)
+        return outputs
+
+    def scan_account(self, account):
+        """
+        Scan one account with retries and backoff
+
+        Args:
+            account (dict): Account to scan
+
+        Returns:
+            dict: Result record for the summary
+        """
+        started = time.monotonic()
+        record = {'name': account['name'], 'status': 'failed', 'attempts': 0}
+        recreate = False
+
+        for attempt in range(1, self.retries + 2):
+            record['attempts'] = attempt
+            try:
+                name, ports, warm = self.ensure_container(account, recreate=recreate)
+                record.update({'container': name, 'steampipe_port': ports[0],
+                               'powerpipe_port': ports[1], 'warm': warm})
+                record['account_id'], record['ready_s'] = self.wait_healthy(account, name, ports)
+                self.log(account['name'], f"Services ready after {record['ready_s']}s")
+                record['outputs'] = self.run_benchmarks(account, name, ports)
+                record['status'] = 'ok'
+                record.pop('error', None)
+                break
+            except ScanError as e:
+                record['error'] = str(e)
+                recreate = recreate or e.recreate
+                if attempt > self.retries:
+                    self.log(account['name'], f"Giving up after {attempt} attempts: {e}")
+                    break
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                self.log(account['name'], f"Attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        if self.stop_after and record.get('container'):
+            self.docker('stop', record['container'], check=False)
+        record['elapsed_s'] = round(time.monotonic() - started, 1)
+        self.log(account['name'], f"{record['status']} in {record['elapsed_s']}s")
+        return record
+
+    def run(self, accounts):
+        """
+        Scan all accounts, at most max_parallel at a time
+
+        Args:
+            accounts (list): Account dictionaries from load_accounts
+
+        Returns:
+            list: Result records in input order
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.ensure_network()
+        if self.reuse:
+            self.load_warm_ports()
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            futures = {executor.submit(self.scan_account, account): account['name'] for account in accounts}
+            for future in as_completed(futures):
+                account_name = futures[future]
+                try:
+                    results[account_name] = future.result()
+                except Exception as e:
+                    self.log(account_name, f"Unexpected error: {e}")
+                    results[account_name] = {'name': account_name, 'status': 'failed', 'error': str(e)}
+        return [results[account['name']] for account in accounts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Powerpipe benchmarks for many AWS accounts in parallel containers")
+    parser.add_argument('accounts', nargs='?', help="JSON or CSV file with name, aws_access_key_id, "
+                                                    "aws_secret_access_key and optional region, aws_session_token")
+    parser.add_argument('--benchmark', action='append', dest='benchmarks', metavar='NAME',
+                        help=f"Benchmark to run, repeatable (default: {DEFAULT_BENCHMARK})")
+    parser.add_argument('--output-dir', default='scan_output', help="Directory for the CSV exports (default: scan_output)")
+    parser.add_argument('--max-parallel', type=int, default=4, help="Accounts scanned at the same time (default: 4)")
+    parser.add_argument('--retries', type=int, default=3, help="Extra attempts per account after a failure (default: 3)")
+    parser.add_argument('--backoff', type=float, default=5.0, help="First retry delay ceiling in seconds (default: 5)")
+    parser.add_argument('--backoff-max', type=float, default=60.0, help="Largest retry delay ceiling in seconds (default: 60)")
+    parser.add_argument('--health-timeout', type=float, default=300.0,
+                        help="Seconds to wait for Steampipe/Powerpipe to come up (default: 300)")
+    parser.add_argument('--scan-timeout', type=float, default=3600.0, help="Seconds allowed per benchmark run (default: 3600)")
+    parser.add_argument('--image', default=DEFAULT_IMAGE, help=f"Image built from Dockerfileaws (default: {DEFAULT_IMAGE})")
+    parser.add_argument('--network', default=DEFAULT_NETWORK, help=f"Docker network (default: {DEFAULT_NETWORK})")
+    parser.add_argument('--prefix', default=DEFAULT_CONTAINER_PREFIX,
+                        help=f"Container name prefix (default: {DEFAULT_CONTAINER_PREFIX})")
+    parser.add_argument('--steampipe-base-port', type=int, default=STEAMPIPE_BASE_PORT,
+                        help=f"First Steampipe host port (default: {STEAMPIPE_BASE_PORT})")
+    parser.add_argument('--powerpipe-base-port', type=int, default=POWERPIPE_BASE_PORT,
+                        help=f"First Powerpipe host port (default: {POWERPIPE_BASE_PORT})")
+    parser.add_argument('--port-pool-size', type=int, default=100, help="Port pairs available (default: 100)")
+    parser.add_argument('--fresh', action='store_true', help="Recreate containers instead of reusing warm ones")
+    parser.add_argument('--stop-after', action='store_true', help="Stop each container after its scan")
+    parser.add_argument('--docker-bin', default=os.environ.get('DOCKER_BIN', 'docker'),
+                        help="Docker command, e.g. 'docker' or a stand-in script for testing (default: $DOCKER_BIN or docker)")
+    args = parser.parse_args()
+
+    accounts_file = args.accounts or input("Enter the path to the accounts file (JSON or CSV): ").strip()
+    accounts = load_accounts(accounts_file)
+
+    orchestrator = ScanOrchestrator(
+        docker_bin=args.docker_bin,
+        image=args.image,
+        network=args.network,
+        prefix=args.prefix,
+        benchmarks=args.benchmarks,
+        output_dir=args.output_dir,
+        max_parallel=args.max_parallel,
+        retries=args.retries,
+        backoff_base=args.backoff,
+        backoff_max=args.backoff_max,
+        health_timeout=args.health_timeout,
+        scan_timeout=args.scan_timeout,
+        port_pool=PortPool(args.steampipe_base_port, args.powerpipe_base_port, args.port_pool_size),
+        reuse=not args.fresh,
+        stop_after=args.stop_after
+    )
+    print(f"Scanning {len(accounts)} accounts, {args.max_parallel} at a time")
+    results = orchestrator.run(accounts)
+
+    summary_file = os.path.join(args.output_dir, 'scan_summary.json')
+    with open(summary_file, 'w') as fh:
+        json.dump(results, fh, indent=2)
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"\n{len(results) - len(failed)} of {len(results)} accounts scanned. Summary: {summary_file}")
+    for result in failed:
+        print(f"  FAILED {result['name']}: {result.get('error')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# scan_orchestrator.py is a script; the tests import it from its directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,183 @@
+"""
+Stand-in for the docker CLI, for running scan_orchestrator.py without Docker or AWS
+
+State lives in $FAKE_DOCKER_STATE: one JSON file per container and a log of
+every command. A running container is a background process listening on its
+Steampipe and Powerpipe ports, so the orchestrator's readiness probe sees it.
+The first container created under the name in $FAKE_DOCKER_CRASH exits at
+once, as a container whose plugin fails to start would.
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+STATE_DIR = os.environ['FAKE_DOCKER_STATE']
+
+# Accepts connections on the ports given as arguments and closes each once the client has,
+# so the TIME_WAIT falls on the client side and the ports can be bound again right away
+LISTENER = """
+import select, socket, sys
+servers = []
+for port in sys.argv[1:]:
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('127.0.0.1', int(port)))
+    server.listen()
+    servers.append(server)
+clients = []
+while True:
+    for sock in select.select(servers + clients, [], [])[0]:
+        if sock in servers:
+            clients.append(sock.accept()[0])
+        elif not sock.recv(1024):
+            clients.remove(sock)
+            sock.close()
+"""
+
+BENCHMARK_CSV = "group_id,title,control_title,status,reason,resource,account_id,region\n" \
+                "{benchmark},S3,S3 buckets should block public access,alarm,public,arn:aws:s3:::b,{account},us-east-1\n"
+
+
+def _path(name):
+    return os.path.join(STATE_DIR, 'containers', f"{name}.json")
+
+
+def _load(name):
+    try:
+        with open(_path(name)) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def _save(container):
+    with open(_path(container['name']), 'w') as fh:
+        json.dump(container, fh)
+
+
+def _alive(container):
+    if not container.get('pid'):
+        return False
+    try:
+        os.kill(container['pid'], 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _start(container):
+    process = subprocess.Popen([sys.executable, '-c', LISTENER, str(container['steampipe_port']),
+                                str(container['powerpipe_port'])],
+                               start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    container['pid'] = process.pid
+
+
+def _listening(port):
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=1.0):
+            return True
+    except OSError:
+        return False
+
+
+def _stop(container):
+    # Like docker stop, return once the container's ports are closed
+    if _alive(container):
+        os.kill(container['pid'], signal.SIGTERM)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and any(
+                _listening(container[port]) for port in ('steampipe_port', 'powerpipe_port')):
+            time.sleep(0.05)
+    container['pid'] = None
+
+
+def _option_values(args, option):
+    return [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == option]
+
+
+def _run(args):
+    name = _option_values(args, '--name')[0]
+    labels = dict(label.split('=', 1) for label in _option_values(args, '--label'))
+    container = {'name': name, 'labels': labels, 'pid': None,
+                 'steampipe_port': int(labels['scan.steampipe_port']),
+                 'powerpipe_port': int(labels['scan.powerpipe_port']),
+                 # docker run -e VAR takes the value from the client's environment
+                 'env': {var: os.environ.get(var, '') for var in _option_values(args, '-e') if '=' not in var}}
+    crash_marker = os.path.join(STATE_DIR, f"crashed_{name}")
+    if os.environ.get('FAKE_DOCKER_CRASH') == name and not os.path.exists(crash_marker):
+        open(crash_marker, 'w').close()
+        container['logs'] = "steampipe: aws plugin failed to start"
+    else:
+        _start(container)
+        container['logs'] = "Steampipe service started"
+    _save(container)
+    print(f"{name}-id")
+
+
+def main(args):
+    os.makedirs(os.path.join(STATE_DIR, 'containers'), exist_ok=True)
+    with open(os.path.join(STATE_DIR, 'calls.log'), 'a') as fh:
+        fh.write(json.dumps(args) + '\n')
+
+    command = args[0]
+    if command == 'network':
+        marker = os.path.join(STATE_DIR, f"network_{args[2]}")
+        if args[1] == 'inspect' and not os.path.exists(marker):
+            return 1
+        open(marker, 'w').close()
+        return 0
+    if command == 'ps':
+        for file_name in sorted(os.listdir(os.path.join(STATE_DIR, 'containers'))):
+            container = _load(file_name[:-len('.json')])
+            print(f"{container['name']}|{container['steampipe_port']}|{container['powerpipe_port']}")
+        return 0
+    if command == 'run':
+        _run(args)
+        return 0
+
+    if command == 'exec':
+        # exec [-w DIR] NAME COMMAND...
+        name = args[3] if args[1] == '-w' else args[1]
+    else:
+        name = args[-1]
+    container = _load(name)
+    if container is None:
+        print(f"Error: No such container: {name}", file=sys.stderr)
+        return 0 if command == 'rm' else 1
+
+    if command == 'inspect':
+        labels = container['labels']
+        print(f"{str(_alive(container)).lower()}|{labels['scan.steampipe_port']}|{labels['scan.powerpipe_port']}|"
+              f"{labels['scan.credentials']}")
+    elif command == 'start':
+        if not _alive(container):
+            taken = [container[port] for port in ('steampipe_port', 'powerpipe_port') if _listening(container[port])]
+            if taken:
+                print(f"Error response from daemon: Bind for 0.0.0.0:{taken[0]} failed: port is already allocated",
+                      file=sys.stderr)
+                return 1
+            _start(container)
+            _save(container)
+    elif command == 'stop':
+        _stop(container)
+        _save(container)
+    elif command == 'rm':
+        _stop(container)
+        os.remove(_path(container['name']))
+    elif command == 'logs':
+        print(container['logs'])
+    elif command == 'exec':
+        account = '0000' + container['env']['AWS_ACCESS_KEY_ID'][-8:].rjust(8, '0')
+        if 'steampipe' in args:
+            print(f"account_id\n{account}")
+        else:
+            print(BENCHMARK_CSV.format(benchmark=args[args.index('run') + 1], account=account), end='')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,146 @@
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import scan_orchestrator
+from scan_orchestrator import PortPool, ScanOrchestrator
+
+FAKE_DOCKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_docker.py')
+DOCKER_BIN = f"{sys.executable} {FAKE_DOCKER}"
+
+# Far from the real 9194/9040 defaults, so a local Steampipe does not get in the way
+STEAMPIPE_BASE = 39194
+POWERPIPE_BASE = 39040
+
+ACCOUNTS = [
+    {'name': 'client_a', 'aws_access_key_id': 'AKIAAAAA11111111', 'aws_secret_access_key': 'secret-a',
+     'region': 'us-east-1'},
+    {'name': 'client_b', 'aws_access_key_id': 'AKIABBBB22222222', 'aws_secret_access_key': 'secret-b',
+     'region': 'us-east-1'},
+]
+
+
+@pytest.fixture
+def docker_state(tmp_path, monkeypatch):
+    """State directory of the fake docker; containers left running are removed afterwards"""
+    state = tmp_path / 'docker'
+    monkeypatch.setenv('FAKE_DOCKER_STATE', str(state))
+    yield state
+    if os.path.isdir(state / 'containers'):
+        for file_name in os.listdir(state / 'containers'):
+            subprocess.run(shlex.split(DOCKER_BIN) + ['rm', '-f', file_name[:-len('.json')]], check=True)
+
+
+def _accounts_file(tmp_path, accounts):
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps(accounts))
+    return str(path)
+
+
+def _orchestrator(tmp_path, **options):
+    return ScanOrchestrator(docker_bin=DOCKER_BIN, output_dir=str(tmp_path / 'scan_output'), backoff_base=0.0,
+                            health_timeout=20.0, port_pool=PortPool(STEAMPIPE_BASE, POWERPIPE_BASE, 10), **options)
+
+
+def _calls(docker_state, command):
+    with open(docker_state / 'calls.log') as fh:
+        return [args for args in map(json.loads, fh) if args[0] == command]
+
+
+def test_docker_bin_scan_retries_a_container_that_fails_its_probe(tmp_path, docker_state, monkeypatch):
+    output_dir = tmp_path / 'scan_output'
+    monkeypatch.setenv('FAKE_DOCKER_CRASH', 'pp_scan_client_b')
+    monkeypatch.setattr(sys, 'argv', [
+        'scan_orchestrator.py', _accounts_file(tmp_path, ACCOUNTS), '--docker-bin', DOCKER_BIN,
+        '--output-dir', str(output_dir), '--backoff', '0', '--health-timeout', '20', '--max-parallel', '2',
+        '--steampipe-base-port', str(STEAMPIPE_BASE), '--powerpipe-base-port', str(POWERPIPE_BASE),
+        '--port-pool-size', '10', '--benchmark', 'aws_compliance.benchmark.all_controls',
+        '--benchmark', 'aws_compliance.benchmark.foundational_security'])
+
+    assert scan_orchestrator.main() == 0
+
+    with open(output_dir / 'scan_summary.json') as fh:
+        summary = {record['name']: record for record in json.load(fh)}
+    assert summary['client_a']['attempts'] == 1
+    assert summary['client_b']['attempts'] == 2
+    assert {record['status'] for record in summary.values()} == {'ok'}
+    assert summary['client_a']['account_id'] == '000011111111'
+
+    # The crashed container was removed and its port pair handed to the replacement
+    ports = {(record['steampipe_port'], record['powerpipe_port']) for record in summary.values()}
+    assert ports == {(STEAMPIPE_BASE, POWERPIPE_BASE), (STEAMPIPE_BASE + 1, POWERPIPE_BASE + 1)}
+    assert [args[-1] for args in _calls(docker_state, 'rm')] == ['pp_scan_client_b']
+    assert len(_calls(docker_state, 'run')) == 3
+
+    export = output_dir / 'client_b' / 'aws_compliance.benchmark.foundational_security.csv'
+    assert export.read_text().splitlines()[1].startswith('aws_compliance.benchmark.foundational_security,')
+    assert summary['client_b']['outputs'][1] == str(export)
+
+    # Keys reach docker run through the environment only
+    assert not any('secret-a' in arg or 'secret-b' in arg for args in _calls(docker_state, 'run') for arg in args)
+
+
+def test_warm_containers_are_reused_and_keep_their_ports(tmp_path, docker_state):
+    first = {record['name']: record for record in _orchestrator(tmp_path).run(ACCOUNTS)}
+    assert not any(record['warm'] for record in first.values())
+
+    rotated = {**ACCOUNTS[0], 'aws_secret_access_key': 'rotated'}
+    client_c = {'name': 'client_c', 'aws_access_key_id': 'AKIACCCC33333333', 'aws_secret_access_key': 'secret-c',
+                'region': 'us-east-1'}
+    second = {record['name']: record
+              for record in _orchestrator(tmp_path).run([ACCOUNTS[1], rotated, client_c])}
+
+    assert second['client_b']['warm'] is True
+    assert second['client_b']['steampipe_port'] == first['client_b']['steampipe_port']
+    assert len(_calls(docker_state, 'run')) == 4
+    # Rotated keys replace the container; its released pair can be handed out again
+    assert second['client_a']['warm'] is False
+    # client_c never takes a pair still held by another container, warm ones included
+    ports = [(record['steampipe_port'], record['powerpipe_port']) for record in second.values()]
+    assert len(set(ports)) == 3
+    assert {record['status'] for record in second.values()} == {'ok'}
+
+
+def test_stopped_warm_container_is_started(tmp_path, docker_state):
+    _orchestrator(tmp_path, stop_after=True).run(ACCOUNTS[:1])
+
+    record = _orchestrator(tmp_path).run(ACCOUNTS[:1])[0]
+
+    assert record['status'] == 'ok'
+    assert record['warm'] is True
+    assert [args[-1] for args in _calls(docker_state, 'start')] == ['pp_scan_client_a']
+
+
+def test_warm_container_that_cannot_start_is_replaced(tmp_path, docker_state):
+    first = _orchestrator(tmp_path, stop_after=True).run(ACCOUNTS[:1])[0]
+    # Another process takes the stopped container's Steampipe port
+    with socket.socket() as squatter:
+        squatter.bind(('127.0.0.1', first['steampipe_port']))
+        squatter.listen()
+
+        record = _orchestrator(tmp_path).run(ACCOUNTS[:1])[0]
+
+    assert record['status'] == 'ok'
+    assert record['attempts'] == 2
+    assert record['warm'] is False
+    assert record['steampipe_port'] != first['steampipe_port']
+    assert len(_calls(docker_state, 'start')) == 1
+    assert [args[-1] for args in _calls(docker_state, 'rm')] == ['pp_scan_client_a']
+
+
+def test_port_pool_reuses_released_pairs():
+    pool = PortPool(STEAMPIPE_BASE, POWERPIPE_BASE, 3)
+
+    assert pool.acquire('a') == (STEAMPIPE_BASE, POWERPIPE_BASE)
+    assert pool.acquire('b') == (STEAMPIPE_BASE + 1, POWERPIPE_BASE + 1)
+    assert pool.reserve('c', (STEAMPIPE_BASE + 1, POWERPIPE_BASE + 2)) is False
+    pool.release('a')
+    assert pool.acquire('c') == (STEAMPIPE_BASE, POWERPIPE_BASE)
+    assert pool.acquire('d') == (STEAMPIPE_BASE + 2, POWERPIPE_BASE + 2)
+    with pytest.raises(scan_orchestrator.ScanError, match='No free port pair'):
+        pool.acquire('e')
@@ -1,8 +1,18 @@
 import pandas as pd
 from datetime import datetime
+import argparse
 import os
+import sys
 import numpy as np
 
+# Shared helpers live next to the AWS report scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AWS_Automation', 'All_control'))
+from export_schema import SCHEMAS, read_export
+from run_metrics import NULL_METRICS, add_metrics_arguments, metrics_from_args
+from stage_profiler import NULL_PROFILER, add_profile_arguments, profiler_from_args
+from summary_cube import SUMMARY_KEYS, build_cube, status_slice
+from xlsx_reader import add_xlsx_reader_arguments
+
 # Define GCP service categories
 categories = {
     'Security and Identity': ['IAM', 'KMS', 'Organization', 'Resource Manager'],
@@ -13,34 +23,35 @@ categories = {
     'Other': ['Logging', 'Project']
 }
 
-def create_simplified_gcp_report(report_file, final_report_file):
+# Dimensions of the findings cube behind the Service Analysis and Summary Tables sheets
+GCP_CUBE_KEYS = ['service', 'title', 'control_title', 'control_description', 'status', 'project', 'location']
+
+def summarize_cells(cells, keys):
+    """
+    Resource count and distinct projects per key from findings cube cells
+    """
+    grouped = cells.groupby(keys)
+    return pd.DataFrame({
+        'resource': grouped['resource'].sum(),
+        'project': grouped['project'].nunique()
+    }).reset_index()
+
+def create_simplified_gcp_report(report_file, final_report_file, profiler=NULL_PROFILER, metrics=NULL_METRICS,
+                                 xlsx_engine='auto'):
     """
     Enhanced function to process GCP report with better analysis capabilities and error handling.
     """
     # Read input file
     try:
-        if report_file.endswith('.csv'):
-            raw_df = pd.read_csv(report_file)
-        elif report_file.endswith('.xlsx'):
-            raw_df = pd.read_excel(report_file, engine='openpyxl')
-        else:
-            raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
+        with profiler.stage('load_input'):
+            # Only the schema columns are read; a missing one fails here, before any rows are parsed
+            raw_df = read_export(report_file, SCHEMAS['gcp'], xlsx_engine)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
 
     # Create working copy with required columns
-    columns_to_keep = [
-        'service', 'title', 'status', 'control_title', 
-        'control_description', 'reason', 'resource', 
-        'project', 'location'
-    ]
-    
-    missing_columns = [col for col in columns_to_keep if col not in raw_df.columns]
-    if missing_columns:
-        raise KeyError(f"Missing required columns in the input file: {missing_columns}")
-    
-    df = raw_df[columns_to_keep].copy()
+    df = raw_df[list(SCHEMAS['gcp'].required)].copy()
 
     # Data categorization
     compliant_df = df[df['status'].isin(['ok', 'skip', 'info'])].copy()
@@ -55,19 +66,20 @@ def create_simplified_gcp_report(report_file, final_report_file):
         data['Priority'] = ''
         data['Remediation Status'] = ''
 
+    # Count the findings once; every summary below is a roll-up of this cube
+    with profiler.stage('summary_cube'):
+        cube = build_cube(df, keys=GCP_CUBE_KEYS, count_columns=['resource'])
+
     # Create detailed analysis summaries
-    service_summary = df.groupby('service').agg({
-        'status': lambda x: (x == 'alarm').sum(),
-        'project': 'nunique',
-        'resource': 'count'
-    }).rename(columns={
-        'status': 'Issues Count',
-        'project': 'Projects Affected',
-        'resource': 'Total Resources'
+    by_service = cube.assign(issues=cube['count'].where(cube['status'] == 'alarm', 0)).groupby('service')
+    service_summary = pd.DataFrame({
+        'Issues Count': by_service['issues'].sum(),
+        'Projects Affected': by_service['project'].nunique(),
+        'Total Resources': by_service['resource'].sum()
     })
 
     # Initialize Excel writer with nan_inf_to_errors option
-    with pd.ExcelWriter(final_report_file, engine='xlsxwriter') as writer:
+    with profiler.stage('write_workbook'), pd.ExcelWriter(final_report_file, engine='xlsxwriter') as writer:
         workbook = writer.book
 
         # Define formats
@@ -85,119 +97,122 @@ def create_simplified_gcp_report(report_file, final_report_file):
         }
 
         # Write raw data sheet
-        raw_df.to_excel(writer, sheet_name='Report_pp', index=False)
-        raw_worksheet = writer.sheets['Report_pp']
-        for col_num, value in enumerate(raw_df.columns.values):
-            raw_worksheet.write(0, col_num, value, formats['header'])
+        with profiler.stage('sheet:Report_pp'), \
+                metrics.stage('sheet:Report_pp', total_rows=len(raw_df)) as progress:
+            raw_df.to_excel(writer, sheet_name='Report_pp', index=False)
+            raw_worksheet = writer.sheets['Report_pp']
+            for col_num, value in enumerate(raw_df.columns.values):
+                raw_worksheet.write(0, col_num, value, formats['header'])
+            progress.advance(len(raw_df))
 
         # Write consolidated sheet
-        consolidated_sheet = workbook.add_worksheet('Consolidated')
+        with profiler.stage('sheet:Consolidated'), \
+                metrics.stage('sheet:Consolidated', total_rows=len(non_compliant_df) + len(compliant_df)) as progress:
+            consolidated_sheet = workbook.add_worksheet('Consolidated')
         
-        # Write non-compliant section
-        consolidated_sheet.write(0, 0, 'Non-compliant Findings', formats['section_header_red'])
-        headers = ['service', 'title', 'status', 'control_title', 'control_description', 
-                  'reason', 'resource', 'project', 'location', 'Feedback', 'Checkbox', 
-                  'Review Date', 'Action Items', 'Priority', 'Remediation Status']
+            # Write non-compliant section
+            consolidated_sheet.write(0, 0, 'Non-compliant Findings', formats['section_header_red'])
+            headers = ['service', 'title', 'status', 'control_title', 'control_description', 
+                      'reason', 'resource', 'project', 'location', 'Feedback', 'Checkbox', 
+                      'Review Date', 'Action Items', 'Priority', 'Remediation Status']
         
-        for col, header in enumerate(headers):
-            consolidated_sheet.write(1, col, header, formats['header'])
-
-        # Write non-compliant data with formatting and NaN handling
-        for row_idx, row in enumerate(non_compliant_df.values, start=2):
-            for col_idx, value in enumerate(row):
-                # Handle NaN/INF values
-                if isinstance(value, (float, np.floating)) and (pd.isna(value) or pd.isinf(value)):
-                    value = ''
+            for col, header in enumerate(headers):
+                consolidated_sheet.write(1, col, header, formats['header'])
+
+            # Write non-compliant data with formatting and NaN handling
+            for row_idx, row in enumerate(non_compliant_df.values, start=2):
+                progress.advance()
+                for col_idx, value in enumerate(row):
+                    # Handle NaN/INF values
+                    if isinstance(value, (float, np.floating)) and (pd.isna(value) or pd.isinf(value)):
+                        value = ''
                 
-                if col_idx in [3, 4, 5, 6]:  # Format critical columns
-                    consolidated_sheet.write(row_idx, col_idx, value, formats['red'])
-                else:
-                    consolidated_sheet.write(row_idx, col_idx, str(value))
-
-        # Write compliant section
-        compliant_start_row = len(non_compliant_df) + 4
-        consolidated_sheet.write(compliant_start_row, 0, 'Compliant Findings', formats['section_header_green'])
+                    if col_idx in [3, 4, 5, 6]:  # Format critical columns
+                        consolidated_sheet.write(row_idx, col_idx, value, formats['red'])
+                    else:
+                        consolidated_sheet.write(row_idx, col_idx, str(value))
+
+            # Write compliant section
+            compliant_start_row = len(non_compliant_df) + 4
+            consolidated_sheet.write(compliant_start_row, 0, 'Compliant Findings', formats['section_header_green'])
         
-        for col, header in enumerate(headers):
-            consolidated_sheet.write(compliant_start_row + 1, col, header, formats['header'])
-
-        # Write compliant data with formatting and NaN handling
-        for row_idx, row in enumerate(compliant_df.values, start=compliant_start_row + 2):
-            for col_idx, value in enumerate(row):
-                # Handle NaN/INF values
-                if isinstance(value, (float, np.floating)) and (pd.isna(value) or pd.isinf(value)):
-                    value = ''
+            for col, header in enumerate(headers):
+                consolidated_sheet.write(compliant_start_row + 1, col, header, formats['header'])
+
+            # Write compliant data with formatting and NaN handling
+            for row_idx, row in enumerate(compliant_df.values, start=compliant_start_row + 2):
+                progress.advance()
+                for col_idx, value in enumerate(row):
+                    # Handle NaN/INF values
+                    if isinstance(value, (float, np.floating)) and (pd.isna(value) or pd.isinf(value)):
+                        value = ''
                 
-                if col_idx in [3, 4, 5, 6]:  # Format critical columns
-                    consolidated_sheet.write(row_idx, col_idx, value, formats['green'])
-                else:
-                    consolidated_sheet.write(row_idx, col_idx, str(value))
+                    if col_idx in [3, 4, 5, 6]:  # Format critical columns
+                        consolidated_sheet.write(row_idx, col_idx, value, formats['green'])
+                    else:
+                        consolidated_sheet.write(row_idx, col_idx, str(value))
 
         # Write service analysis sheet
-        service_summary.to_excel(writer, sheet_name='Service Analysis')
-        analysis_sheet = writer.sheets['Service Analysis']
+        with profiler.stage('sheet:Service Analysis'):
+            service_summary.to_excel(writer, sheet_name='Service Analysis')
+            analysis_sheet = writer.sheets['Service Analysis']
         
-        for col_num, value in enumerate(service_summary.columns):
-            analysis_sheet.write(0, col_num, value, formats['header'])
-
-    # Create Summary Table for non-compliant findings
-        summary = non_compliant_df.groupby(['title', 'control_title', 'control_description']).agg({
-            'resource': 'count',
-            'project': 'nunique',
-            'Priority': lambda x: x.iloc[0] if not x.empty else 'Priority Not Added Yet'
-        }).reset_index()
+            for col_num, value in enumerate(service_summary.columns):
+                analysis_sheet.write(0, col_num, value, formats['header'])
+
+        # Create Summary Table for non-compliant findings
+        with profiler.stage('sheet:Summary Tables'):
+            summary = summarize_cells(status_slice(cube, ['alarm']), SUMMARY_KEYS)
+            summary['Priority'] = ''  # Review columns are still blank at this point
         
-        summary.columns = ['Title', 'Control Title', 'Control Description', 'Resources Affected', 'Projects Affected', 'Priority']
+            summary.columns = ['Title', 'Control Title', 'Control Description', 'Resources Affected', 'Projects Affected', 'Priority']
         
-        # Write Summary Table
-        summary.to_excel(writer, sheet_name='Summary Tables', index=False)
-        summary_worksheet = writer.sheets['Summary Tables']
+            # Write Summary Table
+            summary.to_excel(writer, sheet_name='Summary Tables', index=False)
+            summary_worksheet = writer.sheets['Summary Tables']
         
-        # Write headers
-        for col_num, value in enumerate(summary.columns):
-            summary_worksheet.write(0, col_num, value, formats['header'])
+            # Write headers
+            for col_num, value in enumerate(summary.columns):
+                summary_worksheet.write(0, col_num, value, formats['header'])
         
-        # Apply zebra striping to Summary Table
-        for row_num in range(1, len(summary) + 1):
-            row_format = formats['zebra_dark'] if row_num % 2 == 0 else formats['zebra_light']
-            for col_num in range(len(summary.columns)):
-                value = summary.iloc[row_num - 1, col_num]
-                if col_num == len(summary.columns) - 1:  # Priority column
-                    format_to_use = formats['priority_red'] if value == 'Priority Not Added Yet' else formats['priority_green']
-                else:
-                    format_to_use = row_format
-                summary_worksheet.write(row_num, col_num, value, format_to_use)
-
-        # Add Compliant Summary Table below with spacing
-        start_row = len(summary) + 3  # Leave 2 rows gap
+            # Apply zebra striping to Summary Table
+            for row_num in range(1, len(summary) + 1):
+                row_format = formats['zebra_dark'] if row_num % 2 == 0 else formats['zebra_light']
+                for col_num in range(len(summary.columns)):
+                    value = summary.iloc[row_num - 1, col_num]
+                    if col_num == len(summary.columns) - 1:  # Priority column
+                        format_to_use = formats['priority_red'] if value == 'Priority Not Added Yet' else formats['priority_green']
+                    else:
+                        format_to_use = row_format
+                    summary_worksheet.write(row_num, col_num, value, format_to_use)
+
+            # Add Compliant Summary Table below with spacing
+            start_row = len(summary) + 3  # Leave 2 rows gap
         
-        # Create Compliant Summary
-        compliant_summary = compliant_df.groupby(['title', 'control_title', 'control_description']).agg({
-            'resource': 'count',
-            'project': 'nunique'
-        }).reset_index()
+            # Create Compliant Summary
+            compliant_summary = summarize_cells(status_slice(cube, ['ok', 'skip', 'info']), SUMMARY_KEYS)
         
-        compliant_summary.columns = ['Title', 'Control Title', 'Control Description', 'Resources Affected', 'Projects Affected']
-        compliant_summary['Status'] = 'Safe/Well Architected'
+            compliant_summary.columns = ['Title', 'Control Title', 'Control Description', 'Resources Affected', 'Projects Affected']
+            compliant_summary['Status'] = 'Safe/Well Architected'
         
-        # Write section header
-        summary_worksheet.write(start_row, 0, 'Compliant Findings Summary', formats['section_header_green'])
+            # Write section header
+            summary_worksheet.write(start_row, 0, 'Compliant Findings Summary', formats['section_header_green'])
         
-        # Write headers
-        for col_num, value in enumerate(compliant_summary.columns):
-            summary_worksheet.write(start_row + 1, col_num, value, formats['green_header'])
+            # Write headers
+            for col_num, value in enumerate(compliant_summary.columns):
+                summary_worksheet.write(start_row + 1, col_num, value, formats['green_header'])
         
-        # Apply zebra striping to Compliant Summary
-        for row_num in range(len(compliant_summary)):
-            row_format = formats['zebra_dark'] if row_num % 2 == 0 else formats['zebra_light']
-            for col_num in range(len(compliant_summary.columns)):
-                value = compliant_summary.iloc[row_num, col_num]
-                summary_worksheet.write(row_num + start_row + 2, col_num, value, row_format)
-
-        # Adjust column widths
-        for worksheet in [summary_worksheet]:
-            for col_num in range(len(compliant_summary.columns)):
-                worksheet.set_column(col_num, col_num, 20)
+            # Apply zebra striping to Compliant Summary
+            for row_num in range(len(compliant_summary)):
+                row_format = formats['zebra_dark'] if row_num % 2 == 0 else formats['zebra_light']
+                for col_num in range(len(compliant_summary.columns)):
+                    value = compliant_summary.iloc[row_num, col_num]
+                    summary_worksheet.write(row_num + start_row + 2, col_num, value, row_format)
+
+            # Adjust column widths
+            for worksheet in [summary_worksheet]:
+                for col_num in range(len(compliant_summary.columns)):
+                    worksheet.set_column(col_num, col_num, 20)
 
     print(f"Enhanced report generated: {final_report_file}")
 
@@ -205,6 +220,13 @@ def main():
     """
     Main function to handle report generation.
     """
+    parser = argparse.ArgumentParser(description="GCP Compliance Report Generator")
+    add_profile_arguments(parser)
+    add_metrics_arguments(parser)
+    add_xlsx_reader_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, 'GCP_report_compliance')
+
     try:
         report_file = input("Enter the GCP report file name: ").strip()
         if not os.path.exists(report_file):
@@ -216,7 +238,12 @@ def main():
         reports_directory = os.path.dirname(os.path.abspath(__file__))
         final_report_file = os.path.join(reports_directory, unique_file_name)
 
-        create_simplified_gcp_report(report_file, final_report_file)
+        metrics = metrics_from_args(args, os.path.basename(report_file))
+        create_simplified_gcp_report(report_file, final_report_file, profiler=profiler, metrics=metrics,
+                                     xlsx_engine=args.xlsx_engine)
+
+        if args.profile:
+            profiler.write_json(args.profile)
     except Exception as e:
         print(f"Error occurred: {e}")
 